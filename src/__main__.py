@@ -51,4 +51,8 @@ def main():
 
 
 
-main()
+# NB: the peak detection workers (utils/parallel_detection.py) import this module again, they must not start the app
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()  # pyinstaller executable
+    main()
@@ -0,0 +1,64 @@
+"""
+Processes all the recordings of a folder without the graphical interface: beat detection, noise detection and beat
+correction with the analysis settings, default samples, and a session file (.h5) and the HRV results (.csv) per file.
+The files are processed in parallel and the results of all the samples are also collected in one combined table.
+
+    python batch_process.py recordings_folder --frequency 250 --output results_folder --workers 4
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from logic import batch_engine, batch_export
+from utils.utils_general import resource_path
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HRV analysis of a folder of recordings")
+    parser.add_argument("input", help="folder with the recordings")
+    parser.add_argument("--settings", default=str(resource_path(Path('settings.json'))), help="analysis settings (settings.json of the application by default)")
+    parser.add_argument("--output", required=True, help="folder for the session and results files, other than the input folder")
+    parser.add_argument("--pattern", default=None, help="glob pattern of the files to process, e.g. '*.txt'")
+    parser.add_argument("--file-type", choices=batch_engine.FILE_TYPES, default=None, help="file type (by default from the extension)")
+    parser.add_argument("--data-type", choices=list(batch_engine.DATA_TYPES), default="ecg")
+    parser.add_argument("--column", default="1", help="column number (csv, txt, dat) or channel name (edf) with the data")
+    parser.add_argument("--separator", choices=list(batch_engine.SEPARATORS), default="Comma")
+    parser.add_argument("--header-lines", type=int, default=0)
+    parser.add_argument("--frequency", type=float, default=None, help="sampling frequency (Hz), required for csv, txt and dat")
+    parser.add_argument("--units", choices=["s", "ms"], default="s", help="units of RR recordings")
+    parser.add_argument("--sample-name", default="sample", help="name of the default samples")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (all CPUs by default)")
+    parser.add_argument("--combined", default=batch_export.COMBINED_FILE, help="name of the combined results table")
+    return parser.parse_args(argv)
+
+
+def log_progress(files_done, files_total, path, error):
+    status = "done" if error is None else f"failed ({error})"
+    logging.info(f"[{files_done}/{files_total}] {path.name}: {status}")
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments(argv)
+    settings = batch_engine.load_settings(args.settings)
+    options = {'file_type': args.file_type,
+               'data_type': args.data_type,
+               'column': args.column,
+               'separator': args.separator,
+               'header_lines': args.header_lines,
+               'frequency': args.frequency,
+               'units': args.units,
+               'sample_name': args.sample_name}
+    results = batch_export.export_directory(args.input, settings, args.output, options, args.pattern,
+                                            args.workers, args.combined, log_progress)
+    failed = [path for path, result in results.items() if isinstance(result, Exception)]
+    logging.info(f"{len(results) - len(failed)} of {len(results)} files processed")
+    return 1 if failed else 0
+
+
+# NB: the worker processes (logic/batch_export.py) import this module again
+if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Timings of the analysis functions on synthetic 24-hour RR series (about 108000 beats).
+
+    python benchmarks.py                 # all the benchmarks
+    python benchmarks.py segmentation    # some of them
+    python benchmarks.py --hours 1 entropy
+"""
+import argparse
+import time
+
+import numpy as np
+
+
+def synthetic_rr(hours=24, mean_rr=0.8, seed=0):
+    """RR intervals (s) of the given duration with a slow oscillation, noise and some ectopic beats"""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 / mean_rr)
+    rr = mean_rr + 0.05 * np.sin(np.arange(n) * 2 * np.pi / 300) + rng.normal(0, 0.03, n)
+    ectopic = rng.choice(n, n // 500, replace=False)
+    rr[ectopic] *= 0.6
+    return np.clip(rr, 0.3, 2)
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_segmentation(rr, repeat):
+    from modified_dependencies.pyhrv.utils import segmentation
+    for full in (True, False):
+        seconds = best_time(lambda: segmentation(rr, full=full, duration=300, warn=False), repeat)
+        print(f"segmentation, 300 s segments, full={full}: {seconds:.3f} s")
+
+
+def benchmark_entropy(rr, repeat):
+    from modified_dependencies.pyhrv.nonlinear import sample_entropy, approximate_entropy
+    for function in (sample_entropy, approximate_entropy):
+        seconds = best_time(lambda: function(rr), repeat)
+        print(f"{function.__name__}, kdtree backend: {seconds:.3f} s")
+
+
+def benchmark_dfa(rr, repeat):
+    from modified_dependencies.pyhrv.nonlinear import dfa
+    seconds = best_time(lambda: dfa(rr, mode='dev'), repeat)
+    print(f"dfa, 4-16 and 17-64 beats: {seconds:.3f} s")
+
+
+def benchmark_psd_waterfall(rr, repeat):
+    from modified_dependencies.pyhrv.frequency_domain import psd_waterfall
+    seconds = best_time(lambda: psd_waterfall(rr, plot=False, stationary=lambda nn: nn - np.mean(nn)), repeat)
+    print(f"psd_waterfall, Welch, 300 s segments, no figure: {seconds:.3f} s")
+
+
+BENCHMARKS = {
+    'segmentation': benchmark_segmentation,
+    'entropy': benchmark_entropy,
+    'dfa': benchmark_dfa,
+    'psd_waterfall': benchmark_psd_waterfall,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timings of the analysis on synthetic 24-hour RR series")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, of {', '.join(BENCHMARKS)} (all by default)")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the best one is shown")
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+
+    rr = synthetic_rr(args.hours)
+    print(f"{len(rr)} RR intervals ({args.hours} h)")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](rr, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -36,7 +36,11 @@ default_config = {'panel_height'              : 300,
                   "show_cursor"               : False,
                   "show_xaxis_label"          : False,
                   "autoplay_timer_interval"   : 800,
-                  "default_mode"              : "browse"}
+                  "default_mode"              : "browse",
+                  "detection_workers"         : 0,    # 0: one per CPU
+                  "detection_window_sec"      : 0,    # 0: do not cut long segments into windows
+                  "detection_window_overlap_sec": 20,
+                  "detection_min_parallel_sec": 600}
 
 
 # @formatter:on
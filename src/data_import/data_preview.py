@@ -9,6 +9,7 @@ import fileinput
 from PyQt5.QtCore import Qt, QModelIndex, QAbstractTableModel
 from PyQt5.QtGui import QColor
 from pyecg import ECGRecord
+from data_import.file_preview import read_head
 
 
 class DataPreviewFrame(QtWidgets.QFrame):
@@ -234,19 +235,18 @@ class DataPreviewPanel(QtWidgets.QWidget):
             return data, data_labels
         
     # Some file formats can have data preview
-    # Get all the file and save it as json. Might be better to display it with python to make it
-    # scrollable
+    # Only the first rows are read (data_import.file_preview), also for very large files
     
     def preview_txt_data(self, data_path, delimiter):
-        df = pd.read_csv(data_path, nrows=1000, sep=delimiter, header=None, engine="python")
+        df = read_head(data_path, delimiter, rows=1000)
         return df
     
     def preview_data_data(self, data_path, delimiter):
-        df = pd.read_csv(data_path, nrows=1000, sep=delimiter, header=None, engine="python")
+        df = read_head(data_path, delimiter, rows=1000)
         return df
     
     def preview_csv_data(self, data_path, delimiter):
-        df = pd.read_csv(data_path, nrows=1000, sep=delimiter, header=None, engine="python")
+        df = read_head(data_path, delimiter, rows=1000)
         return df
 
 
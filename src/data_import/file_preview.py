@@ -0,0 +1,91 @@
+"""
+Preview of csv, txt and dat recordings from the start and the end of the file only. The columns and the sampling
+frequency are taken from the first HEAD_ROWS rows, the last time value from the last rows, read by seeking from the end
+of the file, and the number of rows is estimated from the size of the file and the bytes of the first rows. Opening
+the import dialog on a very large file therefore reads a few hundred kilobytes instead of the whole file. The
+parsed rows are kept by path, size and modification time, so the previews made again while the options of the
+dialog change do not read the file again.
+"""
+import io
+import os
+from functools import lru_cache
+from itertools import islice
+
+HEAD_ROWS = 5000  # rows read from the start of the file
+TAIL_BLOCK = 64 * 1024  # bytes read at a time from the end of the file
+
+
+def _file_key(path):
+    """path with the size and modification time of the file, so the cached rows of a changed file are not used"""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def _read_lines(lines, delimiter):
+    """DataFrame of the text lines, one column per field"""
+    import pandas as pd
+    text = "".join(lines)
+    if not text.strip():
+        return pd.DataFrame()
+    # the c parser only takes single character delimiters
+    engine = "c" if len(delimiter) == 1 else "python"
+    return pd.read_csv(io.StringIO(text), header=None, sep=delimiter, engine=engine)
+
+
+@lru_cache(maxsize=8)
+def _head(key, delimiter, header_lines, rows):
+    """DataFrame of the first rows, with the bytes of the header and of the rows read"""
+    with open(key[0], 'r', errors='replace') as file:
+        lines = list(islice(file, header_lines + rows))
+    header_bytes = sum(len(line.encode()) for line in lines[:header_lines])
+    data_lines = lines[header_lines:]
+    return _read_lines(data_lines, delimiter), header_bytes, sum(len(line.encode()) for line in data_lines)
+
+
+@lru_cache(maxsize=8)
+def _tail(key, delimiter, rows):
+    size = key[1]
+    with open(key[0], 'rb') as file:
+        data = b""
+        position = size
+        # blocks from the end until rows complete lines (and the one before them) are read
+        while position > 0 and data.rstrip(b"\r\n").count(b"\n") < rows:
+            step = min(TAIL_BLOCK, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+    lines = data.decode(errors='replace').splitlines(keepends=True)
+    if position > 0:
+        # the first line read may have started before the block
+        lines = lines[1:]
+    lines = [line for line in lines if line.strip()][-rows:]
+    return _read_lines(lines, delimiter)
+
+
+def read_head(path, delimiter, header_lines=0, rows=HEAD_ROWS):
+    """first rows of the file after header_lines, as a DataFrame with one column per field"""
+    return _head(_file_key(path), delimiter, int(header_lines or 0), int(rows))[0]
+
+
+def read_tail(path, delimiter, rows=1):
+    """last rows (not empty) of the file, as a DataFrame with one column per field"""
+    return _tail(_file_key(path), delimiter, int(rows))
+
+
+def estimate_rows(path, delimiter, header_lines=0, rows=HEAD_ROWS):
+    """rows of data in the file, from its size and the mean bytes of the first rows (exact if the file has fewer)"""
+    key = _file_key(path)
+    head, header_bytes, data_bytes = _head(key, delimiter, int(header_lines or 0), int(rows))
+    if len(head) == 0:
+        return 0
+    if header_bytes + data_bytes >= key[1]:
+        return len(head)
+    return int(round((key[1] - header_bytes) / (data_bytes / len(head))))
+
+
+def time_column_values(path, delimiter, column, header_lines=0, rows=HEAD_ROWS):
+    """values of the time column (0 based) in the first rows and in the last row of the file"""
+    head = read_head(path, delimiter, header_lines, rows)
+    tail = read_tail(path, delimiter, 1)
+    return head.iloc[:, column].values, tail.iloc[:, column].values
+
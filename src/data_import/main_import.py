@@ -14,6 +14,10 @@ import pyedflib as pyedflib
 from pyecg import ECGRecord
 #from numba import jit
 from config.config import ICON_PATH
+from logic.rr_store import RRStore
+from data_import.file_preview import time_column_values
+from data_import.streaming_import import RecordingWriter, read_column_chunks
+from functools import partial
 
 
 class MyMainImport(QDialog):
@@ -51,7 +55,7 @@ class MyMainImport(QDialog):
         self.palms.END_MISSING_INDEXES = np.array([], dtype="int32")
         self.palms.threshold_outliers = np.array([], dtype="int32")
         self.palms.fiducials = np.array([], dtype="int32")
-        self.palms.rr_intervals = np.array([], dtype="int32")
+        self.palms.rr_intervals = RRStore()
 
         # Create a menu
         self.button = QPushButton("Choose a different import option")
@@ -907,42 +911,18 @@ class MyMainImport(QDialog):
                 else:
                     delimiter = "/"
                 
-                # Check: that I can read the file, that frequency/time are correct
-                txt_data = pd.read_csv(path, usecols=[int(interest_column)-1], header=None, sep=delimiter, engine="c")
-            
-                #ecg = txt_data.iloc[:, int(interest_column)-1].values
-                ecg = np.array(txt_data.iloc[:, 0].values)[int(header_lines):].astype("float32")
-                if self.widget.w_list[index].data_units_combo.currentIndex() == 1 and ecg_type == 1: # rr and ms
-                    subset = ecg[:100]  # Take the first 100 elements of the array
-                    limit = np.any(subset < 4)
-
-                    if limit:
-                        msgBox = QMessageBox()
-                        msgBox.setIcon(QMessageBox.Question)
-                        msgBox.setText("The data units is set to miliseconds, but some values are low. Do you want to switch to seconds?")
-                        msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                        msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                        result = msgBox.exec_()
-                    
-                        if result:
-                            ecg  = ecg/1000
-                    else:
-                        ecg  = ecg/1000
-
-                elif self.widget.w_list[index].data_units_combo.currentIndex() == 0 and ecg_type == 1: # rr and s
-                    subset = ecg[:100]  # Take the first 100 elements of the array
-                    limit = np.any(subset > 60)
-
-                    if limit:
-                        msgBox = QMessageBox()
-                        msgBox.setIcon(QMessageBox.Question)
-                        msgBox.setText("The data units is set to seconds, but some values are high. Do you want to switch to miliseconds?")
-                        msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                        msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                        result = msgBox.exec_()
-                    
-                        if result:
-                            ecg  = ecg/1000
+                # the column is read by chunks into a file mapped as the signal (data_import.streaming_import)
+                chunks = read_column_chunks(path, int(interest_column)-1, delimiter, int(header_lines))
+                divisor = partial(self.units_divisor, index, ecg_type)
+                if (index == 0):
+                    self.recording = RecordingWriter()
+                    self.recording.append_file(chunks, divisor)
+                    ecg = self.recording.array()
+                else:
+                    # the gap before this file is only known from its time values: the file is first written alone
+                    new_recording = RecordingWriter()
+                    new_recording.append_file(chunks, divisor)
+                    ecg = new_recording.array()
 
                 # if datetime, change to seconds. Change with np.datetime64
                 frequency, format_time_values, first_format_value, last_format_value = self.getSingleFrequency(index, len(ecg))
@@ -961,9 +941,9 @@ class MyMainImport(QDialog):
                         self.palms.RR_ONLY = True
                         self.palms.FREQUENCY = 100
                         self.palms.START_INDEXES = np.append(self.palms.START_INDEXES, int(0))
-                        self.palms.END_INDEXES = np.append(self.palms.END_INDEXES, int(sum(ecg)))
+                        self.palms.END_INDEXES = np.append(self.palms.END_INDEXES, int(np.sum(ecg, dtype=np.float64)))
                         self.palms.START_MISSING_INDEXES = np.append(self.palms.START_MISSING_INDEXES, int(0))
-                        self.palms.END_MISSING_INDEXES = np.append(self.palms.END_MISSING_INDEXES, int((sum(ecg))*100))
+                        self.palms.END_MISSING_INDEXES = np.append(self.palms.END_MISSING_INDEXES, int((np.sum(ecg, dtype=np.float64))*100))
                     else:
                         self.palms.RR_ONLY = False
                         self.palms.START_INDEXES = np.append(self.palms.START_INDEXES, int(0))
@@ -1002,23 +982,17 @@ class MyMainImport(QDialog):
                     else:
                         num_zeros = int(pd.Timedelta(time_duration).total_seconds() * frequency)
                     
-
-                    # Create an array of zeros with the desired length
-                    zero_array = np.zeros(num_zeros)
-
-                    combined_voltage = None
-                    new_start_index = None
-                    new_end_index = None
-                    
-                    # add new indexes adding duration of next signal
-                    combined_voltage = np.concatenate((previous_data, zero_array, ecg))
+                    # the gap is skipped in the file, not written as zeros (new_start_index below starts after it)
+                    self.recording.skip(num_zeros)
+                    self.recording.append_file(new_recording.chunks())
+                    combined_voltage = self.recording.array()
 
                     if ecg_type == 1:
-                        new_start_index = int((sum(previous_data)*100)+len(zero_array))
+                        new_start_index = int((np.sum(previous_data, dtype=np.float64)*100)+num_zeros)
                         
-                        new_end_index = int(new_start_index+((sum(ecg))*100))
+                        new_end_index = int(new_start_index+((np.sum(ecg, dtype=np.float64))*100))
                     else:
-                        new_start_index = len(previous_data)+len(zero_array)
+                        new_start_index = len(previous_data)+num_zeros
                         
                         new_end_index = new_start_index+len(ecg)-1
                         
@@ -1052,6 +1026,40 @@ class MyMainImport(QDialog):
             print(error_traceback)
 
 
+    def units_divisor(self, index, ecg_type, first_values):
+        """1000 if the RR intervals are converted from ms to s, from the first values of the file, else 1"""
+        if self.widget.w_list[index].data_units_combo.currentIndex() == 1 and ecg_type == 1: # rr and ms
+            subset = first_values[:100]  # Take the first 100 elements of the array
+            limit = np.any(subset < 4)
+
+            if limit:
+                msgBox = QMessageBox()
+                msgBox.setIcon(QMessageBox.Question)
+                msgBox.setText("The data units is set to miliseconds, but some values are low. Do you want to switch to seconds?")
+                msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+                result = msgBox.exec_()
+
+                if result:
+                    return 1000
+            else:
+                return 1000
+
+        elif self.widget.w_list[index].data_units_combo.currentIndex() == 0 and ecg_type == 1: # rr and s
+            subset = first_values[:100]  # Take the first 100 elements of the array
+            limit = np.any(subset > 60)
+
+            if limit:
+                msgBox = QMessageBox()
+                msgBox.setIcon(QMessageBox.Question)
+                msgBox.setText("The data units is set to seconds, but some values are high. Do you want to switch to miliseconds?")
+                msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+                result = msgBox.exec_()
+
+                if result:
+                    return 1000
+        return 1
+
+
     def getSingleFrequency(self, index, duration): # for csv, txt, dat
         # get the frequency and the global second values
         frequency = None
@@ -1093,11 +1101,8 @@ class MyMainImport(QDialog):
 
 
         if frequency is None:
-            df = pd.read_csv(self.widget.currentPaths[index], nrows=10000, usecols=[int(frequencyColumn)-1], header=None, sep=delimiter, engine="c")
-            df_last = pd.read_csv(self.widget.currentPaths[index], skiprows=duration-1, usecols=[int(frequencyColumn)-1], header=None, sep=delimiter, engine="c")
-            #time_values = df.iloc[:,int(frequencyColumn)-1]
-            time_values_first = df.iloc[:, 0].values[int(header_lines):]
-            last_value = df_last.iloc[:, 0].values
+            # first rows and last row only, the end of the file is read by seeking from it (data_import.file_preview)
+            time_values_first, last_value = time_column_values(self.widget.currentPaths[index], delimiter, int(frequencyColumn)-1, int(header_lines), rows=10000)
             time_values = np.append(time_values_first, last_value)
             new_frequency = 1
 
@@ -1784,11 +1789,31 @@ class MyMainImport(QDialog):
             # Open the HDF5 file in read mode
             with h5py.File(file_name, 'r') as file:
 
+                # files without version (first layout) have the same groups and load the same way
+                from logic import session_file
+                if session_file.format_version(file) > session_file.FORMAT_VERSION:
+                    loading_box.close()
+                    QMessageBox.critical(None, "Error", "This file was saved with a newer version of the program", QMessageBox.Ok)
+                    return
+
                 # group 1 has numbers and arrays
                 group1 = file['group1']
 
+                # edits journaled after the last save of the session are replayed on top of it
+                from logic import edit_journal
+                journal_id = file.attrs.get('journal_id')
+                journal_id = str(journal_id) if journal_id is not None else None
+                state = {'attributes': dict(group1.attrs),
+                         'datasets': {key: group1[key][()] for key in edit_journal.DATASETS if key in group1},
+                         'samples': dict(file['group2'].attrs),
+                         'flags': dict(file['group3'].attrs),
+                         'algorithm_outliers': dict(file['group4'].attrs)}
+                state = edit_journal.replay(state, edit_journal.read_edits(file_name, journal_id))
+                self.palms.SESSION_JOURNAL = (file_name, journal_id)
+
                 self.palms.FREQUENCY = group1.attrs['frequency'][()]
-                self.palms.ECG_DATA = group1['ecg_values'][:]
+                # mapped from the file: only the samples drawn or processed are read (session_file.read_signal)
+                self.palms.ECG_DATA = session_file.read_signal(file_name, group1['ecg_values'])
                 if 'start_indexes' in group1:
                     self.palms.START_INDEXES = np.array(group1['start_indexes'][:], dtype="int32")
                 if 'end_indexes' in group1:
@@ -1797,34 +1822,44 @@ class MyMainImport(QDialog):
                     self.palms.START_MISSING_INDEXES = np.array(group1['missing_start_indexes'][:], dtype="int32")
                 if 'missing_end_indexes' in group1:
                     self.palms.END_MISSING_INDEXES = np.array(group1['missing_end_indexes'][:], dtype="int32")
+                if 'noise_start_indexes' in state['datasets'] and 'noise_end_indexes' in state['datasets']:
+                    # noise partitions (times) of the replayed session: the noise ends where a segment starts
+                    # (START_INDEXES) and starts where a segment ends (END_INDEXES), with the missing regions
+                    frequency = group1.attrs['frequency'][()]
+                    noise_starts = np.rint(np.asarray(state['datasets']['noise_start_indexes'], dtype=float) * frequency)
+                    noise_ends = np.rint(np.asarray(state['datasets']['noise_end_indexes'], dtype=float) * frequency)
+                    self.palms.START_INDEXES = np.union1d(self.palms.START_MISSING_INDEXES, noise_ends).astype("int32")
+                    self.palms.END_INDEXES = np.union1d(self.palms.END_MISSING_INDEXES, noise_starts).astype("int32")
                 #extra: 
-                self.palms.noise_level = group1.attrs["noise_level"][()]
-                self.palms.beat_correction_level = group1.attrs["beat_correction_level"][()]
-                self.palms.current_outlier = group1.attrs["current_outlier"][()]
-                self.palms.RR_ONLY = group1.attrs["RR_ONLY"][()]
-                self.palms.DATA_TYPE = group1.attrs["DATA_TYPE"][()]
+                self.palms.noise_level = state['attributes']["noise_level"][()]
+                self.palms.beat_correction_level = state['attributes']["beat_correction_level"][()]
+                self.palms.current_outlier = state['attributes']["current_outlier"][()]
+                self.palms.RR_ONLY = state['attributes']["RR_ONLY"][()]
+                self.palms.DATA_TYPE = state['attributes']["DATA_TYPE"][()]
                 if 'original_rr' in group1:
                     from gui.tracking import Wave
-                    rr_values = np.array(group1["original_rr"][()])
+                    # one value per sample, mapped from the file as the signal
+                    rr_values = session_file.read_signal(file_name, group1["original_rr"])
                     rr_int_wave = Wave(rr_values, int(self.palms.FREQUENCY), offset=0, label='RR', unit='sec')
                     self.palms.original_rr = rr_int_wave
-                if 'original_fiducials' in group1:
-                    self.palms.original_fiducials = np.array(group1["original_fiducials"][()], dtype="int32")
+                if 'original_fiducials_samples' in group1:
+                    self.palms.original_fiducials = RRStore(group1["original_fiducials_samples"][()], group1["original_fiducials_intervals"][()], self.palms.FREQUENCY, len(self.palms.ECG_DATA))
+                elif 'original_fiducials' in group1: # files saved with the per-sample rr array
+                    self.palms.original_fiducials = RRStore.from_dense(group1["original_fiducials"][()], self.palms.FREQUENCY)
                 if 'original_annotations' in group1:
                     self.palms.original_annotations = np.array(group1["original_annotations"][()], dtype="int32")
-                if 'annotations' in group1:
-                    self.palms.annotations = np.array(group1["annotations"][()], dtype="int32")
-                if 'threshold_outliers' in group1:
-                   self.palms.threshold_outliers = np.array(group1["threshold_outliers"][()], dtype="int32")
+                if 'annotations' in state['datasets']:
+                    self.palms.annotations = np.array(state['datasets']["annotations"], dtype="int32")
+                if 'threshold_outliers' in state['datasets']:
+                   self.palms.threshold_outliers = np.array(state['datasets']["threshold_outliers"], dtype="int32")
                 
 
                 # group 2 has dictionary and boolean
-                group2 = file['group2']
                 # Initialize an empty dictionary to store the data
                 samples_dictionary = {}
 
                 # Iterate over the group's attributes
-                for attr_name, attr_value in group2.attrs.items():
+                for attr_name, attr_value in state['samples'].items():
                     # Split the attribute name to extract sample_name and key
                     parts = attr_name.split('_')
                     sample_name = parts[0]
@@ -1847,20 +1882,20 @@ class MyMainImport(QDialog):
                 self.palms.samples_dictionary = samples_dictionary
 
                 # group 3 for the boolean
-                group3 = file['group3']
-                self.palms.FIRST_DATETIME = group3.attrs['first_datetime']
-                self.palms.LAST_DATETIME = group3.attrs['last_datetime']
-                self.palms.CURRENT_FILE = group3.attrs['current_file']
-                self.palms.is_threshold_outlier = bool(group3.attrs['is_threshold_outlier'][()])
-                self.palms.is_algorithm_outlier = bool(group3.attrs['is_algorithm_outlier'][()])
-                self.palms.algorithm_correction = bool(group3.attrs['algorithm_correction'][()])
-
-                group4 = file['group4']
+                flags = state['flags']
+                self.palms.FIRST_DATETIME = flags['first_datetime']
+                self.palms.LAST_DATETIME = flags['last_datetime']
+                self.palms.CURRENT_FILE = flags['current_file']
+                self.palms.is_threshold_outlier = bool(flags['is_threshold_outlier'][()])
+                self.palms.is_algorithm_outlier = bool(flags['is_algorithm_outlier'][()])
+                self.palms.algorithm_correction = bool(flags['algorithm_correction'][()])
+
+                # group 4 has the algorithm outliers
                 # Initialize an empty dictionary to store the data
                 algorithm_outliers = {}
 
                 # Iterate over the group's attributes
-                for attr_name, attr_value in group4.attrs.items():
+                for attr_name, attr_value in state['algorithm_outliers'].items():
                     # Split the attribute name to extract sample_name and key
                     algorithm_outliers[attr_name] = attr_value
                 self.palms.algorithm_outliers = algorithm_outliers
@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 import datetime as dtime
 from pyecg import ECGRecord
+from data_import.file_preview import read_head, estimate_rows
 
 
 class SignalPreviewFrame(QtWidgets.QFrame):
@@ -341,12 +342,14 @@ class SignalPreviewPanel(QtWidgets.QWidget):
         if frequency != 0 and frequency != '':
             ten_minutes = int(frequency)*60
 
-            df = pd.read_csv(data_path, skiprows=int(header_lines), nrows=int(ten_minutes), header=None, sep=delimiter, engine="python")
+            df = read_head(data_path, delimiter, header_lines, rows=int(ten_minutes))
 
-            timeValues = np.arange(0, 600, 1/int(frequency))
+            # ten minutes, or the duration of the file estimated from its size
+            duration = min(600, estimate_rows(data_path, delimiter, header_lines)/int(frequency))
+            timeValues = np.arange(0, duration, 1/int(frequency))
 
         elif frequencyColumn != None:
-            df = pd.read_csv(data_path, skiprows=int(header_lines), nrows=int(10000), header=None, sep=delimiter, engine="python")
+            df = read_head(data_path, delimiter, header_lines, rows=int(10000))
             time_values = df.iloc[:,int(frequencyColumn)-1]
             new_frequency = 1
             if (dateType == "s"):
@@ -374,13 +377,15 @@ class SignalPreviewPanel(QtWidgets.QWidget):
         if frequency != "":
             ten_minutes = int(frequency)*60
 
-            df = pd.read_csv(data_path, skiprows=int(header_lines), nrows=int(ten_minutes), header=None, sep=delimiter, engine="python")
+            df = read_head(data_path, delimiter, header_lines, rows=int(ten_minutes))
 
-            timeValues = np.arange(0, 600, 1/int(frequency))
+            # ten minutes, or the duration of the file estimated from its size
+            duration = min(600, estimate_rows(data_path, delimiter, header_lines)/int(frequency))
+            timeValues = np.arange(0, duration, 1/int(frequency))
 
 
         if frequency == "":
-            df = pd.read_csv(data_path, skiprows=int(header_lines), nrows=int(10000), header=None, sep=delimiter, engine="python")
+            df = read_head(data_path, delimiter, header_lines, rows=int(10000))
             time_values = df.iloc[:,int(frequencyColumn)-1]
             new_frequency = 1
             if (dateType == "s"):
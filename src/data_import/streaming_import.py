@@ -0,0 +1,75 @@
+"""
+Import of csv, txt and dat recordings without holding them in memory. The column of the signal is parsed by chunks of
+CHUNK_ROWS rows and each chunk is written at the end of a temporary file, which is then mapped as the signal array
+(np.memmap): the operating system keeps in memory only the parts being used. The gaps between the files of a multiple
+import are only skipped in the file, so they read as zeros without being written (the file has holes where the file
+system supports sparse files, otherwise the zeros take disk space, not memory). The samples of the files and of the
+gaps are in the start/end indexes of the import, which the databases read through logic.segmented_signal.
+"""
+import tempfile
+
+import numpy as np
+
+CHUNK_ROWS = 1_000_000  # rows parsed at a time
+DTYPE = np.float32
+
+
+class RecordingWriter:
+    """signal samples written one after the other in a temporary file, with gaps of samples not written"""
+
+    def __init__(self, dtype=DTYPE):
+        self.dtype = np.dtype(dtype)
+        # removed by the system when the file and its maps are closed
+        self.file = tempfile.TemporaryFile()
+        self.length = 0
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.seek(self.length * self.dtype.itemsize)
+        self.file.write(values.tobytes())
+        self.length += len(values)
+
+    def skip(self, samples):
+        """gap of samples: the file is extended without writing them"""
+        if samples < 0:
+            raise ValueError("The files overlap: a gap cannot be negative")
+        if samples == 0:
+            return
+        self.length += samples
+        self.file.truncate(self.length * self.dtype.itemsize)
+
+    def append_file(self, chunks, divisor=None):
+        """
+        writes the chunks (arrays) of one file, all divided by divisor(first chunk) (units), and returns the (start,
+        end) samples of the file
+        """
+        start = self.length
+        factor = None
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=self.dtype)
+            if factor is None:
+                factor = divisor(chunk) if divisor is not None else 1
+            self.append(chunk / factor if factor != 1 else chunk)
+        return start, self.length
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """the samples written, by chunks of chunk_rows"""
+        values = self.array()
+        for start in range(0, len(values), chunk_rows):
+            yield values[start:start + chunk_rows]
+
+    def array(self):
+        """the samples written, mapped from the file"""
+        self.file.flush()
+        if self.length == 0:
+            return np.array([], dtype=self.dtype)
+        return np.memmap(self.file, dtype=self.dtype, mode='r+', shape=(self.length,))
+
+
+def read_column_chunks(path, column, delimiter, header_lines=0, chunk_rows=CHUNK_ROWS):
+    """values of the column (0 based) of a delimited text file after header_lines rows, by chunks of chunk_rows"""
+    import pandas as pd
+    reader = pd.read_csv(path, usecols=[column], header=None, sep=delimiter, engine="c", skiprows=header_lines,
+                         chunksize=chunk_rows)
+    for chunk in reader:
+        yield chunk.iloc[:, 0].to_numpy(dtype=DTYPE)
@@ -0,0 +1,71 @@
+"""
+Computation of the results in the threads of a QThreadPool, so the interface keeps responding while the spectra,
+the DFA or the sliding windows of a long recording are computed. A task only computes numbers: its result is sent
+back to the main thread, which creates the plots (matplotlib and Qt objects are only used from the main thread).
+Starting a new task cancels the previous one of the same BackgroundResults: it is removed from the pool if it did not
+start yet, and its result is dropped otherwise (a running computation cannot be interrupted).
+"""
+import traceback
+
+from qtpy import QtCore
+
+
+class TaskSignals(QtCore.QObject):
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+
+
+class ResultTask(QtCore.QRunnable):
+    """runs compute() in a thread of the pool and emits its result, unless cancelled"""
+
+    def __init__(self, compute):
+        super().__init__()
+        self.compute = compute
+        self.cancelled = False
+        self.signals = TaskSignals()
+        # the pool must not delete the task, the panel keeps it to cancel it
+        self.setAutoDelete(False)
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            result = self.compute()
+        except Exception:
+            if not self.cancelled:
+                self.signals.failed.emit(traceback.format_exc())
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+
+class BackgroundResults:
+    """the last task started, whose result is shown when it finishes"""
+
+    def __init__(self, pool=None):
+        self.pool = pool if pool is not None else QtCore.QThreadPool.globalInstance()
+        self.task = None
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancelled = True
+            self.pool.tryTake(self.task)
+            self.task = None
+
+    def run(self, compute, done, failed=None):
+        """compute() in the pool, then done(result) or failed(traceback) in the main thread; cancels the previous task"""
+        self.cancel()
+        task = ResultTask(compute)
+        # connected here, in the main thread, so the results are delivered to it
+        task.signals.finished.connect(lambda result: self._finish(task, done, result))
+        if failed is not None:
+            task.signals.failed.connect(lambda error: self._finish(task, failed, error))
+        self.task = task
+        self.pool.start(task)
+
+    def _finish(self, task, callback, value):
+        # results of a cancelled task still queued in the event loop are dropped
+        if task is not self.task or task.cancelled:
+            return
+        self.task = None
+        callback(value)
@@ -14,12 +14,15 @@ from config import tooltips
 from logic.operation_mode.partitioning import SinglePartition, Partitions
 from logic.operation_mode.noise_partitioning import NoisePartition, NoisePartitions
 from logic.operation_mode.rr_noise_partitioning import RRNoisePartition, RRNoisePartitions
+from logic import outliers, results_export
 from qtpy.QtCore import Slot, Signal
 import os
 from config import settings
 import json
 #from numba import jit
 
+JOURNAL_INTERVAL = 5000  # ms between the records of the edit journal
+
 
 class LeftOptionsFrame(QtWidgets.QFrame):
 
@@ -475,6 +478,12 @@ class LeftOptionsPanel(QtWidgets.QWidget):
 
         frame.setLayout(main_layout)
 
+        # edits since the last save are journaled next to the session file (logic/edit_journal.py)
+        self.journal = None
+        self.journal_timer = QtCore.QTimer(self)
+        self.journal_timer.timeout.connect(self.record_edits)
+        self.journal_timer.start(JOURNAL_INTERVAL)
+
 
     def open_settings(self):
         settings_window = settings.SettingsWindow()
@@ -548,8 +557,10 @@ class LeftOptionsPanel(QtWidgets.QWidget):
 
             # reset annotations and rr values to original
             Database.get()._set_annotation_from_idx('rpeak', PALMS.get().original_annotations)
-            PALMS.get().rr_intervals = PALMS.get().original_fiducials
-            PALMS.get().fiducials = PALMS.get().original_rr
+            PALMS.get().rr_intervals = PALMS.get().original_fiducials.copy()
+            # single beat edits change the RR wave in place, so it must not share values with the original
+            import copy
+            PALMS.get().fiducials = copy.deepcopy(PALMS.get().original_rr)
 
             # decide if activate algorithm or cancel it depending on last state
             if self.algorithm_active: # activate
@@ -829,40 +840,13 @@ class LeftOptionsPanel(QtWidgets.QWidget):
             
             return
         
-        minimum_noise_beats = 3
-
         rr_intervals = PALMS.get().original_fiducials
 
         # just missing partitions, not all noise
         noise_start_points = RRNoisePartitions.all_startpoints()
         noise_end_points = RRNoisePartitions.all_endpoints()
 
-        # if there are noise segments, iterate through them. Otherwise start in 0 and end in last sample
-        if (noise_start_points.size == 0):
-            noise_end_samples = np.append(noise_end_points, 0)
-            noise_start_samples = np.append(noise_start_points, len(PALMS.get().ECG_DATA)-1)
-
-        else:
-            # check if first part of the signal is good (add initial point) or noise (delete initial point)
-            if (noise_start_points[0] != 0):
-                noise_end_points = np.insert(noise_end_points, 0, 0)
-            else:
-                noise_start_points = np.delete(noise_start_points, 0)
-        
-            try:
-                noise_start_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_start_points))
-            except:
-                noise_start_samples = np.array([], dtype="int32")
-            try:
-                noise_end_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_end_points))
-            except:
-                noise_end_samples = np.array([], dtype="int32")
-
-            # same test for last part of the signal
-            if (noise_end_samples[-1] != len(PALMS.get().ECG_DATA)):
-                noise_start_samples = np.append(noise_start_samples, len(PALMS.get().ECG_DATA))
-            else:
-                noise_end_samples = np.delete(noise_end_samples, -1)
+        noise_end_samples, noise_start_samples = outliers.clean_segments(noise_start_points, noise_end_points, len(PALMS.get().ECG_DATA), PALMS.get().from_time_to_closest_sample)
 
         if (self.noise_level.currentIndex() == 1):
             all_outliers = self.outlier_threshold(0.45, 10, True, False)
@@ -933,31 +917,12 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         annotations = PALMS.get().original_annotations
         annotations = np.array(annotations) # points in which there is peak
         annotations = np.sort(annotations)
-        last_peak_sample = round(annotations[-1])
-
         noise_length = 0 # in time
         noise_count = 0
 
-        # loop from end to start
-        for new_end_sample, new_start_sample in zip(noise_end_samples, noise_start_samples): 
-
-            # i need to get the times of the outliers and get the ones in this interval
-            current_outliers = all_outliers[(all_outliers < new_start_sample) & (all_outliers > new_end_sample)]
-
-            # same for outlier samples (i can use same indexes as before)
-            current_samples = all_samples[(all_outliers < new_start_sample) & (all_outliers > new_end_sample)]
+        noise_intervals = outliers.noise_clusters(all_outliers, all_samples, annotations, rr_intervals, noise_end_samples, noise_start_samples, noise_size_limit, noise_length_limit, PALMS.get().from_sample_to_time)
+        for new_start_noise, new_end_noise in noise_intervals:
 
-
-            current_outliers = np.array(current_outliers)
-            current_outliers = np.append(current_outliers, PALMS.get().from_sample_to_time(last_peak_sample))
-            #current_outliers = current_outliers.astype(int)
-            current_samples = np.array(current_samples)
-            current_samples = np.append(current_samples, last_peak_sample)
-            current_samples = current_samples.astype(int)
-            
-            new_start_noise, new_end_noise = LeftOptionsPanel.get_noise_loop(current_outliers, current_samples, annotations, noise_length_limit, last_peak_sample, minimum_noise_beats, rr_intervals, noise_size_limit, new_start_sample)
-
-            
             # after algorithm, whe start noise and end filled
             for new_start, new_end in zip(new_start_noise, new_end_noise): 
                 
@@ -1008,64 +973,6 @@ class LeftOptionsPanel(QtWidgets.QWidget):
 
         loading_box.close()
 
-    #@jit(nopython=True, cache=True)
-    def get_noise_loop(current_outliers, current_samples, annotations, noise_length_limit, last_peak_sample, minimum_noise_beats, rr_intervals, noise_size_limit, new_start_sample):
-        
-        new_start_noise = np.empty(0, dtype=np.float64)
-        new_end_noise = np.empty(0, dtype=np.float64)
-
-        current_cluster = np.empty(0, dtype=np.float64)
-        current_cluster_sample = np.empty(0, dtype=np.int32) 
-        previous_sample = 0
-
-        for i in range(len(current_outliers)):
-            current_outlier = current_outliers[i]
-            current_sample = current_samples[i]
-
-            midle_annotations = annotations[(annotations > previous_sample) & (annotations <= current_sample)]
-
-            if len(midle_annotations) < noise_length_limit:
-                current_cluster = np.append(current_cluster, current_outlier)
-                current_cluster_sample = np.append(current_cluster_sample, current_sample)
-
-                if current_sample >= last_peak_sample:
-                    if len(current_cluster) > minimum_noise_beats:
-                        outliers_times = rr_intervals[current_cluster_sample]
-                        outliers_length = np.sum(outliers_times)
-                        total_times = rr_intervals[current_cluster_sample[0]:current_cluster_sample[-1]]
-                        total_length = np.sum(total_times)
-                        outliers_proportion = outliers_length / total_length
-
-                        if outliers_proportion > noise_size_limit:
-                            new_start_noise = np.append(new_start_noise, current_cluster[0])
-                            new_end_noise = np.append(new_end_noise, new_start_sample)
-
-                    current_cluster = np.empty(0, dtype=np.float64)
-                    current_cluster_sample = np.empty(0, dtype=np.int32) 
-                    current_cluster = np.append(current_cluster, current_outlier)
-                    current_cluster_sample = np.append(current_cluster_sample, current_sample)
-
-            else:
-                if len(current_cluster) > minimum_noise_beats:
-                    outliers_times = rr_intervals[current_cluster_sample]
-                    outliers_length = np.sum(outliers_times)
-                    total_times = rr_intervals[current_cluster_sample[0]:current_cluster_sample[-1]]
-                    total_length = np.sum(total_times)
-                    outliers_proportion = outliers_length / total_length
-
-                    if outliers_proportion > noise_size_limit:
-                        new_start_noise = np.append(new_start_noise, current_cluster[0])
-                        new_end_noise = np.append(new_end_noise, current_cluster[-1])
-
-                current_cluster = np.empty(0, dtype=np.float64)
-                current_cluster_sample = np.empty(0, dtype=np.int32) 
-
-            previous_sample = current_sample
-
-        return new_start_noise, new_end_noise
-
-
-
     #@jit
     def outlier_decision_algorithm(self, useOriginal, updatePalms):
         # Create and show the "Loading data" message box
@@ -1080,32 +987,7 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         noise_start_points = RRNoisePartitions.all_startpoints()
         noise_end_points = RRNoisePartitions.all_endpoints()
 
-        # if there are noise segments, iterate through them. Otherwise start in 0 and end in last sample
-        if (noise_start_points.size == 0):
-            noise_end_samples = np.append(noise_end_points, 0)
-            noise_start_samples = np.append(noise_start_points, len(PALMS.get().ECG_DATA)-1)
-
-        else:
-            # check if first part of the signal is good (add initial point) or noise (delete initial point)
-            if (noise_start_points[0] != 0):
-                noise_end_points = np.insert(noise_end_points, 0, 0)
-            else:
-                noise_start_points = np.delete(noise_start_points, 0)
-        
-            try:
-                noise_start_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_start_points))
-            except:
-                noise_start_samples = np.array([], dtype="int32")
-            try:
-                noise_end_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_end_points))
-            except:
-                noise_end_samples = np.array([], dtype="int32")
-
-            # same test for last part of the signal
-            if (noise_end_samples[-1] != len(PALMS.get().ECG_DATA)):
-                noise_start_samples = np.append(noise_start_samples, len(PALMS.get().ECG_DATA))
-            else:
-                noise_end_samples = np.delete(noise_end_samples, -1)
+        noise_end_samples, noise_start_samples = outliers.clean_segments(noise_start_points, noise_end_points, len(PALMS.get().ECG_DATA), PALMS.get().from_time_to_closest_sample)
 
 
         # get previous annotations
@@ -1117,117 +999,17 @@ class LeftOptionsPanel(QtWidgets.QWidget):
             annotations = [fiducial.annotation.idx for fiducial in annotation.AnnotationConfig.get().fiducials]
             annotations = np.array(annotations[0]) # points in which there is peak
 
-        start_beat = 0
-
-        long_short_beats = np.empty(0, dtype=np.int64)
-        miss_beats = np.empty(0, dtype=np.int64)
-        extra_beats = np.empty(0, dtype=np.int64)
-        ectopic_beats = np.empty(0, dtype=np.int64)
-
-        # loop from end to start
-        previous_start = 0
-        for new_end, new_start in zip(noise_end_samples, noise_start_samples): 
-            
-            if (new_end != 0):
-                start_beat = len(annotations[annotations < new_end])-1
-
-            rr_intervals_local = rr_intervals[int(new_end):int(new_start)]
-
-            rr_intervals_values = rr_intervals_local[rr_intervals_local != 0]
-
-            if rr_intervals_values.size == 0:
-                continue
-            
-            current_extra_beats, current_miss_beats, current_ectopic_beats, current_long_short_beats = LeftOptionsPanel.algorithm_loop(rr_intervals_values, start_beat)
-            extra_beats = np.concatenate((extra_beats, current_extra_beats))
-            miss_beats = np.concatenate((miss_beats, current_miss_beats))
-            ectopic_beats = np.concatenate((ectopic_beats, current_ectopic_beats))
-            long_short_beats = np.concatenate((long_short_beats, current_long_short_beats))
-
-            previous_start = new_start
-
+        extra_beats, miss_beats, ectopic_beats, long_short_beats = outliers.algorithm_beats(noise_end_samples, noise_start_samples, rr_intervals, annotations)
 
         PALMS.get().algorithm_outliers = {}
 
-        # dRR is the difference of r-intervals, so the difference of difference of beats
-        # dRR is supposed to be of size (len(peaks)-1), so len(rr_intervals)
-        # an outliers in dRR[i] means an outlier in peak[i+1]
-        extra_beats = np.array(extra_beats)
-        extra_beats = np.unique(extra_beats)
-        miss_beats = np.array(miss_beats)
-        miss_beats = np.unique(miss_beats)
-        ectopic_beats = np.array(ectopic_beats)
-        ectopic_beats = np.unique(ectopic_beats)
-        long_short_beats = np.array(long_short_beats)
-        long_short_beats = np.unique(long_short_beats)
-
         if updatePalms:
+            from logic.databases.DatabaseHandler import Database
+            PALMS.get().algorithm_outliers, annotations = outliers.apply_algorithm(annotations, extra_beats, miss_beats, ectopic_beats, long_short_beats,
+                                                                                   lambda sample, change_type: PALMS.get().singleUpdateRR(sample, change_type, False),
+                                                                                   lambda new_annotations: Database.get()._set_annotation_from_idx('rpeak', new_annotations),
+                                                                                   PALMS.get().from_sample_to_time)
 
-            for extra_beat in extra_beats: # in peak index
-                if extra_beat in PALMS.get().algorithm_outliers.get("delete", np.array([],dtype="int32")):
-                    continue
-                # delete peak in (extra_beat+1)
-                previous_beat = annotations[extra_beat+1]
-                annotations = np.delete(annotations, (extra_beat+1))
-                previous_values = PALMS.get().algorithm_outliers.get("delete", np.array([],dtype="int32"))
-                beat_time = PALMS.get().from_sample_to_time(previous_beat)
-                previous_values = np.append(previous_values, beat_time)
-                PALMS.get().algorithm_outliers["delete"] = previous_values
-                # delete value to miss and interpolated, as one less value on the rr_intervals (only values after outlier)
-                extra_beats[extra_beats > extra_beat+1] -= 1
-                miss_beats[miss_beats > extra_beat+1] -= 1
-                ectopic_beats[ectopic_beats > extra_beat+1] -= 1
-                long_short_beats[long_short_beats > extra_beat+1] -= 1
-                PALMS.get().singleUpdateRR(previous_beat, 1, False)
-                from logic.databases.DatabaseHandler import Database
-                Database.get()._set_annotation_from_idx('rpeak', annotations)
-
-            for miss_beat in miss_beats: # in peak index
-                if miss_beat in PALMS.get().algorithm_outliers.get("delete", np.array([],dtype="int32")) or miss_beat in PALMS.get().algorithm_outliers.get("add", np.array([],dtype="int32")):
-                    continue
-                # add peak between (extra_beat), which is previous, and (extra_beat+1), which is current
-                previous_annotation = annotations[miss_beat]
-                current_annotation = annotations[miss_beat+1]
-                new_annotation = int((previous_annotation+current_annotation)/2)
-                annotations = np.insert(annotations, (miss_beat+1), new_annotation)
-                previous_values = PALMS.get().algorithm_outliers.get("add", np.array([],dtype="int32"))
-                beat_time = PALMS.get().from_sample_to_time(new_annotation)
-                previous_values = np.append(previous_values, beat_time)
-                PALMS.get().algorithm_outliers["add"] = previous_values
-                # add value to miss interpolated, as one more value on the rr_intervals (only values after outlier)
-                # no need to change miss, as outliers are stored as sample number
-                miss_beats[miss_beats > miss_beat] += 1
-                ectopic_beats[ectopic_beats > miss_beat] += 1
-                long_short_beats[long_short_beats > miss_beat] += 1
-                PALMS.get().singleUpdateRR(new_annotation, 0, False)
-                from logic.databases.DatabaseHandler import Database
-                Database.get()._set_annotation_from_idx('rpeak', annotations)
-
-            for interpolated_beat in ectopic_beats:
-                if interpolated_beat in PALMS.get().algorithm_outliers.get("delete", np.array([],dtype="int32")) or interpolated_beat in PALMS.get().algorithm_outliers.get("add", np.array([],dtype="int32")) or interpolated_beat in PALMS.get().algorithm_outliers.get("interpolate", np.array([],dtype="int32")):
-                    continue
-                beat_sample = annotations[interpolated_beat+1]
-                beat_time = PALMS.get().from_sample_to_time(beat_sample)
-                previous_values = PALMS.get().algorithm_outliers.get("interpolate", np.array([],dtype="int32"))
-                previous_values = np.append(previous_values, beat_time)
-                PALMS.get().algorithm_outliers["interpolate"] = previous_values
-                PALMS.get().singleUpdateRR(beat_sample, 2, False)
-                from logic.databases.DatabaseHandler import Database
-                Database.get()._set_annotation_from_idx('rpeak', annotations)
-
-        
-            for long_short_beat in long_short_beats:
-                if long_short_beat in PALMS.get().algorithm_outliers.get("delete", []) or long_short_beat in PALMS.get().algorithm_outliers.get("add", []) or long_short_beat in PALMS.get().algorithm_outliers.get("interpolate", []):
-                    continue
-                beat_sample = annotations[long_short_beat+1]
-                beat_time = PALMS.get().from_sample_to_time(beat_sample)
-                previous_values = PALMS.get().algorithm_outliers.get("interpolate", [])
-                previous_values = np.append(previous_values, beat_time)
-                PALMS.get().algorithm_outliers["interpolate"] = previous_values
-                PALMS.get().singleUpdateRR(beat_sample, 2, False)
-                from logic.databases.DatabaseHandler import Database
-                Database.get()._set_annotation_from_idx('rpeak', annotations)
-            
             outliers_number = len(miss_beats)+len(extra_beats)+len(ectopic_beats)+len(long_short_beats)
             total_beats = len(annotations)
             outliers_ratio = round(100*outliers_number/total_beats, 2)
@@ -1249,144 +1031,6 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         return new_outliers
     
     
-    #@jit(nopython=True, cache=True)
-    def algorithm_loop(rr_intervals_values, start_beat):
-
-        long_short_beats = np.empty(0, dtype=np.int64)
-        miss_beats = np.empty(0, dtype=np.int64)
-        extra_beats = np.empty(0, dtype=np.int64)
-        ectopic_beats = np.empty(0, dtype=np.int64)
-
-        dRRs = np.diff(rr_intervals_values)
-        dRRs = np.concatenate((dRRs[:0], np.array([0]), dRRs[0:]))
-            
-
-        # Window size
-        window_size = 45
-        threshold1 = np.empty(0, dtype=np.float64)
-        alpha = 5.2
-        dRR = np.empty(0, dtype=np.float64)
-
-        # Iterate over each element in the array
-        for i in range(len(dRRs)):
-            # Calculate the indices for the window
-            start_index = max(i - window_size, 0)
-            end_index = min(i + window_size, len(dRRs)-1)
-    
-            # Extract the window of values
-            window = dRRs[start_index:end_index]
-
-            # Calculate the absolute values
-            abs_window = np.abs(window)
-
-            if len(abs_window)==0:
-                continue
-    
-            # Calculate the quartile deviation
-            qdeviation = np.percentile(abs_window, 75) - np.percentile(abs_window, 25)
-
-            threshold1 = np.append(threshold1, alpha*qdeviation)
-
-            dRR = np.append(dRR, dRRs[i]/(alpha*qdeviation))
-
-        m_window_size = 5
-        mRRs = np.empty(0, dtype=np.float64)
-        medRR = np.empty(0, dtype=np.float64)
-
-        for i in range(len(rr_intervals_values)):
-            # mrr
-            start_index = max(i - m_window_size, 0)
-            end_index = min(i + m_window_size, len(rr_intervals_values)-1)
-
-            window = rr_intervals_values[start_index:end_index]
-
-            medRR = np.append(medRR, np.median(window))
-
-            if ((rr_intervals_values[i] - np.median(window)) < 0):
-                mRRs = np.append(mRRs, 2 * (rr_intervals_values[i] - np.median(window)))
-            else:
-                mRRs = np.append(mRRs, rr_intervals_values[i] - np.median(window))
-
-        # Window size
-        window_size = 45
-        threshold2 = np.empty(0, dtype=np.float64)
-        alpha = 5.2
-        mRR = np.empty(0, dtype=np.float64)
-
-        # Iterate over each element in the array
-        for i in range(len(mRRs)):
-            # Calculate the indices for the window
-            start_index = max(i - window_size, 0)
-            end_index = min(i + window_size, len(mRRs)-1)
-    
-            # Extract the window of values
-            window = mRRs[start_index:end_index]
-
-            # Calculate the absolute values
-            abs_window = np.abs(window)
-
-            if len(abs_window)==0:
-                continue
-    
-            # Calculate the quartile deviation
-            qdeviation = np.percentile(abs_window, 75) - np.percentile(abs_window, 25)
-
-            threshold2 = np.append(threshold2, alpha*qdeviation)
-
-            mRR = np.append(mRR, mRRs[i]/(alpha*qdeviation))
-
-
-        s11 = dRR
-        window_size = 1
-        s12 = np.empty(0, dtype=np.float64)
-        # Iterate over each element in the array
-        for i in range(len(dRR)):
-            # Calculate the indices for the window
-            start_index = max(i - window_size, 0)
-            end_index = min(i + window_size + 1, len(dRR)-1)
-
-            if (dRR[i] > 0):
-                s12 = np.append(s12, max(dRR[start_index], dRR[end_index]))
-            else:
-                s12 = np.append(s12, min(dRR[start_index], dRR[end_index]))
-
-
-        # decision algorithm. 
-        c1 = 0.13
-        c2 = 0.17
-
-        for i in range(len(dRR)):
-            if (np.abs(dRR[i]) > 1):
-                eq1 = ((s11[i] > 1) and (s12[i] < (-c1*s11[i] + c2)))
-                eq2 = ((s11[i] < -1) and (s12[i] > (-c1*s11[i] - c2)))
-
-                if (eq1 or eq2):
-                    ectopic_beats = np.append(ectopic_beats, start_beat+i)
-                    continue
-            if (i < (len(dRR)-1)):
-                if ((np.abs(dRR[i]) > 1) or (np.abs(mRR[i]) > 3)):
-                    eq3 = ((np.sign(dRR[i])*dRR[i+1]) < -1)
-                    eq4 = (np.abs(mRR[i]) > 3)
-                    eq5 = False
-                    if (i < (len(dRR)-2)):
-                        eq5 = ((np.sign(dRR[i])*dRR[i+2]) < -1)
-                    if (eq3 or eq4 or eq5):
-                        eq6 = ((np.abs(rr_intervals_values[i]/2 - medRR[i])) < threshold2[i])
-                        eq7 = ((np.abs(rr_intervals_values[i] + rr_intervals_values[i+1] - medRR[i]) < threshold2[i]))
-                        if (eq6):
-                            miss_beats = np.append(miss_beats, start_beat+i)
-                        elif (eq7):
-                            extra_beats = np.append(extra_beats, start_beat+i) # this and next
-                        elif (eq5):
-                            long_short_beats = np.append(long_short_beats, start_beat+i) # this and next
-                        elif (eq3 or eq4):
-                            long_short_beats = np.append(long_short_beats, start_beat+i)
-
-
-
-        return extra_beats, miss_beats, ectopic_beats, long_short_beats
-
-
     #@jit
     def outlier_threshold(self, threshold, window_size, useOriginal, updatePalms):
         # Create and show the "Loading data" message box
@@ -1401,32 +1045,7 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         noise_start_points = RRNoisePartitions.all_startpoints()
         noise_end_points = RRNoisePartitions.all_endpoints()
 
-        # if there are noise segments, iterate through them. Otherwise start in 0 and end in last sample
-        if (noise_start_points.size == 0):
-            noise_end_samples = np.append(noise_end_points, 0)
-            noise_start_samples = np.append(noise_start_points, len(PALMS.get().ECG_DATA)-1)
-
-        else:
-            # check if first part of the signal is good (add initial point) or noise (delete initial point)
-            if (noise_start_points[0] != 0):
-                noise_end_points = np.insert(noise_end_points, 0, 0)
-            else:
-                noise_start_points = np.delete(noise_start_points, 0)
-        
-            try:
-                noise_start_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_start_points))
-            except:
-                noise_start_samples = np.array([], dtype="int32")
-            try:
-                noise_end_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(np.array(noise_end_points))
-            except:
-                noise_end_samples = np.array([], dtype="int32")
-
-            # same test for last part of the signal
-            if (noise_end_samples[-1] != len(PALMS.get().ECG_DATA)):
-                noise_start_samples = np.append(noise_start_samples, len(PALMS.get().ECG_DATA))
-            else:
-                noise_end_samples = np.delete(noise_end_samples, -1)
+        noise_end_samples, noise_start_samples = outliers.clean_segments(noise_start_points, noise_end_points, len(PALMS.get().ECG_DATA), PALMS.get().from_time_to_closest_sample)
 
 
         # get previous annotations
@@ -1438,7 +1057,7 @@ class LeftOptionsPanel(QtWidgets.QWidget):
             annotations = np.array(annotations[0]) # points in which there is peak
         frequency = PALMS.get().FREQUENCY
 
-        new_outliers = LeftOptionsPanel.threshold_loop(noise_end_samples, noise_start_samples, rr_intervals, window_size, threshold, annotations, frequency)
+        new_outliers = outliers.threshold_loop(noise_end_samples, noise_start_samples, rr_intervals, window_size, threshold, annotations, frequency)
         
 
         for outlier in new_outliers:
@@ -1458,45 +1077,6 @@ class LeftOptionsPanel(QtWidgets.QWidget):
 
         return new_outliers
     
-    #@jit(nopython=True, cache=True)
-    def threshold_loop(noise_end_samples, noise_start_samples, rr_intervals, window_size, threshold, annotations, frequency):
-        threshold_outliers = np.empty(0, dtype=np.int64)
-        # loop from end to start
-        for new_end, new_start in zip(noise_end_samples, noise_start_samples): 
-
-            start_beat = 0
-            if (new_end != 0):
-                start_beat = len(annotations[annotations < new_end])
-
-
-            rr_intervals_local = rr_intervals[int(new_end):int(new_start)]
-
-            rr_intervals_values = rr_intervals_local[rr_intervals_local != 0]
-            
-
-            # Iterate over each element in the array
-            for i in range(len(rr_intervals_values)):
-                # Calculate the indices for the window
-                start_index = max(i - window_size, 0)
-                end_index = min(i + window_size, len(rr_intervals_values)-1)
-    
-                # Extract the window of values
-                window = rr_intervals_values[start_index:end_index]
-
-                mean_rr = np.mean(window)
-
-                if ((mean_rr < (rr_intervals_values[i] - threshold)) or (mean_rr > (rr_intervals_values[i] + threshold))):
-                    threshold_outliers = np.append(threshold_outliers, i+start_beat)
-
-
-        new_outliers = np.empty(0, dtype=np.float64)
-        for outlier in threshold_outliers:
-            outlier = min(outlier+1, len(annotations)-2)
-            sample_index = int(annotations[outlier+1])
-            new_outliers = np.append(new_outliers, sample_index/frequency)
-
-        return new_outliers
-
     def mainExportResults(self):
         loading_box = QMessageBox()
         loading_box.setWindowTitle("Exporting results")
@@ -1520,7 +1100,6 @@ class LeftOptionsPanel(QtWidgets.QWidget):
 
     #@jit
     def exportResults(self):
-        import csv
         from gui.viewer import PALMS
 
         if len(Partitions.all_startpoints()) == 0:
@@ -1531,516 +1110,45 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         # Open the file dialog to choose the output file path
         output_file, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Save CSV', '', 'CSV Files (*.csv)')
 
-        # ---------------------------SOFTWARE INFORMATION----------------------
-        # define data
-        current_time = dtime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        rows = [
-            [f"HRV analysis results of {current_time}"],
-            ["Program name"],
-            ["Released on December 2023"],
-            [""]
-        ]
-        # writing in csv
-        if output_file:
-           # Write the data to the CSV file
-            with open(output_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
-
-        # ---------------------------FILE INFORMATION----------------------
-        # define data
-        file_name = PALMS.get().CURRENT_FILE
-        measurement_date_start = PALMS.get().FIRST_DATETIME
-        measurement_date_start = measurement_date_start.replace('--', ' ').strip()
-        measurement_date_end = PALMS.get().LAST_DATETIME
-        measurement_date_end = measurement_date_end.replace('--', ' ').strip()
-        time_duration = dtime.datetime.strptime(measurement_date_end, "%d %H:%M:%S") - dtime.datetime.strptime(measurement_date_start, "%d %H:%M:%S")
-        measurement_rate = PALMS.get().FREQUENCY
-        rows = [
-            [f"File name: {file_name}"],
-            [f"Measurement date (start): {measurement_date_start}"],
-            [f"Measurement date (end): {measurement_date_end}"],
-            [f"Time duration (d h:min:s): {time_duration}"],
-            [f"Measurement rate (hz): {measurement_rate}"],
-            [""]
-        ]
-        # writing in csv
-        if output_file:
-           # Write the data to the CSV file
-            with open(output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
+        if not output_file:
+            return
 
         # ---------------------------PARAMETERS----------------------
-        # define data
-        samples_number = len(Partitions.all_startpoints())
-        detrending_method_index = self.settings['detrending_method']
-        if (detrending_method_index == 0):
-            detrending_method = "None"
-        if (detrending_method_index == 1):
-            detrending_method = "Smoothn priors (lambda="+str(self.settings["smoothing_parameter"])+")"
-        if (detrending_method_index == 2):
-            detrending_method = "1st order Polynomial"
-        if (detrending_method_index == 3):
-            detrending_method = "2nd order Polynomial"
-        if (detrending_method_index == 4):
-            detrending_method = "3rd order Polynomial"
-
-        hr_as_average_of = str(self.settings["average_hr"])+" beats"
-        nnxx_threshold = str(self.settings["nnxx_threshold"])+" ms"
-        vlf_min = PALMS.get().viewer.results_w.vlf_min.text()
-        vlf_max = PALMS.get().viewer.results_w.vlf_max.text()
-        lf_min = PALMS.get().viewer.results_w.lf_min.text()
-        lf_max = PALMS.get().viewer.results_w.lf_max.text()
-        hf_min = PALMS.get().viewer.results_w.hf_min.text()
-        hf_max = PALMS.get().viewer.results_w.hf_max.text()
-        interpolation_rate = "4 hz"
-        spectrum_points = str(self.settings["spectrum_points"])+" points/Hz"
-        if (self.settings["lomb_scargle"] == False):
-            ma_order = self.settings["ma_order"]
-        else:
-            ma_order = "-"
-        ar_model_order = self.settings["ar_order"]
-        apply_detrending = self.settings["nonlinear_detrending"]
-        entropy_dimension = self.settings["embedding_dimension"]
-        entropy_tolerance = str(self.settings["tolerance"])+" x SD"
-        dfa_short_term = str(self.settings["n1_min"])+"-"+str(self.settings["n1_max"])+" beats"
-        dfa_long_term = str(self.settings["n2_min"])+"-"+str(self.settings["n2_max"])+" beats"
-        rows = [
-            ["Parameters"],
-            [f"Number of samples: {samples_number}"],
-            [f"Detrending method: {detrending_method}"],
-            [f"Min/Max HR as average of: {hr_as_average_of}"],
-            [f"Threshold for NNxx/pNNxx: {nnxx_threshold}"],
-            ["Frequency bands"],
-            [f"VLF: {vlf_min} - {vlf_max} Hz"],
-            [f"LF: {lf_min} - {lf_max} Hz"],
-            [f"HF: {hf_min} - {hf_max} Hz"],
-            [f"Interpolation rate: {interpolation_rate}"],
-            [f"Spectrum points: {spectrum_points}"],
-            ["FFT spectrum options"],
-            ["AR spectrum options"],
-            [f"AR model order: {ar_model_order}"],
-            [f"FFT moving average order: {ma_order}"],
-            [f"Apply detrending for nonlinear analysis: {apply_detrending}"],
-            [f"Entropy, embedding dimension: {entropy_dimension}"],
-            [f"Entropy, tolerance: {entropy_tolerance}"],
-            [f"DFA, short-term fluctuations: {dfa_short_term}"],
-            [f"DFA, long-term fluctuations: {dfa_long_term}"],
-            [""]
-        ]
-        # writing in csv
-        if output_file:
-           # Write the data to the CSV file
-            with open(output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
+        results_w = PALMS.get().viewer.results_w
+        bands = [results_w.vlf_min.text(), results_w.vlf_max.text(), results_w.lf_min.text(), results_w.lf_max.text(), results_w.hf_min.text(), results_w.hf_max.text()]
+        header_rows = results_export.software_rows()
+        header_rows += results_export.file_rows(PALMS.get().CURRENT_FILE, PALMS.get().FIRST_DATETIME, PALMS.get().LAST_DATETIME, PALMS.get().FREQUENCY)
+        header_rows += results_export.parameter_rows(self.settings, len(Partitions.all_startpoints()), bands)
 
         # ---------------------------RESULTS----------------------
-        # 1) RR INTERVAL SAMPLES
-        # define data
-        sample_titles = []
-        sample_titles.append("")
-        sample_titles_results = []
-        sample_titles_results.append("")
-        sample_titles_spectrum = []
-        sample_limits = []
-        sample_limits.append("Sample limits (d--hh:mm:ss)")
-        sample_analysis_type = "Single samples"
-        beat_correction = "Automatic correction"
-        beats_total = []
-        beats_total.append("Beats total")
-        beats_corrected = []
-        beats_corrected.append("Beats corrected")
-        beats_corrected_ratio = []
-        beats_corrected_ratio.append("Beats corrected (%)")
-        effective_data_length = []
-        effective_data_length.append("Effective data length (s)")
-        effective_data_length_ratio = []
-        effective_data_length_ratio.append("Effective data length (ratio)")
-        # 2) RESULTS OVERVIEW
-        pns_index = []
-        pns_index.append("PNS index")
-        sns_index = []
-        sns_index.append("SNS index")
-        stress_index = []
-        stress_index.append("Stress index")
-        # 3) TIME-DOMAIN RESULTS
-        mean_rr = []
-        mean_rr.append("Mean RR (ms)")
-        sdnn = []
-        sdnn.append("SDNN (ms)")
-        mean_hr = []
-        mean_hr.append("Mean HR (beats/min)")
-        sd_hr = []
-        sd_hr.append("SD HR (beats/min)")
-        min_hr = []
-        min_hr.append("Mim HR (beats/min)")
-        max_hr = []
-        max_hr.append("Max HR (beats/min)")
-        rmssd = []
-        rmssd.append("RMSSD (ms)")
-        nnxx = []
-        nnxx.append("NNxx (beats)")
-        pnnxx = []
-        pnnxx.append("pNNxx (%)")
-        sdnn_index = []
-        sdnn_index.append("SDNN index (ms)")
-        rr_tri_index = []
-        rr_tri_index.append("RR tri index")
-        tinn = []
-        tinn.append("TINN (ms)")
-        # 4) FREQUENCY-DOMAIN RESULTS
-        frequency_domain_title = ["Frequency-Domain Results"]
-        peak_frequencies_vlf = []
-        peak_frequencies_vlf.append("VLF (Hz)")
-        peak_frequencies_lf = []
-        peak_frequencies_lf.append("LF (Hz)")
-        peak_frequencies_hf = []
-        peak_frequencies_hf.append("HF (Hz)")
-        absolute_powers_vlf_ms2 = []
-        absolute_powers_vlf_ms2.append("VLF (ms^2)")
-        absolute_powers_lf_ms2 = []
-        absolute_powers_lf_ms2.append("LF (ms^2)")
-        absolute_powers_hf_ms2 = []
-        absolute_powers_hf_ms2.append("HF (ms^2)")
-        absolute_powers_vlf_log = []
-        absolute_powers_vlf_log.append("VLF (log)")
-        absolute_powers_lf_log = []
-        absolute_powers_lf_log.append("LF (log)")
-        absolute_powers_hf_log = []
-        absolute_powers_hf_log.append("HF (log)")
-        relative_powers_vlf = []
-        relative_powers_vlf.append("VLF (%)")
-        relative_powers_lf = []
-        relative_powers_lf.append("LF (%)")
-        relative_powers_hf = []
-        relative_powers_hf.append("HF (%)")
-        normalized_powers_lf = []
-        normalized_powers_lf.append("LF (n.u.)")
-        normalized_powers_hf = []
-        normalized_powers_hf.append("HF (n.u.)")
-        total_power = []
-        total_power.append("Total power (ms^2)")
-        lf_hf_ratio = []
-        lf_hf_ratio.append("LF/HF ratio")
-        # 5) NONLINEAR RESULTS
-        sd1 = []
-        sd1.append("SD1 (ms)")
-        sd2 = []
-        sd2.append("SD2 (ms)")
-        sd1_2 = []
-        sd1_2.append("SD2/SD1 ratio")
-        approximate_entropy = []
-        approximate_entropy.append("Approximate entropy (ApEn)")
-        sample_entropy = []
-        sample_entropy.append("Sample entropy (SampEn)")
-        alpha1 = []
-        alpha1.append("alpha 1")
-        alpha2 = []
-        alpha2.append("alpha 2")
-        # 6) RR interval data
-        rr_row1 = []
-        rr_row2 = []
-        rr_row_units = []
-        peaks_columns = []
-        rr_intervals_columns = []
-
-        from gui.viewer import PALMS
-        from datetime import timedelta
-        from logic.operation_mode.annotation import AnnotationConfig
+        table = results_export.ResultsTable(PALMS.get().FIRST_DATETIME, PALMS.get().ORIGINAL_DATETIME)
         rr_intervals = PALMS.get().rr_intervals
 
         # for each sample (name -> index), get all the results and append them to the corresponding array
         all_samples = Partitions.all_names()
-        if PALMS.get().ORIGINAL_DATETIME != None:
-            previous_rr_sum = PALMS.get().ORIGINAL_DATETIME
-        else:
-            previous_rr_sum = 0
         for sample_name in all_samples:
             sample_indices = Partitions.find_partition_by_name(sample_name)
-            for i, sample_index in enumerate(sample_indices):
+            for i, current_partition in enumerate(sample_indices):
 
-                current_partition = sample_index
-
-                sample_titles.append(sample_name+" "+str(i+1))
-                sample_titles_results.append(sample_name+" "+str(i+1))
-                sample_titles_results.append("")
-                sample_titles_spectrum.append(sample_name+" "+str(i+1))
-                sample_titles_spectrum.append("")
+                table.add_title(sample_name+" "+str(i+1))
 
                 current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
                 current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
 
-                rr_local = rr_intervals[current_start:current_end]   
-                rr_local = rr_local[rr_local != 0]
+                rr_local = rr_intervals.between(current_start, current_end)
 
-                if len(rr_local) < 5:
+                if len(rr_local) < results_export.MIN_BEATS:
                     continue
 
-                # append sample limits
-                first_time = PALMS.get().FIRST_DATETIME
-                datetime_obj = dtime.datetime.strptime(first_time, "%d--%H:%M:%S")
-                new_start = datetime_obj + timedelta(seconds=current_partition.start)
-                current_start_date = new_start.strftime("%d--%H:%M:%S")
-                new_end = datetime_obj + timedelta(seconds=current_partition.end)
-                current_end_date = new_end.strftime("%d--%H:%M:%S")
-                sample_limits.append(f"{current_start_date} - {current_end_date}")
-
-                # how many annotations there are
-                #a = AnnotationConfig.get()[0]
-                #points_x, points_y = a.annotation.find_annotation_between_two_ts(current_partition.start, current_partition.end)
-                annotations = rr_local
-                beats_total.append(len(annotations))
-
                 # how many outliers there are
                 points_x = PALMS.get().viewer.selectedDisplayPanel.plot_area.find_outliers_between_two_ts(current_partition.start, current_partition.end)
-                beats_corrected.append(len(points_x))
-
-                # ratio of beats corrected
-                current_beats_corrected_ratio = (100 * len(points_x)) / (len(annotations) + len(points_x))
-                beats_corrected_ratio.append(current_beats_corrected_ratio)
-
-                # outliers time
-                outliers_times = len(points_x)*0.7
-                non_outliers_times = np.sum(annotations)-outliers_times
 
-                # effective data
-                effective_data_length.append(non_outliers_times)
-                effective_data_length_ratio.append(non_outliers_times/(outliers_times+non_outliers_times))
-
-                
-
-                # ------------TIME RESULTS---------------
-                mean_rr_local, sdnn_local, mean_hr_local, sd_hr_local, min_hr_local, max_hr_local, rmssd_local, nnxx_local, pnnxx_local, rr_tri_index_local, tinn_local, stress_index_local, sdnn_index_local = ResultsPanel.get().export_time_results(rr_local)
-                # general results
-                pns_index.append("0")
-                pns_index.append("")
-                sns_index.append("0")
-                sns_index.append("")
-                stress_index.append(stress_index_local)
-                stress_index.append("")
-                mean_rr.append(mean_rr_local)
-                mean_rr.append("")
-                sdnn.append(sdnn_local)
-                sdnn.append("")
-                mean_hr.append(mean_hr_local)
-                mean_hr.append("")
-                sd_hr.append(sd_hr_local)
-                sd_hr.append("")
-                min_hr.append(min_hr_local)
-                min_hr.append("")
-                max_hr.append(max_hr_local)
-                max_hr.append("")
-                rmssd.append(rmssd_local)
-                rmssd.append("")
-                nnxx.append(nnxx_local)
-                nnxx.append("")
-                pnnxx.append(pnnxx_local)
-                pnnxx.append("")
-                sdnn_index.append(sdnn_index_local)
-                sdnn_index.append("")
-                rr_tri_index.append(rr_tri_index_local)
-                rr_tri_index.append("")
-                tinn.append(tinn_local)
-                tinn.append("")
-
-                # ------------FREQUENCY RESULTS-------------
-                frequency_domain_title.append("FFT spectrum")
-                frequency_domain_title.append("AR spectrum")
-                vlf_peak_welch, lf_peak_welch, hf_peak_welch, vlf_absolute_power_ms2_welch, lf_absolute_power_ms2_welch, hf_absolute_power_ms2_welch, vlf_absolute_power_log_welch, lf_absolute_power_log_welch, hf_absolute_power_log_welch, vlf_relative_power_welch, lf_relative_power_welch, hf_relative_power_welch, lf_normalized_power_welch, hf_normalized_power_welch, total_power_welch, lf_hf_ratio_welch, vlf_peak_ar, lf_peak_ar, hf_peak_ar, vlf_absolute_power_ms2_ar, lf_absolute_power_ms2_ar, hf_absolute_power_ms2_ar, vlf_absolute_power_log_ar, lf_absolute_power_log_ar, hf_absolute_power_log_ar, vlf_relative_power_ar, lf_relative_power_ar, hf_relative_power_ar, lf_normalized_power_ar, hf_normalized_power_ar, total_power_ar, lf_hf_ratio_ar = ResultsPanel.get().export_frequency_results(rr_local)
-                peak_frequencies_vlf.append(vlf_peak_welch)
-                peak_frequencies_vlf.append(vlf_peak_ar)
-                peak_frequencies_lf.append(lf_peak_welch)
-                peak_frequencies_lf.append(lf_peak_ar)
-                peak_frequencies_hf.append(hf_peak_welch)
-                peak_frequencies_hf.append(hf_peak_ar)
-                
-                absolute_powers_vlf_ms2.append(vlf_absolute_power_ms2_welch)
-                absolute_powers_vlf_ms2.append(vlf_absolute_power_ms2_ar)
-                absolute_powers_lf_ms2.append(lf_absolute_power_ms2_welch)
-                absolute_powers_lf_ms2.append(lf_absolute_power_ms2_ar)
-                absolute_powers_hf_ms2.append(hf_absolute_power_ms2_welch)
-                absolute_powers_hf_ms2.append(hf_absolute_power_ms2_ar)
-                absolute_powers_vlf_log.append(vlf_absolute_power_log_welch)
-                absolute_powers_vlf_log.append(vlf_absolute_power_log_ar)
-                absolute_powers_lf_log.append(lf_absolute_power_log_welch)
-                absolute_powers_lf_log.append(lf_absolute_power_log_ar)
-                absolute_powers_hf_log.append(hf_absolute_power_log_welch)
-                absolute_powers_hf_log.append(hf_absolute_power_log_ar)
-            
-                relative_powers_vlf.append(vlf_relative_power_welch)
-                relative_powers_vlf.append(vlf_relative_power_ar)
-                relative_powers_lf.append(lf_relative_power_welch)
-                relative_powers_lf.append(lf_relative_power_ar)
-                relative_powers_hf.append(hf_relative_power_welch)
-                relative_powers_hf.append(hf_relative_power_ar)
-            
-                normalized_powers_lf.append(lf_normalized_power_welch)
-                normalized_powers_lf.append(lf_normalized_power_ar)
-                normalized_powers_hf.append(hf_normalized_power_welch)
-                normalized_powers_hf.append(hf_normalized_power_ar)
-                total_power.append(total_power_welch)
-                total_power.append(total_power_ar)
-                lf_hf_ratio.append(lf_hf_ratio_welch)
-                lf_hf_ratio.append(lf_hf_ratio_ar)
-
-                # ------------NON LINEAR RESULTS------------
-                sd1_local, sd2_local, sd_ratio_local, apen_local, sampen_local, dfa1_local, dfa2_local = ResultsPanel.get().export_nonlinear_results(rr_local)
-                
-                sd1.append(sd1_local)
-                sd1.append("")
-                sd2.append(sd2_local)
-                sd2.append("")
-                sd1_2.append(sd_ratio_local)
-                sd1_2.append("")
-
-                approximate_entropy.append(apen_local)
-                approximate_entropy.append("")
-                sample_entropy.append(sampen_local)
-                sample_entropy.append("")
-
-                alpha1.append(dfa1_local)
-                alpha1.append("")
-                alpha2.append(dfa2_local)
-                alpha2.append("")
-
-                # RR values
-                rr_row1.append("RR data")
-                rr_row1.append("")
-
-                rr_row2.append("Time")
-                rr_row2.append("RR interval")
-
-                rr_row_units.append("(s)")
-                rr_row_units.append("(s)")
-
-                # rr values start in row 110
-                rr_intervals_local = rr_local 
-                if PALMS.get().ORIGINAL_DATETIME != None:
-                    rr_sum = np.cumsum(rr_intervals_local)
-                    rr_sum = np.insert(rr_sum, 0, 0)
-
-                    from dateutil import parser
-                    from dateutil.relativedelta import relativedelta
-                    dt = parser.parse(PALMS.get().ORIGINAL_DATETIME)
-                    peaks_values_local = [dt + relativedelta(seconds=seconds) for seconds in rr_sum[:-1]]
-                else:
-                    peaks_values_local = previous_rr_sum + np.cumsum(rr_intervals_local)
-                
-                rr_intervals_columns.append(rr_intervals_local)
-                
-                peaks_columns.append(peaks_values_local)
-                
-                previous_rr_sum = peaks_values_local[-1]
-                
+                table.add_sample(current_partition.start, current_partition.end, rr_local, len(points_x),
+                                 ResultsPanel.get().export_time_results(rr_local),
+                                 ResultsPanel.get().export_frequency_results(rr_local),
+                                 ResultsPanel.get().export_nonlinear_results(rr_local))
 
-        # all the results are stored in "rows"
-        rows = [
-            ["RR Interval Samples Selected for Analysis"],
-            sample_titles,
-            sample_limits,
-            [f"Sample Analysis Type: {sample_analysis_type}"],
-            [f"Beat correction: {beat_correction}"],
-            beats_total,
-            beats_corrected,
-            beats_corrected_ratio,
-            effective_data_length,
-            effective_data_length_ratio,
-            [""],
-            [""],
-            ["RESULTS FOR SINGLE SAMPLES"],
-            sample_titles_results,
-            ["Results overview"],
-            pns_index,
-            sns_index,
-            stress_index,
-            [""],
-            ["Time domain results"],
-            ["Statistical parameters"],
-            mean_rr,
-            sdnn,
-            mean_hr,
-            sd_hr,
-            min_hr,
-            max_hr,
-            rmssd,
-            nnxx,
-            pnnxx,
-            sdnn_index,
-            ["Geometric parameters"],
-            rr_tri_index,
-            tinn,
-            [""],
-            frequency_domain_title,
-            ["Peak frequencies"],
-            peak_frequencies_vlf,
-            peak_frequencies_lf,
-            peak_frequencies_hf,
-            ["Absolute powers"],
-            absolute_powers_vlf_ms2,
-            absolute_powers_lf_ms2,
-            absolute_powers_hf_ms2,
-            absolute_powers_vlf_log,
-            absolute_powers_lf_log,
-            absolute_powers_hf_log,
-            ["Relative powers"],
-            relative_powers_vlf,
-            relative_powers_lf,
-            relative_powers_hf,
-            ["Normalized powers"],
-            normalized_powers_lf,
-            normalized_powers_hf,
-            total_power,
-            lf_hf_ratio,
-            [""],
-            [""],
-            ["Nonlinear results"],
-            ["Poincare plot"],
-            sd1,
-            sd2,
-            sd1_2,
-            approximate_entropy,
-            sample_entropy,
-            ["Detrended fluctuation analysis (DFA)"],
-            alpha1,
-            alpha2,
-            [""],
-            [""],
-            ["RR INTERVAL DATA and SPECTRUM ESTIMATES"],
-            sample_titles_spectrum, 
-            rr_row1, 
-            rr_row2,
-            rr_row_units,
-        ]
-        # writing in csv
-        if output_file:
-           # Write the data to the CSV file
-            with open(output_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerows(rows)
-
-                # Determine the maximum length among the arrays
-                max_length = max(len(sample) for sample in peaks_columns + rr_intervals_columns)
-
-                # Loop through the positions
-                for i in range(max_length):
-                    # Loop through the samples
-                    current_row_values = []
-                    for sample_index in range(len(peaks_columns)):
-                        # Get the value from peaks_column if available
-                        if i < len(peaks_columns[sample_index]):
-                            current_row_values.append(peaks_columns[sample_index][i])
-                        else:
-                            current_row_values.append("")
-
-                        # Get the value from rr_intervals_column if available
-                        if i < len(rr_intervals_columns[sample_index]):
-                            current_row_values.append(rr_intervals_columns[sample_index][i])
-                        else:
-                            current_row_values.append("")
-
-                    writer.writerow(current_row_values)
+        table.write(output_file, header_rows)
 
     #@jit
     def append_results(self):
@@ -2121,8 +1229,7 @@ class LeftOptionsPanel(QtWidgets.QWidget):
                     current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
                     current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
 
-                    rr_local = rr_intervals[current_start:current_end]   
-                    rr_local = rr_local[rr_local != 0]
+                    rr_local = rr_intervals.between(current_start, current_end)
 
                     # append sample limits
                     first_time = PALMS.get().FIRST_DATETIME
@@ -2325,7 +1432,6 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         from logic.databases.DatabaseHandler import Database
         from PyQt5.QtCore import qInfo, qDebug
         from PyQt5.QtWidgets import QFileDialog
-        import h5py
         from logic.operation_mode.annotation import AnnotationConfig
         result = QtWidgets.QMessageBox.question(self,
                                                 "Confirm Restart...",
@@ -2339,99 +1445,13 @@ class LeftOptionsPanel(QtWidgets.QWidget):
                 #qInfo('{} saved'.format(db.fullpath.stem))
                 options = QFileDialog.Options()
                 file_path, _ = QFileDialog.getSaveFileName(self, "Save HDF5 File", "", "HDF5 Files (*.h5);;All Files (*)", options=options)
-                
+
                 if file_path:
-                    loading_box = QMessageBox()
-                    loading_box.setWindowTitle("Saving file")
-                    loading_box.setText("Saving file")
-                    loading_box.show()
-
-                    ecg_values = PALMS.get().ECG_DATA
-                    annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
-                    annotations = np.array(annotations[0])
-                    algorithm_outliers = PALMS.get().algorithm_outliers
-                    threshold_outliers = PALMS.get().threshold_outliers
-                    start_missing_indexes = PALMS.get().START_MISSING_INDEXES
-                    end_missing_indexes = PALMS.get().END_MISSING_INDEXES
-                    noise_start_points = RRNoisePartitions.all_startpoints()
-                    noise_end_points = RRNoisePartitions.all_endpoints()
-                    frequency = PALMS.get().FREQUENCY
-                    is_algorithm_outlier = False
-                    is_threshold_outlier = False
-                    current_outlier = 0
-                    algorithm_correction = self.algorithm_active
-                    is_algorithm_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_algorithm_outliers
-                    is_threshold_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_threshold_outliers
-                    current_outlier = PALMS.get().viewer.getOutliersDisplayPanel().currentSelector
-                    # get partitions
-                    samples_dictionary = {}
-                    all_samples = Partitions.all_names()
-                    for sample_name in all_samples:
-                        sample_indices = Partitions.find_partition_by_name(sample_name)
-                        for i, sample_index in enumerate(sample_indices):
-                            current_partition = sample_index
-                            current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
-                            current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
-
-                            # Check if the sample_name exists in the dictionary, if not, create it
-                            if sample_name not in samples_dictionary:
-                                samples_dictionary[sample_name] = {}
-
-                            if sample_index not in samples_dictionary[sample_name]:
-                                samples_dictionary[sample_name][i] = {}
-
-                            # add to dictionary name, start and end
-                            samples_dictionary[sample_name][i] = {'start': current_start, 'end': current_end}
-
-                    with h5py.File(file_path, 'w') as hdf_file:
-
-                        # Create a group for numbers and arrays.
-                        group1 = hdf_file.create_group('group1')
-
-                        # Create a group for samples dictionary.
-                        group2 = hdf_file.create_group('group2')
-
-                        # group 3 for boolean and strings
-                        group3 = hdf_file.create_group('group3')
-
-                        # group 4 for algoruthm outliers dictionary
-                        group4 = hdf_file.create_group('group4')
-
-                        # fill group 1
-                        group1.attrs['noise_level'] = self.noise_level.currentIndex()
-                        group1.attrs['beat_correction_level'] = self.beat_threshold_level.currentIndex()
-                        group1.attrs['frequency'] = frequency
-                        group1.attrs['current_outlier'] = current_outlier
-                        group1.attrs["RR_ONLY"] = PALMS.get().RR_ONLY
-                        group1.attrs["DATA_TYPE"] = PALMS.get().DATA_TYPE
-                        group1.create_dataset('ecg_values', data=ecg_values)
-                        group1.create_dataset('annotations', data=annotations)
-                        group1.create_dataset('original_rr', data=PALMS.get().original_rr.get_value())
-                        group1.create_dataset('original_fiducials', data=PALMS.get().original_fiducials)
-                        group1.create_dataset('original_annotations', data=PALMS.get().original_annotations)
-                        group1.create_dataset('threshold_outliers', data=threshold_outliers)
-                        group1.create_dataset('noise_start_indexes', data=noise_start_points)
-                        group1.create_dataset('noise_end_indexes', data=noise_end_points)
-                        group1.create_dataset('missing_start_indexes', data=start_missing_indexes)
-                        group1.create_dataset('missing_end_indexes', data=end_missing_indexes)
-
-                        # fill group 2
-                        for sample_name, sample_data in samples_dictionary.items():
-                            for sample_index, key in sample_data.items():
-                                for sample_limit, value in key.items():
-                                    group2.attrs[f'{sample_name}_{sample_index}_{sample_limit}'] = value
-
-                        group3.attrs['is_algorithm_outlier'] = is_algorithm_outlier
-                        group3.attrs['is_threshold_outlier'] = is_threshold_outlier
-                        group3.attrs['algorithm_correction'] = algorithm_correction
-                        group3.attrs['first_datetime'] = PALMS.get().FIRST_DATETIME
-                        group3.attrs['last_datetime'] = PALMS.get().LAST_DATETIME
-                        group3.attrs['current_file'] = PALMS.get().CURRENT_FILE
-
-                        for key, value in algorithm_outliers.items():
-                            group4.attrs[f'{key}'] = value
-
-                    loading_box.close()
+                    # same session file as the other saves (a new file replaces the one the signal may be mapped from)
+                    self.write_session(file_path)
+
+            # the file is closed: the edits are saved or discarded, none is replayed when the session is opened again
+            self.discard_journal()
 
             PALMS.NEXT_FILE = None
             # PALMS.PREV_FILE = PALMS.CURRENT_FILE  # after reboot there is no previous file
@@ -2451,203 +1471,119 @@ class LeftOptionsPanel(QtWidgets.QWidget):
         if PALMS.get().SAVE_FILE is None:
             self.save_file()
         else:
-            import h5py
-            from gui import PALMS
-            from logic.operation_mode.annotation import AnnotationConfig
-
-            file_path = PALMS.get().SAVE_FILE
-
-            loading_box = QMessageBox()
-            loading_box.setWindowTitle("Saving file")
-            loading_box.setText("Saving file")
-            loading_box.show()
-
-            ecg_values = PALMS.get().ECG_DATA
-            annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
-            annotations = np.array(annotations[0])
-            algorithm_outliers = PALMS.get().algorithm_outliers
-            threshold_outliers = PALMS.get().threshold_outliers
-            start_missing_indexes = PALMS.get().START_MISSING_INDEXES
-            end_missing_indexes = PALMS.get().END_MISSING_INDEXES
-            noise_start_points = RRNoisePartitions.all_startpoints()
-            noise_end_points = RRNoisePartitions.all_endpoints()
-            frequency = PALMS.get().FREQUENCY
-            is_algorithm_outlier = False
-            is_threshold_outlier = False
-            current_outlier = 0
-            algorithm_correction = self.algorithm_active
-            is_algorithm_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_algorithm_outliers
-            is_threshold_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_threshold_outliers
-            current_outlier = PALMS.get().viewer.getOutliersDisplayPanel().currentSelector
-            # get partitions
-            samples_dictionary = {}
-            all_samples = Partitions.all_names()
-            for sample_name in all_samples:
-                sample_indices = Partitions.find_partition_by_name(sample_name)
-                for i, sample_index in enumerate(sample_indices):
-                    current_partition = sample_index
-                    current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
-                    current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
-
-                    # Check if the sample_name exists in the dictionary, if not, create it
-                    if sample_name not in samples_dictionary:
-                        samples_dictionary[sample_name] = {}
-
-                    if sample_index not in samples_dictionary[sample_name]:
-                        samples_dictionary[sample_name][i] = {}
-
-                    # add to dictionary name, start and end
-                    samples_dictionary[sample_name][i] = {'start': current_start, 'end': current_end}
-
-            with h5py.File(file_path, 'w') as hdf_file:
-                # Create a group for numbers and arrays.
-                group1 = hdf_file.create_group('group1')
-
-                # Create a group for samples dictionary.
-                group2 = hdf_file.create_group('group2')
-
-                # group 3 for boolean and strings
-                group3 = hdf_file.create_group('group3')
-
-                # group 4 for algoruthm outliers dictionary
-                group4 = hdf_file.create_group('group4')
-
-                # fill group 1
-                group1.attrs['noise_level'] = self.noise_level.currentIndex()
-                group1.attrs['beat_correction_level'] = self.beat_threshold_level.currentIndex()
-                group1.attrs['frequency'] = frequency
-                group1.attrs['current_outlier'] = current_outlier
-                group1.attrs["RR_ONLY"] = PALMS.get().RR_ONLY
-                group1.attrs["DATA_TYPE"] = PALMS.get().DATA_TYPE
-                group1.create_dataset('ecg_values', data=ecg_values)
-                group1.create_dataset('annotations', data=annotations)
-                group1.create_dataset('original_rr', data=PALMS.get().original_rr.get_value())
-                group1.create_dataset('original_fiducials', data=PALMS.get().original_fiducials)
-                group1.create_dataset('original_annotations', data=PALMS.get().original_annotations)
-                group1.create_dataset('threshold_outliers', data=threshold_outliers)
-                group1.create_dataset('noise_start_indexes', data=noise_start_points)
-                group1.create_dataset('noise_end_indexes', data=noise_end_points)
-                group1.create_dataset('missing_start_indexes', data=start_missing_indexes)
-                group1.create_dataset('missing_end_indexes', data=end_missing_indexes)
-
-                # fill group 2
-                for sample_name, sample_data in samples_dictionary.items():
-                    for sample_index, key in sample_data.items():
-                        for sample_limit, value in key.items():
-                            group2.attrs[f'{sample_name}_{sample_index}_{sample_limit}'] = value
-
-                group3.attrs['is_algorithm_outlier'] = is_algorithm_outlier
-                group3.attrs['is_threshold_outlier'] = is_threshold_outlier
-                group3.attrs['algorithm_correction'] = algorithm_correction
-                group3.attrs['first_datetime'] = PALMS.get().FIRST_DATETIME
-                group3.attrs['last_datetime'] = PALMS.get().LAST_DATETIME
-                group3.attrs['current_file'] = PALMS.get().CURRENT_FILE
-
-                for key, value in algorithm_outliers.items():
-                    group4.attrs[f'{key}'] = value
-
-            PALMS.get().SAVE_FILE = file_path
-            loading_box.close()
+            self.write_session(PALMS.get().SAVE_FILE)
 
 
     def save_file(self):
-        import h5py
-        from gui import PALMS
-        from logic.operation_mode.annotation import AnnotationConfig
         from PyQt5.QtWidgets import QFileDialog
 
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getSaveFileName(self, "Save HDF5 File", "", "HDF5 Files (*.h5);;All Files (*)", options=options)
 
         if file_path:
-            loading_box = QMessageBox()
-            loading_box.setWindowTitle("Saving file")
-            loading_box.setText("Saving file")
-            loading_box.show()
-
-            ecg_values = PALMS.get().ECG_DATA
-            annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
-            annotations = np.array(annotations[0])
-            algorithm_outliers = PALMS.get().algorithm_outliers
-            threshold_outliers = PALMS.get().threshold_outliers
-            start_missing_indexes = PALMS.get().START_MISSING_INDEXES
-            end_missing_indexes = PALMS.get().END_MISSING_INDEXES
-            noise_start_points = RRNoisePartitions.all_startpoints()
-            noise_end_points = RRNoisePartitions.all_endpoints()
-            frequency = PALMS.get().FREQUENCY
-            is_algorithm_outlier = False
-            is_threshold_outlier = False
-            current_outlier = 0
-            algorithm_correction = self.algorithm_active
-            is_algorithm_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_algorithm_outliers
-            is_threshold_outlier = PALMS.get().viewer.getOutliersDisplayPanel().current_threshold_outliers
-            current_outlier = PALMS.get().viewer.getOutliersDisplayPanel().currentSelector
-            # get partitions
-            samples_dictionary = {}
-            all_samples = Partitions.all_names()
-            for sample_name in all_samples:
-                sample_indices = Partitions.find_partition_by_name(sample_name)
-                for i, sample_index in enumerate(sample_indices):
-                    current_partition = sample_index
-                    current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
-                    current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
+            self.write_session(file_path)
+
+    def session_state(self):
+        """attributes, edited datasets, samples ({name: {i: {'start', 'end'}}}) and flags of the session"""
+        from gui import PALMS
+        from logic.operation_mode.annotation import AnnotationConfig
 
-                    # Check if the sample_name exists in the dictionary, if not, create it
-                    if sample_name not in samples_dictionary:
-                        samples_dictionary[sample_name] = {}
-
-                    if sample_index not in samples_dictionary[sample_name]:
-                        samples_dictionary[sample_name][i] = {}
-
-                    # add to dictionary name, start and end
-                    samples_dictionary[sample_name][i] = {'start': current_start, 'end': current_end}
-
-            with h5py.File(file_path, 'w') as hdf_file:
-                # Create a group for numbers and arrays.
-                group1 = hdf_file.create_group('group1')
-
-                # Create a group for samples dictionary.
-                group2 = hdf_file.create_group('group2')
-
-                # group 3 for boolean and strings
-                group3 = hdf_file.create_group('group3')
-
-                # group 4 for algoruthm outliers dictionary
-                group4 = hdf_file.create_group('group4')
-
-                # fill group 1
-                group1.attrs['noise_level'] = self.noise_level.currentIndex()
-                group1.attrs['beat_correction_level'] = self.beat_threshold_level.currentIndex()
-                group1.attrs['frequency'] = frequency
-                group1.attrs['current_outlier'] = current_outlier
-                group1.attrs["RR_ONLY"] = PALMS.get().RR_ONLY
-                group1.attrs["DATA_TYPE"] = PALMS.get().DATA_TYPE
-                group1.create_dataset('ecg_values', data=ecg_values)
-                group1.create_dataset('annotations', data=annotations)
-                group1.create_dataset('original_rr', data=PALMS.get().original_rr.get_value())
-                group1.create_dataset('original_fiducials', data=PALMS.get().original_fiducials)
-                group1.create_dataset('original_annotations', data=PALMS.get().original_annotations)
-                group1.create_dataset('threshold_outliers', data=threshold_outliers)
-                group1.create_dataset('noise_start_indexes', data=noise_start_points)
-                group1.create_dataset('noise_end_indexes', data=noise_end_points)
-                group1.create_dataset('missing_start_indexes', data=start_missing_indexes)
-                group1.create_dataset('missing_end_indexes', data=end_missing_indexes)
-
-                # fill group 2
-                for sample_name, sample_data in samples_dictionary.items():
-                    for sample_index, key in sample_data.items():
-                        for sample_limit, value in key.items():
-                            group2.attrs[f'{sample_name}_{sample_index}_{sample_limit}'] = value
-
-                group3.attrs['is_algorithm_outlier'] = is_algorithm_outlier
-                group3.attrs['is_threshold_outlier'] = is_threshold_outlier
-                group3.attrs['algorithm_correction'] = algorithm_correction
-                group3.attrs['first_datetime'] = PALMS.get().FIRST_DATETIME
-                group3.attrs['last_datetime'] = PALMS.get().LAST_DATETIME
-                group3.attrs['current_file'] = PALMS.get().CURRENT_FILE
-
-                for key, value in algorithm_outliers.items():
-                    group4.attrs[f'{key}'] = value
-
-            PALMS.get().SAVE_FILE = file_path
-            loading_box.close()
\ No newline at end of file
+        annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
+        annotations = np.array(annotations[0])
+        # get partitions
+        samples_dictionary = {}
+        all_samples = Partitions.all_names()
+        for sample_name in all_samples:
+            sample_indices = Partitions.find_partition_by_name(sample_name)
+            for i, sample_index in enumerate(sample_indices):
+                current_partition = sample_index
+                current_start = PALMS.get().from_time_to_closest_sample(current_partition.start)
+                current_end = PALMS.get().from_time_to_closest_sample(current_partition.end)
+
+                # Check if the sample_name exists in the dictionary, if not, create it
+                if sample_name not in samples_dictionary:
+                    samples_dictionary[sample_name] = {}
+
+                # add to dictionary name, start and end
+                samples_dictionary[sample_name][i] = {'start': current_start, 'end': current_end}
+
+        attributes = {'noise_level': self.noise_level.currentIndex(),
+                      'beat_correction_level': self.beat_threshold_level.currentIndex(),
+                      'frequency': PALMS.get().FREQUENCY,
+                      'current_outlier': PALMS.get().viewer.getOutliersDisplayPanel().currentSelector,
+                      'RR_ONLY': PALMS.get().RR_ONLY,
+                      'DATA_TYPE': PALMS.get().DATA_TYPE}
+        datasets = {'annotations': annotations,
+                    'threshold_outliers': PALMS.get().threshold_outliers,
+                    'noise_start_indexes': RRNoisePartitions.all_startpoints(),
+                    'noise_end_indexes': RRNoisePartitions.all_endpoints()}
+        flags = {'is_algorithm_outlier': PALMS.get().viewer.getOutliersDisplayPanel().current_algorithm_outliers,
+                 'is_threshold_outlier': PALMS.get().viewer.getOutliersDisplayPanel().current_threshold_outliers,
+                 'algorithm_correction': self.algorithm_active,
+                 'first_datetime': PALMS.get().FIRST_DATETIME,
+                 'last_datetime': PALMS.get().LAST_DATETIME,
+                 'current_file': PALMS.get().CURRENT_FILE}
+        return attributes, datasets, samples_dictionary, flags
+
+    def journal_state(self):
+        """state of the session as recorded by the edit journal"""
+        from gui import PALMS
+        from logic import edit_journal
+        from logic.session_file import flatten_samples
+        attributes, datasets, samples_dictionary, flags = self.session_state()
+        return {'attributes': attributes,
+                'datasets': {key: datasets[key] for key in edit_journal.DATASETS},
+                'samples': flatten_samples(samples_dictionary),
+                'flags': flags,
+                'algorithm_outliers': dict(PALMS.get().algorithm_outliers)}
+
+    def start_journal(self, file_path, journal_id, append=False):
+        """journals the edits made from now on to the session file_path, saved (or opened) with journal_id"""
+        from logic.edit_journal import EditJournal
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = EditJournal(file_path, journal_id, self.journal_state(), append=append)
+
+    def record_edits(self):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record(self.journal_state())
+        except Exception:
+            # the session is not ready (being loaded or closed), the edits are recorded on the next tick
+            pass
+
+    def discard_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            os.remove(self.journal.path)
+            self.journal = None
+
+    def write_session(self, file_path):
+        import uuid
+        from gui import PALMS
+        from logic.session_file import write_session
+
+        loading_box = QMessageBox()
+        loading_box.setWindowTitle("Saving file")
+        loading_box.setText("Saving file")
+        loading_box.show()
+
+        attributes, edited, samples_dictionary, flags = self.session_state()
+        datasets = {'ecg_values': PALMS.get().ECG_DATA,
+                    'original_rr': PALMS.get().original_rr.get_value(),
+                    'original_fiducials_samples': PALMS.get().original_fiducials.valid_samples(),
+                    'original_fiducials_intervals': PALMS.get().original_fiducials.values(),
+                    'original_annotations': PALMS.get().original_annotations,
+                    'missing_start_indexes': PALMS.get().START_MISSING_INDEXES,
+                    'missing_end_indexes': PALMS.get().END_MISSING_INDEXES,
+                    **edited}
+
+        # a new journal continues this save: the edits of the previous one are in it
+        journal_id = uuid.uuid4().hex
+        write_session(file_path, attributes, datasets, samples_dictionary, flags, PALMS.get().algorithm_outliers,
+                      journal_id=journal_id, release=lambda: PALMS.get().release_session_file(file_path))
+        self.start_journal(file_path, journal_id)
+
+        PALMS.get().SAVE_FILE = file_path
+        loading_box.close()
@@ -24,7 +24,7 @@ from logic.operation_mode.partitioning import SinglePartition, Partitions
 from logic.operation_mode.noise_partitioning import NoisePartition, NoisePartitions
 from logic.operation_mode.rr_noise_partitioning import RRNoisePartition, RRNoisePartitions
 from utils.QTimerWithPause import QTimerWithPause
-from utils.utils_general import find_closest
+from utils.utils_general import find_closest, find_closest_sorted
 from utils.utils_gui import Dialog
 from .model import View
 
@@ -309,7 +309,7 @@ class PlotArea(pg.GraphicsView):
                                     # add
                                     fiducial_idx = which_fiducial_to_delete(click_x)
                                     if fiducial_idx is not None:
-                                        closest_idx = np.argmin(abs(click_x - annotations))
+                                        closest_idx = find_closest_sorted(annotations, click_x)
                                         deleted_x = annotations[closest_idx]
                                         PALMS.get().INTERPOLATIONS = np.append(PALMS.get().INTERPOLATIONS, deleted_x)
                                         PALMS.get().INTERPOLATIONS.sort()
@@ -320,7 +320,7 @@ class PlotArea(pg.GraphicsView):
                                     # delete
                                     fiducial_idx = which_fiducial_to_delete(click_x)
                                     if fiducial_idx is not None:
-                                        closest_idx = np.argmin(abs(click_x - annotations))
+                                        closest_idx = find_closest_sorted(annotations, click_x)
                                         deleted_x = annotations[closest_idx]
                                         if deleted_x in PALMS.get().INTERPOLATIONS:
                                             index_to_delete = np.searchsorted(PALMS.get().INTERPOLATIONS, deleted_x)
@@ -421,7 +421,7 @@ class PlotArea(pg.GraphicsView):
                                     # add
                                     fiducial_idx = which_fiducial_to_delete(click_x)
                                     if fiducial_idx is not None:
-                                        closest_idx = np.argmin(abs(click_x - annotations))
+                                        closest_idx = find_closest_sorted(annotations, click_x)
                                         deleted_x = annotations[closest_idx]
                                         PALMS.get().INTERPOLATIONS = np.append(PALMS.get().INTERPOLATIONS, deleted_x)
                                         PALMS.get().INTERPOLATIONS.sort()
@@ -433,7 +433,7 @@ class PlotArea(pg.GraphicsView):
                                     # delete
                                     fiducial_idx = which_fiducial_to_delete(click_x)
                                     if fiducial_idx is not None:
-                                        closest_idx = np.argmin(abs(click_x - annotations))
+                                        closest_idx = find_closest_sorted(annotations, click_x)
                                         deleted_x = annotations[closest_idx]
                                         if deleted_x in PALMS.get().INTERPOLATIONS:
                                             index_to_delete = np.searchsorted(PALMS.get().INTERPOLATIONS, deleted_x)
@@ -202,7 +202,7 @@ class Waveform(Renderer):
         if self.track.min and self.track.max:
             return self.track.min, self.track.max
         else:
-            return {np.dtype('int16'): (-32768, 32768), np.dtype('float'): (-1, 1)}[self.track.viewvalue.dtype]
+            return {np.dtype('int16'): (-32768, 32768)}.get(self.track.viewvalue.dtype, (-1, 1))
 
     def reload(self):
         # TODO: waveform needs some kind of update scheme
@@ -250,23 +250,6 @@ class Waveform(Renderer):
         if ds == 1:
             visible = self.track.viewvalue[start:stop]
         else:
-            samples = 1 + ((stop - start) // ds)
-            visible = np.empty(samples * 2, dtype=self.track.viewvalue.dtype)
-            source_pointer = start
-            target_pointer = 0
-
-            chunk_size = int(round((1e6 // ds) * ds))
-            # assert isinstance(source_pointer, int)
-            # assert isinstance(chunk_size, int)
-            while source_pointer < stop - 1:
-                chunk = self.track.viewvalue[source_pointer:min([stop, source_pointer + chunk_size])]
-                source_pointer += len(chunk)
-                chunk = chunk[:(len(chunk) // ds) * ds].reshape(len(chunk) // ds, ds)
-                chunk_max = chunk.max(axis=1)
-                chunk_min = chunk.min(axis=1)
-                chunk_len = chunk.shape[0]
-                visible[target_pointer:target_pointer + chunk_len * 2:2] = chunk_min
-                visible[1 + target_pointer:1 + target_pointer + chunk_len * 2:2] = chunk_max
-                target_pointer += chunk_len * 2
-            visible = visible[:target_pointer]
+            # min/max envelope from the precomputed pyramid: cost depends on the screen width, not on the zoom span
+            visible, start, stop = self.track.get_pyramid().get(start, stop, ds)
         self.item.setData(x=np.linspace(start, stop, num=len(visible), endpoint=True) / self.track.fs, y=visible, pen=self.view.color)
@@ -4,6 +4,7 @@ import datetime as dtime
 from logic.operation_mode.partitioning import SinglePartition, Partitions
 from logic.operation_mode.noise_partitioning import NoisePartition, NoisePartitions
 from config import settings
+from logic import samples
 import json
 import numpy as np
 from pathlib import Path
@@ -240,45 +241,34 @@ class SampleOptionsPanel(QtWidgets.QWidget):
 
         end_signal_index = len(PALMS.get().ECG_DATA)
 
-        if (start_index + duration_index * (int(repetitions)-1) + int(self.minimum_sample_size_space.text())) > end_signal_index:
+        if not samples.repetitions_fit(start_index, duration_index, int(repetitions), int(self.minimum_sample_size_space.text()), end_signal_index):
             QMessageBox.critical(None, "Error", "The signal is not long enough to have so many repetitions", QMessageBox.Ok)
             return
 
         if (start_index < 0):
             start_index = 0
 
-        start_indexes = np.array([], dtype="int32")
-        end_indexes = np.array([], dtype="int32")
-        
         start_index = PALMS.get().from_sample_to_time(start_index)
         duration_index = PALMS.get().from_sample_to_time(duration_index)
         
-        # Generate the remaining values
-        for _ in range(int(repetitions)):
-            if (self.is_too_noisy(start_index, (start_index+duration_index)) is False):
-
-                start_indexes = np.append(start_indexes, start_index)
-                end_indexes = np.append(end_indexes, start_index+duration_index)
-
-                p = SinglePartition(name, start=start_index, end=(start_index+duration_index)) # The partition goes from end to start, as it is the missing part
-                PALMS.get().viewer.RRDisplayPanel.plot_area.main_vb.addItem(p)
-                PALMS.get().viewer.RRDisplayPanel.plot_area.main_vb.addItem(p.label)
-
-            if (self.sample_selection_separation_combo.currentIndex() == 0): # overlap %
-                start_index = start_index + duration_index - (duration_index) * (int(self.sample_selection_between_space.text()) / 100)
-            else: # space between d--hh:mm:ss
-                duration_time = self.sample_selection_between_space.text()
-                # Parse the components of the time string
-                days, time = duration_time.split('--')
-                hours, minutes, seconds = time.split(':')
-                space_seconds = int(days) * 24 * 3600 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
-                space_index = space_seconds
+        if (self.sample_selection_separation_combo.currentIndex() == 0): # overlap %
+            step = duration_index - (duration_index) * (int(self.sample_selection_between_space.text()) / 100)
+            stop = None
+        else: # space between d--hh:mm:ss
+            duration_time = self.sample_selection_between_space.text()
+            # Parse the components of the time string
+            days, time = duration_time.split('--')
+            hours, minutes, seconds = time.split(':')
+            space_seconds = int(days) * 24 * 3600 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+            step = duration_index + space_seconds
+            # check that not the end
+            stop = end_signal_index+int(self.minimum_sample_size_space.text())
 
-                start_index = start_index + duration_index + space_index
-                # check that not the end
-                if start_index > (end_signal_index+int(self.minimum_sample_size_space.text())):
-                    self.disableOptions()
-                    break
+        # Generate the remaining values
+        for start, end in samples.repeated_samples(start_index, duration_index, repetitions, step, self.is_too_noisy, stop):
+            p = SinglePartition(name, start=start, end=end) # The partition goes from end to start, as it is the missing part
+            PALMS.get().viewer.RRDisplayPanel.plot_area.main_vb.addItem(p)
+            PALMS.get().viewer.RRDisplayPanel.plot_area.main_vb.addItem(p.label)
 
         self.disableOptions()
 
@@ -340,40 +330,6 @@ class SampleOptionsPanel(QtWidgets.QWidget):
     def is_too_noisy(self, start, end): # start and end are in time
 
         from gui import PALMS
-        end = min(end, PALMS.get().from_sample_to_time(len(PALMS.get().ECG_DATA)-1))
-
-        minimum_sample_size = int(self.minimum_sample_size_space.text()) # in time
-        maximum_noise = (end-start)-minimum_sample_size
-
-        # when for other reason sample is not long enough (for example if it is at the end of the signal)
-        if ((end-start) < minimum_sample_size):
-            return True
-
         # algorithm acts on each non-noisy interval. From noise indexes, get them (in seconds)
-        noise_start_points = NoisePartitions.all_startpoints()
-        noise_end_points = NoisePartitions.all_endpoints()
-
-        noise_time = 0
-        for noise_start, noise_end in zip(noise_start_points, noise_end_points):
-            if (noise_start > start and noise_start < end): # some noise starts in the sample
-                if (noise_end < end): # noise starts and finishes in the sample
-                    noise_length = (noise_end-noise_start)
-                    noise_time += noise_length
-                else: # noise starts in the sample and goes until the end of it
-                    noise_length = (end-noise_start)
-                    noise_time += noise_length
-
-            elif (noise_end > start and noise_end < end): # some noise ends in the sample (this means it started before the sample)
-                noise_length = (noise_end-start)
-                noise_time += noise_length
-
-            # all the sampe is noise:
-            if (noise_start < start and noise_end > end):
-                noise_length = (noise_end-noise_start)
-                noise_time += noise_length
-
-
-        if (noise_time > maximum_noise):
-            return True
-        else:
-            return False
\ No newline at end of file
+        return samples.is_too_noisy(start, end, int(self.minimum_sample_size_space.text()), NoisePartitions.all_startpoints(),
+                                    NoisePartitions.all_endpoints(), PALMS.get().from_sample_to_time(len(PALMS.get().ECG_DATA)-1))
@@ -91,6 +91,68 @@ class Track(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
 
+MAPPED_MIN_BLOCK = 64  # finest level of the pyramid of a signal mapped from a file (about 4% of its size in memory)
+
+
+class MinMaxPyramid:
+    """
+    Level-of-detail min/max pyramid of a signal, so that a view can be drawn from a number of points proportional
+    to the screen width whatever the zoom. Level k keeps the min and max of blocks of factor**(k+1) samples;
+    all levels together take 2/3 of the signal size. With min_block (a power of factor) the levels of smaller blocks
+    are not kept, and views closer than min_block samples per pixel are drawn from the values themselves.
+    """
+    factor = 4
+
+    def __init__(self, values: np.ndarray, min_block: int = 1):
+        self.values = values
+        self.levels = []  # (block size, mins, maxs)
+        mins = maxs = values
+        block = 1
+        step = max(self.factor, min_block)
+        while len(mins) > step:
+            idx = np.arange(0, len(mins), step)
+            mins, maxs = np.minimum.reduceat(mins, idx), np.maximum.reduceat(maxs, idx)
+            block *= step
+            self.levels.append((block, mins, maxs))
+            step = self.factor
+
+    def update(self, start: int, stop: int):
+        """recomputes the blocks covering samples [start, stop) after self.values changed there"""
+        lower_block, lower_mins, lower_maxs = 1, self.values, self.values
+        for block, mins, maxs in self.levels:
+            step = block // lower_block
+            first, last = start // step, -(-stop // step)
+            lo, hi = first * step, min(last * step, len(lower_mins))
+            idx = np.arange(lo, hi, step) - lo
+            mins[first:last] = np.minimum.reduceat(lower_mins[lo:hi], idx)
+            maxs[first:last] = np.maximum.reduceat(lower_maxs[lo:hi], idx)
+            start, stop = first, last
+            lower_block, lower_mins, lower_maxs = block, mins, maxs
+
+    def get(self, start: int, stop: int, ds: int):
+        """
+        min/max envelope of samples [start, stop) with about (stop - start) / ds points of each, taken from the
+        coarsest level whose blocks are not larger than ds. Returns the interleaved min/max values and the
+        [first, last) samples they cover
+        """
+        block, mins, maxs = 1, self.values, self.values
+        for level_block, level_mins, level_maxs in self.levels:
+            if level_block > ds:
+                break
+            block, mins, maxs = level_block, level_mins, level_maxs
+        group = max(1, ds // block)
+        first, last = start // block, min(-(-stop // block), len(mins))
+        n = (last - first) // group
+        if n == 0:
+            group, n = 1, last - first
+        chunk_min = mins[first:first + n * group].reshape(n, group).min(axis=1)
+        chunk_max = maxs[first:first + n * group].reshape(n, group).max(axis=1)
+        visible = np.empty(n * 2, dtype=mins.dtype)
+        visible[0::2] = chunk_min
+        visible[1::2] = chunk_max
+        return visible, first * block, min((first + n * group) * block, len(self.values))
+
+
 def get_track_classes() -> List[Track]:
     def all_subclasses(c):
         return c.__subclasses__() + [a for b in c.__subclasses__() for a in all_subclasses(b)]
@@ -98,6 +160,67 @@ def get_track_classes() -> List[Track]:
     return [obj for obj in all_subclasses(Track)]
 
 
+class SampleTimes:
+    """
+    times of the samples of a Wave at fs, as np.linspace(0, (length - 1) / fs, length) + offset (the same values),
+    computed for the samples indexed instead of held as an array of length floats. It is sorted, and np.searchsorted
+    on it is computed from fs
+    """
+    dtype = np.dtype(float)
+    ndim = 1
+
+    def __init__(self, length, fs, offset=0):
+        self.length = int(length)
+        self.fs = fs
+        self.offset = offset
+        self.stop = (self.length - 1) / fs
+        self.step = self.stop / (self.length - 1) if self.length > 1 else 0.
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    def _times(self, index):
+        # as np.linspace: index * step, with the last sample at stop
+        return np.where(index == self.length - 1, self.stop, index * self.step) + self.offset
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._times(np.arange(*item.indices(self.length)))
+        index = np.asarray(item)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        index = np.where(index < 0, index + self.length, index)
+        if np.any((index < 0) | (index >= self.length)):
+            raise IndexError('index out of the {} sample times'.format(self.length))
+        times = self._times(index)
+        return float(times) if times.ndim == 0 else times
+
+    def __array__(self, dtype=None, copy=None):
+        """all the times, only where a whole array is needed"""
+        times = self._times(np.arange(self.length))
+        return times if dtype is None else times.astype(dtype)
+
+    def searchsorted(self, values, side='left', sorter=None):
+        values = np.asarray(values, dtype=float)
+        if self.length == 0:
+            return np.zeros(values.shape, dtype=np.int64)
+        index = np.nan_to_num(np.floor((values - self.offset) * self.fs), nan=self.length, posinf=self.length, neginf=0)
+        index = np.clip(index, 0, self.length).astype(np.int64)
+        # the rounding of the division is corrected with the times themselves
+        # a value is inserted before the times that are after it (or equal, for side 'left')
+        after = np.greater_equal if side == 'left' else np.greater
+        last = self.length - 1
+        for _ in range(2):
+            index = index - ((index > 0) & after(self._times(np.maximum(index - 1, 0)), values))
+        for _ in range(2):
+            index = index + ((index <= last) & ~after(self._times(np.minimum(index, last)), values))
+        return int(index) if index.ndim == 0 else index
+
+
 class Wave(Track):
 
     def __init__(self, y: np.ndarray, fs, ts=None, duration=None, offset=0, label=None, unit='au', filename=None):
@@ -106,12 +229,13 @@ class Wave(Track):
         assert 1 <= y.ndim, "only a single channel is supported"
         assert isinstance(fs, int)
         assert fs > 0
-        self._value = y.astype(float)
+        # a signal mapped from a session file (np.memmap) is kept mapped, only the samples used are read
+        self._value = y if isinstance(y, np.memmap) and y.dtype.kind == 'f' else y.astype(float)
         self._fs = fs
         self._offset = offset  # this is required to support heterogenous fs in multitracks
         self.type = 'Wave'
         from gui import PALMS
-        self.ts = ts if ts is not None else np.linspace(0, stop=(len(self._value) - 1) / fs, num=len(self._value)) + self._offset
+        self.ts = ts if ts is not None else SampleTimes(len(self._value), fs, self._offset)
         #self.ts = ts if ts is not None else np.linspace(0, stop=(len(PALMS.get().ECG_DATA)/PALMS.get().FREQUENCY), num=len(PALMS.get().ECG_DATA)) + self._offset
 
         self.filename = self.label + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") if filename is None else filename
@@ -124,15 +248,17 @@ class Wave(Track):
         yrange_margin = PALMS.config['yrange_margin']
         self.minY = np.min(self._value) * (1 + yrange_margin) if np.min(self._value) < 0 else np.min(self._value) * (1 - yrange_margin)
         self.maxY = np.max(self._value) * (1 - yrange_margin) if np.max(self._value) < 0 else np.max(self._value) * (1 + yrange_margin)
-        self.minX = np.min(self.ts)
-        self.maxX = np.max(self.ts)
+        self.minX = self.ts[0] if isinstance(self.ts, SampleTimes) else np.min(self.ts)
+        self.maxX = self.ts[-1] if isinstance(self.ts, SampleTimes) else np.max(self.ts)
 
         self.unit = unit
 
-        self._viewvalue = self._value.copy()
+        self._viewvalue = self._value if isinstance(self._value, np.memmap) else self._value.copy()
+        self._pyramid = None
 
     def invert(self):
         self._value = -self._value
+        self._pyramid = None
 
     def derive_RR(self, new_rr):
         return Derived(self, new_rr=new_rr)
@@ -169,6 +295,7 @@ class Wave(Track):
         assert isinstance(value, np.ndarray)
         assert 1 == value.ndim, 'only a single channel is supported'
         self._value = value
+        self._pyramid = None
         if not (len(self._value) <= self._duration < len(self._value) + 1):
             self._duration = len(self._value)
 
@@ -181,11 +308,33 @@ class Wave(Track):
         assert isinstance(viewvalue, np.ndarray)
         assert 1 == viewvalue.ndim, 'only a single channel is supported'
         self._viewvalue = viewvalue
+        self._pyramid = None
         if not (len(self._viewvalue) <= self._duration < len(self._viewvalue) + 1):
             self._duration = len(self._viewvalue)
 
     def reset_viewvalue(self):
         self._viewvalue = self._value
+        self._pyramid = None
+
+    def get_pyramid(self) -> MinMaxPyramid:
+        """min/max pyramid of viewvalue, built on first use (the first draw after loading) and kept up to date"""
+        if self._pyramid is None or self._pyramid.values is not self._viewvalue:
+            # a mapped signal keeps only the coarser levels in memory
+            min_block = MAPPED_MIN_BLOCK if isinstance(self._viewvalue, np.memmap) else 1
+            self._pyramid = MinMaxPyramid(self._viewvalue, min_block)
+        return self._pyramid
+
+    def update_value_range(self, start: int, values: np.ndarray):
+        """overwrites value (and viewvalue) from sample start in place, without copying the whole wave"""
+        self._value[start:start + len(values)] = values
+        if self._viewvalue is not self._value:
+            self._viewvalue[start:start + len(values)] = values
+        self.viewvalue_changed(start, start + len(values))
+
+    def viewvalue_changed(self, start: int, stop: int):
+        """to be called after viewvalue was modified in place in [start, stop), keeps the pyramid up to date"""
+        if self._pyramid is not None and self._pyramid.values is self._viewvalue:
+            self._pyramid.update(start, stop)
 
     viewvalue = property(get_viewvalue, set_viewvalue)
 
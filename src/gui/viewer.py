@@ -27,6 +27,8 @@ from gui.dialogs.help_popup import help_popup
 from gui.dialogs.FilterConfigDialog import FilterConfigDialog
 from gui import tracking
 from logic.databases.DatabaseHandler import Database
+from logic.rr_store import RRStore
+from logic import rr_track
 from PyQt5.QtCore import qInfo, qDebug
 from .display_panel import DisplayPanel, Frame
 from .button_panel import ButtonPanel, ButtonFrame
@@ -35,7 +37,7 @@ from .results_panel import ResultsFrame, ResultsPanel
 from .outliers_panel import OutliersFrame, OutliersPanel
 from .model import Model, View, Panel
 from .view_table import ViewTable
-from utils.utils_general import get_project_root, resource_path
+from utils.utils_general import get_project_root, resource_path, find_closest_sorted
 from utils.utils_gui import Dialog
 from logic.operation_mode.operation_mode import Modes, Mode
 from logic.operation_mode.partitioning import SinglePartition, Partitions
@@ -1573,9 +1575,11 @@ class PALMS(object):  # Application - here's still the best place for it methink
     rr_intervals = None
     original_rr = None
     original_fiducials = None
+    _time_index = None
     DATA_TYPE = None # 0 for ECG, 1 for RR, 2 for respiratory, 3 for ppg
     #
     SAVE_FILE = None
+    SESSION_JOURNAL = None  # (session file, journal_id) of the session loaded, whose edits are journaled
     NEXT_FILE = None
     _instance = None
     config = config.default_config
@@ -1695,6 +1699,10 @@ class PALMS(object):  # Application - here's still the best place for it methink
         self.updateRR(True, True)
 
         if self.is_load:
+            # the edits journaled before are already replayed, the new ones are appended to the same journal
+            if self.SESSION_JOURNAL is not None:
+                self.viewer.top_left_w.start_journal(*self.SESSION_JOURNAL, append=True)
+
             # add as missing beats the outliers that are not interpolations
 
             # write noise and outliers previous things
@@ -1869,23 +1877,11 @@ class PALMS(object):  # Application - here's still the best place for it methink
             end_indexes = self.END_MISSING_INDEXES
 
             rr_ts = np.arange(0, self.END_MISSING_INDEXES[-1] / frequency, 1 / frequency)
-            total_rr = np.zeros_like(rr_ts).astype(float)
-            time_data = np.zeros_like(rr_ts)
-
-            for start, end in zip(start_indexes, end_indexes):
-                annotations = np.cumsum(ecg_data)+end-start
-                annotations -= annotations[0]
-                annotations *= frequency
-                current_annotations = annotations[(annotations >= start) & (annotations <= end)]
-                current_ecg = original_ecg[(annotations >= start) & (annotations <= end)]
-                # ecg_data is original rr interpolated considering its times
-                interpolated_rr = np.interp(list(range(start, end)), current_annotations, current_ecg)
-                total_rr[start:end] = interpolated_rr[:(end-start)]
-                # time data
+            # ecg_data is original rr interpolated considering its times
+            total_rr, time_data = rr_track.rr_signal(original_ecg, start_indexes, end_indexes, frequency)
 
             # time_desired
             time_desired = rr_ts
-            time_data = annotations
             
             import copy
             self.rr_intervals = copy.deepcopy(time_data)
@@ -1958,7 +1954,7 @@ class PALMS(object):  # Application - here's still the best place for it methink
                 new_fiducials, self.rr_intervals = Annotation.get().create_RRinterval_track(correct)
             else:
                 self.original_rr, self.rr_intervals = Annotation.get().create_RRinterval_track(correct)
-                self.original_fiducials = copy.deepcopy(self.rr_intervals)
+                self.original_fiducials = self.rr_intervals.copy()
                 new_fiducials = copy.deepcopy(self.original_rr)
 
 
@@ -1990,8 +1986,8 @@ class PALMS(object):  # Application - here's still the best place for it methink
                 new_fiducials, self.rr_intervals = Annotation.get().create_RRinterval_track(correct)
             else:
                 self.original_rr, self.rr_intervals = Annotation.get().create_RRinterval_track(correct)
-                self.original_fiducials = copy.deepcopy(self.rr_intervals)
-                new_fiducials = copy.deepcopy(self.rr_intervals)
+                self.original_fiducials = self.rr_intervals.copy()
+                new_fiducials = copy.deepcopy(self.original_rr)
 
             self.viewer.guiDelView()
 
@@ -2018,55 +2014,69 @@ class PALMS(object):  # Application - here's still the best place for it methink
         # annotation_change: index of the annotation to change
         # change_type: 0 to add, 1 to delete, 2 to interpolate
 
-        if self.RR_ONLY is False:
-            self.fiducials, self.rr_intervals = Annotation.get().update_RRinterval_track(annotation_change, change_type)
+        self.fiducials, self.rr_intervals, changed_region = Annotation.get().update_RRinterval_track(annotation_change, change_type)
 
-            if updateGraph:
+        if not updateGraph:
+            return
 
-                first_view = self.viewer.getRRDisplayPanel().panel.views[0]
-                first_view.set_color((100, 100, 100, 100))
-                self.viewer.getRRDisplayPanel().plot_area.changeColor(first_view)
-                #
-                import copy
-                new_fiducials = copy.deepcopy(self.original_rr)
-                new_fiducials.set_value(self.fiducials.get_value())
-                new_fiducials.set_viewvalue(self.fiducials.get_viewvalue())
-                self.viewer.guiDelView()
-                self.add_view_from_track(new_fiducials, 1)
-                
-                self.viewer.RRDisplayPanel.plot_area.alignViews()
-        
-                self.viewer.selectedDisplayPanel.plot_area.redraw_fiducials()
+        if not self.updateRRViewRegion(changed_region):
+            # the edit does not fit in the current view (e.g. out of its y limits): rebuild it
+            panel_index = 1 if self.RR_ONLY is False else 0
+            self.viewer.guiDelView()
 
-        
-                self.viewer.results_w.update_current_result()
+            first_view = self.viewer.getRRDisplayPanel().panel.views[0]
+            first_view.set_color((100, 100, 100, 100))
+            self.viewer.getRRDisplayPanel().plot_area.changeColor(first_view)
 
-                self.viewer.RRregion = None
-                self.viewer.updateHighlighted()
+            import copy
+            new_fiducials = copy.deepcopy(self.original_rr)
+            new_fiducials.set_value(self.fiducials.get_value())
+            new_fiducials.set_viewvalue(self.fiducials.get_viewvalue())
+            self.add_view_from_track(new_fiducials, panel_index)
 
-        else:
-            self.fiducials, self.rr_intervals = Annotation.get().update_RRinterval_track(annotation_change, change_type)
+            self.viewer.RRDisplayPanel.plot_area.alignViews()
 
-            if updateGraph:
+        if self.RR_ONLY is False:
+            self.viewer.selectedDisplayPanel.plot_area.redraw_fiducials()
+        else:
+            self.viewer.RRDisplayPanel.plot_area.redraw_fiducials()
 
-                self.viewer.guiDelView()
+        self.viewer.results_w.update_current_result()
 
-                first_view = self.viewer.getRRDisplayPanel().panel.views[0]
-                first_view.set_color((100, 100, 100, 100))
-                self.viewer.getRRDisplayPanel().plot_area.changeColor(first_view)
+        if self.RR_ONLY is False:
+            self.viewer.RRregion = None
+            self.viewer.updateHighlighted()
 
-                import copy
-                new_fiducials = copy.deepcopy(self.original_rr)
-                new_fiducials.set_value(self.fiducials.get_value())
-                new_fiducials.set_viewvalue(self.fiducials.get_viewvalue())
-                
-                self.add_view_from_track(new_fiducials, 0)
-                
-                self.viewer.RRDisplayPanel.plot_area.alignViews()
-        
-                self.viewer.RRDisplayPanel.plot_area.redraw_fiducials()
+    def updateRRViewRegion(self, changed_region):
+        """
+        redraws the current RR view after a single beat edit. The view shares the values of self.fiducials,
+        which were already updated in place, so only the visible part is re-rendered, and only if it contains the edit.
+        returns False if the view has to be rebuilt
+        """
+        views = self.viewer.getRRDisplayPanel().panel.views
+        if len(views) < 2:
+            return False
+        view = views[-1]
+        track = view.track
+        if len(track.get_value()) != len(self.fiducials.get_value()):
+            return False
+        start, end = changed_region
+        changed_values = self.fiducials.get_value()[start:end]
+        if len(changed_values) and (np.min(changed_values) < track.minY or np.max(changed_values) > track.maxY):
+            return False
+
+        if track is not self.fiducials:
+            if track.get_viewvalue() is self.fiducials.get_viewvalue():
+                # same values, only the pyramid of the view track is behind
+                track.viewvalue_changed(start, end)
+            else:
+                track.set_value(self.fiducials.get_value())
+                track.set_viewvalue(self.fiducials.get_viewvalue())
 
-                self.viewer.results_w.update_current_result()
+        x_min, x_max = view.renderer.vb.viewRange()[0]
+        if start / track.fs <= x_max and end / track.fs >= x_min:
+            view.renderer.generatePlotData()
+        return True
 
 
     def createNewRRGraph(self):
@@ -2125,22 +2135,77 @@ class PALMS(object):  # Application - here's still the best place for it methink
         from logic.databases.DatabaseHandler import Database
         real_time = Database.get().tracks[Database.get().main_track_label].time
         return real_time[sample_index]
-    
-    def from_time_to_sample(self, time):
+
+    def get_time_index(self):
+        """
+        time vector of the main track, and whether it is sorted (then time -> sample conversions use binary search).
+        cached until the main track time vector changes
+        """
         from logic.databases.DatabaseHandler import Database
         real_time = Database.get().tracks[Database.get().main_track_label].time
-        real_time = np.array(real_time)
+        if self._time_index is None or self._time_index[0] is not real_time:
+            if isinstance(real_time, tracking.SampleTimes):
+                # computed from fs, sorted
+                self._time_index = (real_time, real_time, True)
+            else:
+                real_time_array = np.asarray(real_time)
+                is_sorted = bool(np.all(real_time_array[1:] >= real_time_array[:-1]))
+                self._time_index = (real_time, real_time_array, is_sorted)
+        return self._time_index[1], self._time_index[2]
+    
+    def from_time_to_sample(self, time):
+        real_time, is_sorted = self.get_time_index()
+        if is_sorted:
+            sample_index = np.searchsorted(real_time, time, side='left')
+            if sample_index < len(real_time) and real_time[sample_index] == time:
+                return sample_index
+            raise IndexError('time {} is not a sample time'.format(time))
         sample_index = np.where(real_time == time)[0]
         sample_index = sample_index[0]
         return sample_index
     
     def from_time_to_closest_sample(self, value):
-        from logic.databases.DatabaseHandler import Database
-        real_time = Database.get().tracks[Database.get().main_track_label].time
-        real_time = np.asarray(real_time)
+        real_time, is_sorted = self.get_time_index()
+        if is_sorted:
+            return find_closest_sorted(real_time, value)
         idx = (np.abs(real_time - value)).argmin()
         return idx
-    
+
+    def release_session_file(self, file_path):
+        """
+        moves the signals mapped from the session file_path (session_file.read_signal) to temporary copies and redraws
+        them, so that no mapping of the file is left when a new session file replaces it
+        """
+        import gc
+        from logic.segmented_signal import SegmentedSignal
+        from logic.session_file import detach_signal
+        copies = {}
+        self.ECG_DATA = detach_signal(self.ECG_DATA, file_path, copies)
+        database = Database.get()
+        tracks = list(database.tracks.values()) + [self.original_rr, self.fiducials]
+        for track in tracks:
+            if not isinstance(track, tracking.Wave):
+                continue
+            value = detach_signal(track.value, file_path, copies)
+            if value is not track.value:
+                track.value = value
+            viewvalue = detach_signal(track.viewvalue, file_path, copies)
+            if viewvalue is not track.viewvalue:
+                track.viewvalue = viewvalue
+        if getattr(database, 'ecg_raw', None) is not None:
+            database.ecg_raw = detach_signal(database.ecg_raw, file_path, copies)
+            if isinstance(getattr(database, 'signal', None), SegmentedSignal):
+                # its blocks are views of the signal
+                database.signal = SegmentedSignal.from_indexes(database.ecg_raw, database.start_indexes,
+                                                               database.end_indexes, database.signal.fs)
+        # the plotted samples are views of the signals too
+        for frame in self.viewer.frames[2:]:  # 2 to skip 0 (outliers) and 1 (buttons)
+            for view in frame.displayPanel.panel.views:
+                if hasattr(view.renderer, 'generatePlotData'):
+                    view.renderer.generatePlotData()
+        del copies
+        gc.collect()
+
 
     
 
@@ -2275,6 +2340,8 @@ class PALMS(object):  # Application - here's still the best place for it methink
                 noise_starts = np.delete(self.END_INDEXES, -1)
                 noise_ends = np.delete(self.START_INDEXES, 0)
                 for noise_start, noise_end in zip(noise_starts, noise_ends):
+                    if RRNoisePartitions.find_partition_by_point(noise_start/self.FREQUENCY) is not None:
+                        continue  # missing region, created above
                     p = NoisePartition("", start=noise_start/self.FREQUENCY, end=noise_end/self.FREQUENCY) 
                     self.viewer.getSelectedDisplayPanel().plot_area.main_vb.addItem(p)
                     p_rr = RRNoisePartition("", start=noise_start/self.FREQUENCY, end=noise_end/self.FREQUENCY) 
@@ -2333,12 +2400,14 @@ class PALMS(object):  # Application - here's still the best place for it methink
         self.LAST_DATETIME = None
         self.ORIGINAL_DATETIME = None
         self.fiducials = np.array([], dtype="int32")
-        self.rr_intervals = np.array([])
+        self.rr_intervals = RRStore()
         self.original_rr = np.array([])
-        self.original_fiducials = np.array([])
+        self.original_fiducials = RRStore()
+        self._time_index = None
         #
         self.NEXT_FILE = None
         self.SAVE_FILE = None
+        self.SESSION_JOURNAL = None
         self._instance = None
         self.config = config.default_config
         self.shortcuts = None
@@ -0,0 +1,448 @@
+"""
+Headless batch processing of recordings, without Qt or the PALMS state. Each file goes through the same steps as a
+new file in the application: import, beat detection, noise detection and beat correction with the analysis settings
+(settings.json), default samples, and then the session file (.h5) and the HRV results (.csv) are written.
+
+ECG and RR recordings in csv, txt, dat and edf files are supported. PPG and respiration recordings need their
+detectors, which are part of the application databases (logic/databases), so they are only processed in the GUI.
+"""
+import json
+import logging
+import pathlib
+
+import numpy as np
+
+from logic import hrv_analysis, outliers, results_export, rr_track, samples
+from logic.rr_track import detect_ecg_segment
+from logic.session_file import write_session
+from utils.parallel_detection import detect_segments
+from utils.utils_general import butter_highpass_filter, butter_lowpass_filter
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = ('csv', 'txt', 'dat', 'edf')
+DATA_TYPES = {'ecg': 0, 'rr': 1}  # data type combobox of the import window
+SEPARATORS = {'Semicolon': ';', 'Comma': ',', 'Space': ' ', 'Tab': '|'}
+RR_FREQUENCY = 100  # samples/s of the interpolated RR signal of RR recordings
+RESULTS_SUFFIX = '_results'  # end of the names of the files written by the batch processing
+
+# import options of each file, as in the import window
+DEFAULT_OPTIONS = {'file_type': None,  # by default from the file extension
+                   'data_type': 'ecg',
+                   'column': '1',  # column number (csv, txt, dat) or channel name (edf)
+                   'separator': 'Comma',
+                   'header_lines': 0,
+                   'frequency': None,  # required for csv, txt and dat
+                   'units': 's',  # units of RR recordings: s or ms
+                   'sample_name': 'sample',
+                   'detection_workers': 0,
+                   'detection_window_sec': 0,
+                   'detection_window_overlap_sec': 20,
+                   'detection_min_parallel_sec': 600}
+
+
+def load_settings(settings_path):
+    with open(settings_path) as f:
+        return json.load(f)
+
+
+def time_format(seconds):
+    """seconds from the start to the "%d--%H:%M:%S" format of the application"""
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"1--{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+
+
+def read_signal(path, options):
+    """values of the selected column (or edf channel) and the sampling frequency"""
+    file_type = (options['file_type'] or pathlib.Path(path).suffix[1:]).lower()
+    if file_type not in FILE_TYPES:
+        raise ValueError(f"{path}: unsupported file type {file_type}")
+
+    if file_type == 'edf':
+        import pyedflib
+        signal, signal_headers, header = pyedflib.highlevel.read_edf(str(path), ch_names=options['column'])
+        values = np.array(signal[0])
+        frequency = options['frequency'] or signal_headers[0]["sample_frequency"]
+    else:
+        import pandas as pd
+        if options['frequency'] is None:
+            raise ValueError(f"{path}: the sampling frequency is needed for {file_type} files")
+        delimiter = SEPARATORS.get(options['separator'], "/")
+        txt_data = pd.read_csv(path, usecols=[int(options['column'])-1], header=None, sep=delimiter, engine="c")
+        values = np.array(txt_data.iloc[:, 0].values)[int(options['header_lines']):].astype("float32")
+        frequency = options['frequency']
+
+    if DATA_TYPES[options['data_type']] == 1 and options['units'] == 'ms':
+        values = values/1000
+    return values, float(frequency)
+
+
+class Recording:
+    """State of one file during its processing, the headless counterpart of the PALMS attributes of the same name"""
+
+    def __init__(self, path, values, frequency, data_type):
+        self.CURRENT_FILE = str(path)
+        self.RR_ONLY = data_type == 1
+        self.DATA_TYPE = 0  # ECG and RR, after the import
+        self.ORIGINAL_DATETIME = None
+        self.START_ECG_INDEXES = np.array([], dtype="int32")
+        self.END_ECG_INDEXES = np.array([], dtype="int32")
+        self.threshold_outliers = np.array([], dtype="int32")
+        self.algorithm_outliers = {}
+        self.samples = {}  # name -> [(start, end)] in seconds
+        # noise of the RR signal: [start, end, name] in seconds, sorted by midpoint
+        self.noise_partitions = []
+
+        if self.RR_ONLY:
+            self.FREQUENCY = RR_FREQUENCY
+            self.START_MISSING_INDEXES = np.array([0], dtype="int32")
+            self.END_MISSING_INDEXES = np.array([int(np.sum(values)*RR_FREQUENCY)], dtype="int32")
+        else:
+            self.FREQUENCY = round(frequency)
+            self.START_MISSING_INDEXES = np.array([0], dtype="int32")
+            self.END_MISSING_INDEXES = np.array([len(values)-1], dtype="int32")
+        self.FIRST_DATETIME = time_format(0.0)
+        self.LAST_DATETIME = time_format(len(values)/frequency if not self.RR_ONLY else np.sum(values))
+
+    def from_sample_to_time(self, sample):
+        return sample/self.FREQUENCY
+
+    def from_time_to_closest_sample(self, time):
+        return int(min(max(round(time*self.FREQUENCY), 0), len(self.ECG_DATA)-1))
+
+    def noise_points(self, names=None):
+        partitions = [p for p in self.noise_partitions if names is None or p[2] in names]
+        return np.array([p[0] for p in partitions]), np.array([p[1] for p in partitions])
+
+    def add_noise(self, start, end, name):
+        midpoints = [(p[0]+p[1])/2 for p in self.noise_partitions]
+        self.noise_partitions.insert(int(np.searchsorted(midpoints, (start+end)/2)), [start, end, name])
+
+    def noise_sample_ranges(self):
+        starts, ends = self.noise_points()
+        return [(self.from_time_to_closest_sample(start), self.from_time_to_closest_sample(end)) for start, end in zip(starts, ends)]
+
+
+def import_recording(path, options):
+    """Recording with its beats and RR intervals, as after the import of a new file"""
+    values, frequency = read_signal(path, options)
+    recording = Recording(path, values, frequency, DATA_TYPES[options['data_type']])
+    if recording.RR_ONLY:
+        _import_rr(recording, values)
+    else:
+        _import_ecg(recording, values, options)
+    _create_rr_track(recording)
+    return recording
+
+
+def _import_ecg(recording, ecg, options):
+    fs = recording.FREQUENCY
+    ecg = np.array(ecg, dtype=float)
+    # same filters as the displayed signal, the detector filters it again
+    for start, end in zip(recording.START_MISSING_INDEXES, recording.END_MISSING_INDEXES):
+        ecg_data_filt = butter_highpass_filter(ecg[start:end], 1, int(fs), order=5)
+        ecg[start:end] = butter_lowpass_filter(ecg_data_filt, 48, int(fs), order=5)
+    recording.ECG_DATA = ecg
+
+    window_sec = options['detection_window_sec']
+    results = detect_segments(detect_ecg_segment, ecg, recording.START_MISSING_INDEXES, recording.END_MISSING_INDEXES, fs,
+                              max_workers=options['detection_workers'], window=int(window_sec * fs) if window_sec else None,
+                              overlap=int(options['detection_window_overlap_sec'] * fs), min_distance=int(0.2 * fs),
+                              min_parallel_samples=int(options['detection_min_parallel_sec'] * fs))
+    annotations = np.array([], dtype="int32")
+    for start, (qrs_peaks_indices, noise_intervals) in zip(recording.START_MISSING_INDEXES, results):
+        for noise_start, noise_end in noise_intervals:
+            recording.START_ECG_INDEXES = np.append(recording.START_ECG_INDEXES, int(start + noise_end))
+            recording.END_ECG_INDEXES = np.append(recording.END_ECG_INDEXES, int(start + noise_start))
+        annotations = np.append(annotations, np.array(start + qrs_peaks_indices))
+    recording.START_ECG_INDEXES = np.sort(recording.START_ECG_INDEXES)
+    recording.END_ECG_INDEXES = np.sort(recording.END_ECG_INDEXES)
+    if len(annotations) == 0:
+        raise ValueError(f"{recording.CURRENT_FILE}: no beats detected")
+    recording.annotations = annotations.astype(int)
+    recording.original_annotations = recording.annotations.copy()
+
+
+def _import_rr(recording, rr):
+    """RR signal and beats of an RR recording (rr_track.rr_signal, as PALMS.initialize_new_rr_file)"""
+    total_rr, annotations = rr_track.rr_signal(rr, recording.START_MISSING_INDEXES, recording.END_MISSING_INDEXES,
+                                               recording.FREQUENCY)
+    recording.ECG_DATA = total_rr
+    recording.annotations = np.array(annotations).astype(int)
+    recording.original_annotations = recording.annotations.copy()
+
+
+def _create_rr_track(recording):
+    """dense RR signal and RR store of the original beats (rr_track.create_rr, as Annotation.create_RRinterval_track)"""
+    fs = recording.FREQUENCY
+    recording.original_rr, recording.original_fiducials = rr_track.create_rr(
+        recording.annotations, recording.START_MISSING_INDEXES, recording.END_MISSING_INDEXES, fs, fs,
+        rr_track.rr_length(recording.END_MISSING_INDEXES[-1], fs))
+    recording.rr_intervals = recording.original_fiducials.copy()
+
+    # missing parts between segments and noise found by the detector
+    for new_end, new_start in zip(recording.END_MISSING_INDEXES[:-1], recording.START_MISSING_INDEXES[1:]):
+        recording.add_noise(recording.from_sample_to_time(new_end), recording.from_sample_to_time(new_start), "miss")
+    for new_end, new_start in zip(recording.END_ECG_INDEXES, recording.START_ECG_INDEXES):
+        recording.add_noise(recording.from_sample_to_time(new_end), recording.from_sample_to_time(new_start), "ecg")
+
+
+def update_rr(recording, annotations, annotation_change, change_type):
+    """RR store part of Annotation.update_RRinterval_track (rr_track.update_rr_store)"""
+    rr_track.update_rr_store(recording.rr_intervals, annotations, annotation_change, change_type, recording.FREQUENCY,
+                             len(recording.ECG_DATA))
+
+
+def _clean_segments(recording):
+    noise_start_points, noise_end_points = recording.noise_points()
+    return outliers.clean_segments(noise_start_points, noise_end_points, len(recording.ECG_DATA), recording.from_time_to_closest_sample)
+
+
+def _threshold_outliers(recording, level, use_original):
+    threshold, window_size = outliers.THRESHOLD_LEVELS[level]
+    noise_end_samples, noise_start_samples = _clean_segments(recording)
+    rr_intervals = recording.original_fiducials if use_original else recording.rr_intervals
+    annotations = recording.original_annotations if use_original else recording.annotations
+    return outliers.threshold_loop(noise_end_samples, noise_start_samples, rr_intervals, window_size, threshold, annotations, recording.FREQUENCY)
+
+
+def _algorithm_outliers(recording, use_original):
+    """beats found by the decision algorithm, corrected when use_original is False (see outlier_decision_algorithm)"""
+    noise_end_samples, noise_start_samples = _clean_segments(recording)
+    rr_intervals = recording.original_fiducials if use_original else recording.rr_intervals
+    annotations = recording.original_annotations if use_original else recording.annotations
+    extra_beats, miss_beats, ectopic_beats, long_short_beats = outliers.algorithm_beats(noise_end_samples, noise_start_samples, rr_intervals, annotations)
+    if use_original:
+        # as in the application, the beats of the algorithm are only listed once they are corrected
+        return np.array([])
+
+    def set_annotations(new_annotations):
+        recording.annotations = new_annotations
+
+    recording.algorithm_outliers, recording.annotations = outliers.apply_algorithm(
+        annotations, extra_beats, miss_beats, ectopic_beats, long_short_beats,
+        lambda sample, change_type: update_rr(recording, recording.annotations, sample, change_type),
+        set_annotations, recording.from_sample_to_time)
+    all_outliers = np.concatenate((recording.algorithm_outliers.get("delete", []), recording.algorithm_outliers.get("add", []), recording.algorithm_outliers.get("interpolate", [])))
+    all_outliers.sort()
+    return all_outliers
+
+
+def detect_noise(recording, settings):
+    """noise intervals where the outliers are too close to each other (see LeftOptionsPanel.detectNoise)"""
+    noise_level = settings["noise_detection_level"]
+    if noise_level in outliers.NOISE_LEVELS:
+        noise_size_limit, noise_length_limit = outliers.NOISE_LEVELS[noise_level]
+        outlier_level = noise_level
+    elif noise_level == 5:
+        noise_size_limit = settings["between_beats"]
+        noise_length_limit = settings["minimum_noise"]
+        outlier_level = settings["noise_outlier_level"]
+    else:
+        return
+
+    noise_end_samples, noise_start_samples = _clean_segments(recording)
+    if outlier_level in outliers.THRESHOLD_LEVELS and outlier_level != 5:
+        all_outliers = _threshold_outliers(recording, outlier_level, True)
+    elif outlier_level == 5:
+        all_outliers = _algorithm_outliers(recording, True)
+    else:
+        return
+    if len(all_outliers) == 0:
+        return
+
+    all_outliers = np.unique(all_outliers)
+    all_samples = np.sort(np.vectorize(recording.from_time_to_closest_sample)(all_outliers))
+    annotations = np.sort(np.array(recording.original_annotations))
+
+    noise_intervals = outliers.noise_clusters(all_outliers, all_samples, annotations, recording.original_fiducials, noise_end_samples, noise_start_samples, noise_size_limit, noise_length_limit, recording.from_sample_to_time)
+    for new_start_noise, new_end_noise in noise_intervals:
+        for new_start, new_end in zip(new_start_noise, new_end_noise):
+            recording.add_noise(new_start, new_end, "")
+
+
+def correct_beats(recording, settings):
+    """decision algorithm and threshold correction of the settings, as for a new file in the application"""
+    if settings["algorithm_option"]:
+        _algorithm_outliers(recording, False)
+    level = settings["beat_correction_level"]
+    if level in outliers.THRESHOLD_LEVELS:
+        new_outliers = _threshold_outliers(recording, level, False)
+        for outlier in new_outliers:
+            recording.threshold_outliers = np.append(recording.threshold_outliers, outlier)
+            update_rr(recording, recording.annotations, recording.from_time_to_closest_sample(outlier), 2)
+
+    # beats inside noise are left out of the results
+    if not recording.RR_ONLY:
+        recording.rr_intervals.set_noise(recording.noise_sample_ranges())
+
+
+def is_too_noisy(recording, start, end, minimum_sample_size):
+    """samples.is_too_noisy with the noise of the recording, start and end in seconds"""
+    noise_start_points, noise_end_points = recording.noise_points()
+    return samples.is_too_noisy(start, end, minimum_sample_size, noise_start_points, noise_end_points,
+                                recording.from_sample_to_time(len(recording.ECG_DATA)-1))
+
+
+def add_default_samples(recording, settings, name):
+    """number_samples consecutive samples of sample_length seconds from the start, skipping the too noisy ones"""
+    duration_index = recording.from_time_to_closest_sample(settings["sample_length"])
+    duration = recording.from_sample_to_time(duration_index)
+    repetitions = int(settings["number_samples"])
+    minimum_sample_size = int(settings["minimum_sample_size"])
+    if not samples.repetitions_fit(0, duration_index, repetitions, minimum_sample_size, len(recording.ECG_DATA)):
+        raise ValueError(f"{recording.CURRENT_FILE}: the signal is not long enough to have so many repetitions")
+
+    limits = samples.repeated_samples(0.0, duration, repetitions, duration,
+                                      lambda start, end: is_too_noisy(recording, start, end, minimum_sample_size))
+    if limits:
+        recording.samples.setdefault(name, []).extend(limits)
+
+
+def save_session(recording, settings, file_path):
+    samples_dictionary = {}
+    for sample_name, limits in recording.samples.items():
+        samples_dictionary[sample_name] = {i: {'start': recording.from_time_to_closest_sample(start), 'end': recording.from_time_to_closest_sample(end)}
+                                           for i, (start, end) in enumerate(limits)}
+    noise_start_points, noise_end_points = recording.noise_points()
+    attributes = {'noise_level': settings["noise_detection_level"],
+                  'beat_correction_level': settings["beat_correction_level"],
+                  'frequency': recording.FREQUENCY,
+                  'current_outlier': 0,
+                  'RR_ONLY': recording.RR_ONLY,
+                  'DATA_TYPE': recording.DATA_TYPE}
+    datasets = {'ecg_values': recording.ECG_DATA,
+                'annotations': recording.annotations,
+                'original_rr': recording.original_rr,
+                'original_fiducials_samples': recording.original_fiducials.valid_samples(),
+                'original_fiducials_intervals': recording.original_fiducials.values(),
+                'original_annotations': recording.original_annotations,
+                'threshold_outliers': recording.threshold_outliers,
+                'noise_start_indexes': noise_start_points,
+                'noise_end_indexes': noise_end_points,
+                'missing_start_indexes': recording.START_MISSING_INDEXES,
+                'missing_end_indexes': recording.END_MISSING_INDEXES}
+    flags = {'is_algorithm_outlier': False,
+             'is_threshold_outlier': False,
+             'algorithm_correction': bool(settings["algorithm_option"]),
+             'first_datetime': recording.FIRST_DATETIME,
+             'last_datetime': recording.LAST_DATETIME,
+             'current_file': recording.CURRENT_FILE}
+    write_session(file_path, attributes, datasets, samples_dictionary, flags, recording.algorithm_outliers)
+
+
+def corrected_between(recording, settings, start, end):
+    """
+    outliers corrected between two times (s): the algorithm ones when it is active, otherwise the threshold ones,
+    as selected in the outliers panel after a new file (see find_outliers_between_two_ts)
+    """
+    if settings["algorithm_option"]:
+        corrected = np.concatenate([np.asarray(value, dtype=float) for value in recording.algorithm_outliers.values()] + [np.array([])])
+    else:
+        corrected = np.asarray(recording.threshold_outliers, dtype=float)
+    return corrected[(corrected > start) & (corrected < end)]
+
+
+def sample_selections(recording, settings):
+    """
+    (title, start, end, rr_local, corrected_number) of every sample of the recording, in the export order.
+    rr_local is None for samples with too few RR intervals, which only keep their title
+    """
+    selections = []
+    for sample_name, limits in recording.samples.items():
+        for i, (start, end) in enumerate(limits):
+            title = sample_name+" "+str(i+1)
+            rr_local = recording.rr_intervals.between(recording.from_time_to_closest_sample(start), recording.from_time_to_closest_sample(end))
+            if len(rr_local) < results_export.MIN_BEATS:
+                selections.append((title, start, end, None, 0))
+                continue
+            selections.append((title, start, end, rr_local, len(corrected_between(recording, settings, start, end))))
+    return selections
+
+
+def sample_results(rr_local, settings, fbands=None):
+    """(time, frequency, nonlinear) results of the RR intervals of one sample"""
+    if fbands is None:
+        fbands = hrv_analysis.frequency_bands(settings)
+    return (hrv_analysis.time_results(rr_local, settings),
+            hrv_analysis.frequency_results(rr_local, settings, fbands),
+            hrv_analysis.nonlinear_results(rr_local, settings))
+
+
+def fill_table(table, selections, results):
+    """adds the samples to a ResultsTable, results[k] being the sample_results of selections[k] (None without results)"""
+    for (title, start, end, rr_local, corrected_number), sample_result in zip(selections, results):
+        table.add_title(title)
+        if rr_local is None:
+            continue
+        table.add_sample(start, end, rr_local, corrected_number, *sample_result)
+    return table
+
+
+def results_table(recording, settings):
+    """ResultsTable with the HRV results of every sample of the recording"""
+    fbands = hrv_analysis.frequency_bands(settings)
+    selections = sample_selections(recording, settings)
+    results = [None if rr_local is None else sample_results(rr_local, settings, fbands)
+               for _, _, _, rr_local, _ in selections]
+    return fill_table(results_export.ResultsTable(recording.FIRST_DATETIME, recording.ORIGINAL_DATETIME), selections, results)
+
+
+def header_rows(recording, settings):
+    """software, file and parameter rows at the top of the results of the recording"""
+    rows = results_export.software_rows()
+    rows += results_export.file_rows(recording.CURRENT_FILE, recording.FIRST_DATETIME, recording.LAST_DATETIME, recording.FREQUENCY)
+    rows += results_export.parameter_rows(settings, sum(len(limits) for limits in recording.samples.values()))
+    return rows
+
+
+def process_recording(path, settings, options):
+    """Recording after the import, noise detection, beat correction and default samples"""
+    recording = import_recording(path, options)
+    detect_noise(recording, settings)
+    correct_beats(recording, settings)
+    add_default_samples(recording, settings, options['sample_name'])
+    return recording
+
+
+def check_output_folder(input_folder, output_folder):
+    """raises ValueError if output_folder is the folder of the recordings (the results would be taken as recordings)"""
+    if pathlib.Path(input_folder).resolve() == pathlib.Path(output_folder).resolve():
+        raise ValueError(f"The output folder must be different from the folder of the recordings ({input_folder})")
+
+
+def output_paths(path, output_folder):
+    """session (.h5) and results (.csv) files of a recording, {name}_results.h5 and {name}_results.csv"""
+    path = pathlib.Path(path)
+    output_folder = pathlib.Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    name = path.stem + RESULTS_SUFFIX
+    return output_folder / (name + '.h5'), output_folder / (name + '.csv')
+
+
+def process_file(path, settings, output_folder, options=None):
+    """processes one file and writes {name}_results.h5 and {name}_results.csv in output_folder. Returns both paths"""
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    check_output_folder(pathlib.Path(path).parent, output_folder)
+    session_path, results_path = output_paths(path, output_folder)
+
+    recording = process_recording(pathlib.Path(path), settings, options)
+    save_session(recording, settings, session_path)
+    results_table(recording, settings).write(results_path, header_rows(recording, settings))
+    return session_path, results_path
+
+
+def find_files(input_folder, pattern=None, file_type=None, exclude=()):
+    """
+    recordings in the folder (not in subfolders), by default all the supported file types. The files written by the
+    batch processing ({name}_results) and the names in exclude are left out
+    """
+    input_folder = pathlib.Path(input_folder)
+    if pattern is None:
+        file_types = [file_type] if file_type else FILE_TYPES
+        files = [f for f in input_folder.iterdir() if f.is_file() and f.suffix[1:].lower() in file_types]
+    else:
+        files = [f for f in input_folder.glob(pattern) if f.is_file()]
+    return sorted(f for f in files if not f.stem.endswith(RESULTS_SUFFIX) and f.name not in exclude)
+
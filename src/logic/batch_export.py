@@ -0,0 +1,153 @@
+"""
+Parallel batch export of a folder of recordings (logic/batch_engine.py) into one combined results table.
+
+Each file is imported and corrected in a worker process, which writes its session file and returns only the header
+rows and the RR intervals of its samples. The HRV results of every sample are then computed as separate tasks, so
+a few long files with many samples also use all the workers. When all the samples of a file are done, its results
+file is written and its rows are appended to the combined table, in the order of the files. At most two files per
+worker are in flight (being processed or waiting for the earlier files), which bounds the memory use. A file that
+fails (in any of its tasks) is reported and left out of the combined table, the others continue.
+"""
+import csv
+import logging
+import pathlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from logic import batch_engine, hrv_analysis, results_export
+from utils.parallel_detection import get_max_workers
+
+logger = logging.getLogger(__name__)
+
+COMBINED_FILE = 'combined_results.csv'
+FILES_PER_WORKER = 2  # files in flight per worker process
+
+
+class _SerialExecutor:
+    """runs the tasks when submitted, for a single worker (no process pool)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def prepare_file(path, settings, output_folder, options):
+    """
+    worker task of a file: processing and session file. Returns the results header rows, the datetimes of the
+    recording and the sample selections (see batch_engine.sample_selections)
+    """
+    session_path, _ = batch_engine.output_paths(path, output_folder)
+    recording = batch_engine.process_recording(pathlib.Path(path), settings, options)
+    batch_engine.save_session(recording, settings, session_path)
+    return {'header_rows': batch_engine.header_rows(recording, settings),
+            'first_datetime': recording.FIRST_DATETIME,
+            'original_datetime': recording.ORIGINAL_DATETIME,
+            'selections': batch_engine.sample_selections(recording, settings)}
+
+
+def write_file(path, output_folder, prepared, results, combined_writer):
+    """results file of a prepared file and its rows of the combined table. Returns the session and results paths"""
+    session_path, results_path = batch_engine.output_paths(path, output_folder)
+    table = results_export.ResultsTable(prepared['first_datetime'], prepared['original_datetime'])
+    batch_engine.fill_table(table, prepared['selections'], results)
+    table.write(results_path, prepared['header_rows'])
+
+    for (title, start, end, rr_local, corrected_number), sample_result in zip(prepared['selections'], results):
+        if rr_local is None:
+            continue
+        combined_writer.writerow(results_export.summary_row(pathlib.Path(path).name, title, prepared['first_datetime'],
+                                                            start, end, rr_local, corrected_number, *sample_result))
+    return session_path, results_path
+
+
+def export_directory(input_folder, settings, output_folder, options=None, pattern=None, max_workers=None,
+                     combined_file=COMBINED_FILE, progress=None):
+    """
+    processes every recording of the folder with max_workers processes (all CPUs by default) and writes the
+    combined table to output_folder/combined_file. output_folder must be another folder than input_folder, so the
+    results are never taken as recordings by a later run. progress(files_done, files_total, path, error) is called
+    when each file is finished (error is None or the exception). Returns {path: (session_path, results_path) or the
+    exception}
+    """
+    options = {**batch_engine.DEFAULT_OPTIONS, **(options or {})}
+    batch_engine.check_output_folder(input_folder, output_folder)
+    files = batch_engine.find_files(input_folder, pattern, options['file_type'], exclude=(combined_file,))
+    output_folder = pathlib.Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    workers = get_max_workers(max_workers, len(files))
+    if workers > 1:
+        # the files already use all the workers, no process pools inside them
+        options['detection_workers'] = 1
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = _SerialExecutor()
+    fbands = hrv_analysis.frequency_bands(settings)
+
+    results = {}
+    jobs = {}  # file index -> {'prepared', 'results', 'remaining', 'error'}
+    pending = {}  # future -> (file index, sample index or None for the file task)
+    next_submit = 0
+    next_write = 0
+
+    with executor, open(output_folder / combined_file, 'w', newline='') as f:
+        combined_writer = csv.writer(f)
+        combined_writer.writerow(results_export.SUMMARY_HEADER)
+
+        while next_write < len(files):
+            while next_submit < len(files) and next_submit - next_write < FILES_PER_WORKER * workers:
+                jobs[next_submit] = {'prepared': None, 'results': None, 'remaining': 0, 'error': None}
+                pending[executor.submit(prepare_file, files[next_submit], settings, output_folder, options)] = (next_submit, None)
+                next_submit += 1
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, sample_index = pending.pop(future)
+                job = jobs.get(index)
+                if job is None or job['error'] is not None:
+                    continue  # the file already failed
+                try:
+                    value = future.result()
+                except Exception as e:
+                    job['error'] = e
+                    continue
+
+                if sample_index is None:
+                    job['prepared'] = value
+                    job['results'] = [None] * len(value['selections'])
+                    for k, (_, _, _, rr_local, _) in enumerate(value['selections']):
+                        if rr_local is not None:
+                            job['remaining'] += 1
+                            pending[executor.submit(batch_engine.sample_results, rr_local, settings, fbands)] = (index, k)
+                else:
+                    job['results'][sample_index] = value
+                    job['remaining'] -= 1
+
+            # finished files, in order
+            while next_write < next_submit:
+                job = jobs[next_write]
+                if job['error'] is None and (job['prepared'] is None or job['remaining'] > 0):
+                    break
+                path = files[next_write]
+                if job['error'] is None:
+                    try:
+                        results[path] = write_file(path, output_folder, job['prepared'], job['results'], combined_writer)
+                    except Exception as e:
+                        job['error'] = e
+                if job['error'] is not None:
+                    logger.error(f"{path.name}: failed", exc_info=job['error'])
+                    results[path] = job['error']
+                del jobs[next_write]
+                next_write += 1
+                if progress is not None:
+                    progress(next_write, len(files), path, job['error'])
+    return results
@@ -310,8 +310,8 @@ class Database(metaclass=abc.ABCMeta):
             if Viewer.get().settings_menu.save_tracks_action.isChecked():
                 group_tracks = hf.create_group('tracks')
                 for label, track in Database.get().tracks.items():
-                    group_tracks.create_dataset(label + '/ts', data=track.ts)
-                    group_tracks.create_dataset(label + '/amp', data=track.value)
+                    group_tracks.create_dataset(label + '/ts', data=track.ts, chunks=True, compression='gzip', shuffle=True)
+                    group_tracks.create_dataset(label + '/amp', data=track.value, chunks=True, compression='gzip', shuffle=True)
                     group_tracks.create_dataset(label + '/offset', data=track.offset)
                     group_tracks.create_dataset(label + '/fs', data=track.fs)
 
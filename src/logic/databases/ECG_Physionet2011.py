@@ -10,17 +10,18 @@ import pathlib
 from PyQt5.QtCore import qInfo
 from qtpy.QtWidgets import QMessageBox
 
-from gui.tracking import Wave
+from gui.tracking import Wave, SampleTimes
 from logic.databases.DatabaseHandler import Database
 from utils.utils_general import get_project_root, butter_highpass_filter, butter_lowpass_filter, resource_path
 from utils.utils_gui import Dialog
+from utils.parallel_detection import detect_segments, detection_settings
+from logic.segmented_signal import SegmentedSignal, copy_signal
+from logic.rr_track import detect_ecg_segment
 import numpy as np
 from __main__ import PanTompkinsQRSDetector
 from utils import PanTompkinsImproved
 #from utils import PanTompkinsImproved
 
-from scipy.interpolate import interp1d
-
 
 #NB: for this example to work one needs to put some of the PhysioNet/CinC Challenge 2011 .txt data files into docs\examples\example_Physionet2011
 # https://archive.physionet.org/physiobank/database/challenge/2011/
@@ -71,16 +72,14 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
 
         #ecg_data = ecg
         # NB: 2.2 Convert\preprocess data, create new representations
-        ecg_total, desired_time = self.interpolate_signal(ecg_data, round(frequency))
-
-        self.ecg_raw = ecg_total
-
-        for start, end in zip(start_indexes,end_indexes):
-
-            ecg_data_filt = butter_highpass_filter(ecg_total[start:end], 1, int(Fs_ecg), order=5)  # NB: created and filtered data
-            ecg_data_filt = butter_lowpass_filter(ecg_data_filt, 48, int(Fs_ecg), order=5)
-
-            ecg_total[start:end] = ecg_data_filt
+        # the recorded blocks are filtered one by one into a copy of the signal (with its dtype, mapped if the import
+        # is), the samples out of them are kept as imported
+        ecg_total = copy_signal(ecg_data)
+        SegmentedSignal.from_indexes(ecg_total, start_indexes, end_indexes, round(Fs_ecg)).map(
+            lambda block: butter_lowpass_filter(butter_highpass_filter(block, 1, int(Fs_ecg), order=5), 48, int(Fs_ecg), order=5),
+            out=ecg_total)
+        # computed from the sample when used, not held for every sample
+        desired_time = SampleTimes(len(ecg_total), round(frequency))
 
         
         #if _ecg_inverted(ecg_total[int(len(ecg_total)/4):int(len(ecg_total)/2+len(ecg_total)/10)], sampling_rate=Fs_ecg):
@@ -91,6 +90,9 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         #ecg = Wave(ecg_data, Fs_ecg, label='ecg', filename=self.fullpath.parts[-1][:-1])
         
         ecg_filt = Wave(ecg_total, round(Fs_ecg), desired_time, label='ecg_filt', filename=self.fullpath.parts[-1][:-1])
+        # the detection runs on the blocks of the values of the track, as views of them
+        self.ecg_raw = ecg_filt.value
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, start_indexes, end_indexes, round(Fs_ecg))
         
         #for s in [ecg_filt, ecg]:
         #    tracks[s.label] = s
@@ -183,7 +185,7 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         #ecg_data = ecg
         # NB: 2.2 Convert\preprocess data, create new representations
         from gui import PALMS
-        desired_time = np.linspace(0, stop=(len(ecg_data) - 1) / Fs_ecg, num=len(ecg_data))
+        desired_time = SampleTimes(len(ecg_data), Fs_ecg)
         ecg_total = ecg_data
         
         # NB 3. Create tracks and save them to the DB
@@ -191,6 +193,9 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         #ecg = Wave(ecg_data, Fs_ecg, label='ecg', filename=self.fullpath.parts[-1][:-1])
         
         ecg_filt = Wave(ecg_total, round(Fs_ecg), desired_time, label='ecg_filt', filename=self.fullpath.parts[-1][:-1])
+        # the detection runs on the blocks of the values of the track, as views of them
+        self.ecg_raw = ecg_filt.value
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, start_indexes, end_indexes, round(Fs_ecg))
         
         #for s in [ecg_filt, ecg]:
         #    tracks[s.label] = s
@@ -205,18 +210,6 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         return tracks
     
 
-    def interpolate_signal(self, ecg_data, fs):
-        # Determine the desired time points for interpolation
-        desired_time = np.linspace(0, stop=(len(ecg_data) - 1) / fs, num=len(ecg_data))
-
-        # Create an interpolation function
-        interpolated_signal = interp1d(desired_time, ecg_data, kind="linear")
-
-        # Interpolate the signal at the desired time points
-        interpolated_values = interpolated_signal(desired_time)
-        return interpolated_values, desired_time
-
-
     def set_annotation_data(self, frequency):
         print(frequency)
         # NB: used to set initial guesses for annotations, otherwise, one has to start annotation from scratch
@@ -247,28 +240,7 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
             
             try:
 
-                total_indices = np.array([], dtype="int32")
-                for start, end in zip(self.start_indexes, self.end_indexes):
-
-                    # use any beat detection algorithm here, new_values is indexes of beats
-                    #nyq = 0.5 * fs  # Nyquist Frequency
-                    #low = 5 / nyq
-                    #high = 18 / nyq
-                    #from scipy import signal
-                    #b, a = signal.butter(5, [low, high], btype='band')
-                    #ecg_data_filt = signal.lfilter(b, a, self.ecg_raw[start:end])
-                    ecg_data_filt = butter_highpass_filter(self.ecg_raw[start:end], 5, fs, order=5)  # NB: created and filtered data
-                    ecg_data_filt = butter_lowpass_filter(ecg_data_filt, 18, fs, order=5)
-                    qrs_detector = PanTompkinsQRSDetector(self.tracks[self.main_track_label].value, ecg_data_filt, fs, verbose=True, log_data=False, plot_data=False, show_plot=False)
-                    new_values = np.array(start+qrs_detector.qrs_peaks_indices)
-                    #from ecgdetectors import Detectors
-                    #detectors = Detectors(fs)
-                    #new_values = detectors.pan_tompkins_detector(self.ecg_raw[start:end])
-                    #timestamp = np.arange(start, end)
-                    #filtered_ecg_measurements, smooth_signal, integrated_signal = PanTompkinsImproved.Pan_Tompkins_QRS().solve(ecg[start:end], fs, timestamp)
-                    #new_values = PanTompkinsImproved.detect_peaks(ecg[start:end], fs, filtered_ecg_measurements, integrated_signal)
-                    
-                    total_indices = np.append(total_indices, new_values)
+                total_indices = self.detect_all_segments(self.start_indexes, self.end_indexes, fs)
                 
                 #total_indices = np.concatenate(total_indices)
                 
@@ -290,6 +262,20 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
                 print(error_traceback)
 
 
+    def detect_all_segments(self, start_indexes, end_indexes, fs):
+        """
+        R-peaks of all the continuous segments, detected in parallel (see utils.parallel_detection). The noise found
+        by the detector splits the segments in PALMS afterwards, in segment order as in a serial run
+        """
+        # use any beat detection algorithm in detect_ecg_segment, it returns indexes of beats in the segment
+        results = detect_segments(detect_ecg_segment, self.signal, start_indexes, end_indexes, fs,
+                                  min_distance=int(0.2 * fs), **detection_settings(fs))
+        total_indices = np.array([], dtype="int32")
+        for start, (qrs_peaks_indices, noise_intervals) in zip(start_indexes, results):
+            PanTompkinsQRSDetector.add_noise_intervals(noise_intervals)
+            total_indices = np.append(total_indices, np.array(start + qrs_peaks_indices))
+        return total_indices
+
     def set_rr_annotation_data(self, total_indices):
         self._set_annotation_from_idx('rpeak', total_indices)
 
@@ -314,28 +300,7 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
             
         try:
 
-            total_indices = np.array([], dtype="int32")
-            for start, end in zip(start_indexes, end_indexes):
-
-                # use any beat detection algorithm here, new_values is indexes of beats
-                #nyq = 0.5 * fs  # Nyquist Frequency
-                #low = 5 / nyq
-                #high = 18 / nyq
-                #from scipy import signal
-                #b, a = signal.butter(5, [low, high], btype='band')
-                #ecg_data_filt = signal.lfilter(b, a, self.ecg_raw[start:end])
-                ecg_data_filt = butter_highpass_filter(self.ecg_raw[start:end], 5, fs, order=5)  # NB: created and filtered data
-                ecg_data_filt = butter_lowpass_filter(ecg_data_filt, 18, fs, order=5)
-                qrs_detector = PanTompkinsQRSDetector(self.tracks[self.main_track_label].value, ecg_data_filt, fs, verbose=True, log_data=False, plot_data=False, show_plot=False)
-                new_values = np.array(start+qrs_detector.qrs_peaks_indices)
-                #from ecgdetectors import Detectors
-                #detectors = Detectors(fs)
-                #new_values = detectors.pan_tompkins_detector(self.ecg_raw[start:end])
-                #timestamp = np.arange(start, end)
-                #filtered_ecg_measurements, smooth_signal, integrated_signal = PanTompkinsImproved.Pan_Tompkins_QRS().solve(ecg[start:end], fs, timestamp)
-                #new_values = PanTompkinsImproved.detect_peaks(ecg[start:end], fs, filtered_ecg_measurements, integrated_signal)
-                
-                total_indices = np.append(total_indices, new_values)
+            total_indices = self.detect_all_segments(start_indexes, end_indexes, fs)
                 
             #total_indices = np.concatenate(total_indices)
                 
@@ -362,6 +327,8 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         PALMS.get().ECG_DATA = self.ecg_raw
         self.tracks[self.main_track_label].value = self.ecg_raw
         self.tracks[self.main_track_label].viewvalue = self.ecg_raw
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, self.start_indexes, self.end_indexes,
+                                                   self.tracks[self.main_track_label].fs)
         self.redetect_peaks()
 
 
@@ -382,6 +349,7 @@ class ECG_Physionet2011(Database):  # NB: !!!!!!!!!!!  class name should be equa
         #  Inherited method loads data from .h5 files, but one can define custom protocol here
         super().load(filename)
 
+
 def _ecg_inverted(ecg_signal, sampling_rate=1000, window_time=2.0):
     """Checks whether an ECG signal is inverted."""
 
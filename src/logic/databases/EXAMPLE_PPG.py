@@ -16,6 +16,8 @@ from logic.databases.DatabaseHandler import Database
 from utils.utils_general import get_project_root, butter_highpass_filter, butter_lowpass_filter, resource_path
 from utils.utils_gui import Dialog
 from utils.detect_peaks import detect_peaks
+from utils.parallel_detection import detect_segments, detection_settings
+from logic.segmented_signal import SegmentedSignal, copy_signal
 
 
 class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to database name (this filename)
@@ -65,7 +67,11 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         Fs_ppg = frequency
 
         # NB: 2.2 Convert\preprocess data, create new representations
-        ppg_filt_data = butter_lowpass_filter(ppg_data, 5, Fs_ppg, order=2)  # NB: created and filtered data
+        # each recorded block is filtered on its own (logic.segmented_signal) into a copy of the signal, the gaps are
+        # kept as imported
+        ppg_filt_data = copy_signal(ppg_data)
+        SegmentedSignal.from_indexes(ppg_filt_data, start_indexes, end_indexes, Fs_ppg).map(
+            lambda block: butter_lowpass_filter(block, 5, Fs_ppg, order=2), out=ppg_filt_data)  # NB: created and filtered data
 
         #ecg_data = butter_highpass_filter(ecg_data, 0.05, Fs_ecg, order=2)  # NB: created and filtered data
         #ecg_data = butter_lowpass_filter(ecg_data, 30, Fs_ecg, order=2)
@@ -80,6 +86,8 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         #for s in [ppg, ppg_filt]:
         #    tracks[s.label] = s
         tracks[ppg_filt.label] = ppg_filt
+        self.ecg_raw = ppg_filt.value
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, start_indexes, end_indexes, Fs_ppg)
 
         self.tracks = tracks
         self.track_labels = list(tracks.keys())
@@ -112,11 +120,9 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
             try:
 
                 total_peaks = np.array([], dtype="int32")
-                for start, end in zip(self.start_indexes, self.end_indexes):
-                    # # NB: 1. Find\fetch preliminary annotation data
-                    amp = self.tracks[self.main_track_label].value[start:end]
-                    peak = self.detect_ppg_peaks(amp, fs)
-
+                # # NB: 1. Find\fetch preliminary annotation data, all the segments in parallel
+                for (peak,) in detect_segments(detect_ppg_segment, self.signal, self.start_indexes,
+                                             self.end_indexes, fs, min_distance=int(0.3 * fs), **detection_settings(fs)):
                     total_peaks = np.append(total_peaks, peak)
 
                     # # NB: 2. Use inherited functions to assign annotations to the main signal
@@ -165,24 +171,9 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         try:
 
             total_indices = np.array([], dtype="int32")
-            for start, end in zip(start_indexes, end_indexes):
-
-                # use any beat detection algorithm here, new_values is indexes of beats
-                #nyq = 0.5 * fs  # Nyquist Frequency
-                #low = 5 / nyq
-                #high = 18 / nyq
-                #from scipy import signal
-                #b, a = signal.butter(5, [low, high], btype='band')
-                #ecg_data_filt = signal.lfilter(b, a, self.ecg_raw[start:end])
-                amp = self.tracks[self.main_track_label].value[start:end]
-                new_values = self.detect_ppg_peaks(amp, fs)
-                #from ecgdetectors import Detectors
-                #detectors = Detectors(fs)
-                #new_values = detectors.pan_tompkins_detector(self.ecg_raw[start:end])
-                #timestamp = np.arange(start, end)
-                #filtered_ecg_measurements, smooth_signal, integrated_signal = PanTompkinsImproved.Pan_Tompkins_QRS().solve(ecg[start:end], fs, timestamp)
-                #new_values = PanTompkinsImproved.detect_peaks(ecg[start:end], fs, filtered_ecg_measurements, integrated_signal)
-                
+            # use any beat detection algorithm in detect_ppg_segment, new_values is indexes of beats
+            for (new_values,) in detect_segments(detect_ppg_segment, self.signal, start_indexes,
+                                               end_indexes, fs, min_distance=int(0.3 * fs), **detection_settings(fs)):
                 total_indices = np.append(total_indices, new_values)
                 
             #total_indices = np.concatenate(total_indices)
@@ -210,6 +201,8 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         PALMS.get().ECG_DATA = self.ecg_raw
         self.tracks[self.main_track_label].value = self.ecg_raw
         self.tracks[self.main_track_label].viewvalue = self.ecg_raw
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, self.start_indexes, self.end_indexes,
+                                                   self.tracks[self.main_track_label].fs)
         self.redetect_peaks()
 
     def save(self, **kwargs):
@@ -359,4 +352,10 @@ class EXAMPLE_PPG(Database):  # NB: !!!!!!!!!!!  class name should be equal to d
         # Compute moving average.
         smoothed = np.convolve(w, x, mode="same")
         smoothed = smoothed[size:-size]
-        return smoothed
\ No newline at end of file
+        return smoothed
+
+
+def detect_ppg_segment(ppg_segment, fs):
+    """PPG peaks of one continuous segment, relative to the segment. Runs in the detection workers"""
+    # the peak detection only uses methods of the database, no state, so no database needs to be created
+    return EXAMPLE_PPG.__new__(EXAMPLE_PPG).detect_ppg_peaks(ppg_segment, fs)
@@ -10,6 +10,8 @@ from PyQt5.QtCore import qInfo
 from gui.tracking import Wave
 from logic.databases.DatabaseHandler import Database
 from utils.detect_peaks import detect_peaks
+from utils.parallel_detection import detect_segments, detection_settings
+from logic.segmented_signal import SegmentedSignal, copy_signal
 from utils.utils_general import get_project_root, butter_highpass_filter, butter_lowpass_filter, resource_path
 import numpy as np
 
@@ -57,14 +59,12 @@ class EXAMPLE_RESPIRATION(Database):
         #Fs_ecg = frequency
         #ppg_data = np.concatenate(np.array(f['/data/ppg/v']))
         #Fs_ppg = frequency
-        resp_data = ecg_data
-        resp_total = ecg_data
         Fs_resp = frequency
         # NB: 2.2 Convert\preprocess data, create new representation
-        for start, end in zip(start_indexes,end_indexes):
-            resp_data = butter_lowpass_filter(resp_data, 3, Fs_resp, order=2)  # NB: created and filtered data
-
-            resp_total[start:end] = resp_data
+        # each recorded block is filtered on its own (logic.segmented_signal) into a copy of the signal
+        resp_total = copy_signal(ecg_data)
+        SegmentedSignal.from_indexes(resp_total, start_indexes, end_indexes, Fs_resp).map(
+            lambda block: butter_lowpass_filter(block, 3, Fs_resp, order=2), out=resp_total)  # NB: created and filtered data
 
         # NB 3. Create tracks and save them to the DB
         # signals start at time=0
@@ -76,6 +76,8 @@ class EXAMPLE_RESPIRATION(Database):
         #for s in [resp]:
         #    tracks[s.label] = s
         tracks[resp.label] = resp
+        self.ecg_raw = resp.value
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, start_indexes, end_indexes, Fs_resp)
 
         self.tracks = tracks
         self.track_labels = list(tracks.keys())
@@ -112,14 +114,11 @@ class EXAMPLE_RESPIRATION(Database):
                 total_valley_indices = np.array([], dtype="int32")
                 total_upstroke_indices = np.array([], dtype="int32")
                 total_downstroke_indices = np.array([], dtype="int32")
-                for start, end in zip(self.start_indexes, self.end_indexes):
-                    # NB: 1. Find\fetch preliminary annotation data
-                    amp = self.tracks[self.main_track_label].value[start:end]
-                    mpd = self.tracks[self.main_track_label].fs * 2
-                    idx_peak = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=False, show=False, kpsh=False)
-                    idx_valley = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=True, show=False, kpsh=False)
-                    idx_upstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=False, show=False, kpsh=False)
-                    idx_downstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=True, show=False, kpsh=False)
+                # NB: 1. Find\fetch preliminary annotation data, all the segments in parallel
+                track = self.tracks[self.main_track_label]
+                for idx_peak, idx_valley, idx_upstroke, idx_downstroke in detect_segments(
+                        detect_respiration_segment, self.signal, self.start_indexes, self.end_indexes, track.fs,
+                        min_distance=track.fs * 2, **detection_settings(track.fs)):
 
                     total_peak_indices = np.append(total_peak_indices, idx_peak)
                     total_valley_indices = np.append(total_valley_indices, idx_valley)
@@ -174,15 +173,14 @@ class EXAMPLE_RESPIRATION(Database):
             
         try:
 
-            total_indices = np.array([], dtype="int32")
-            for start, end in zip(start_indexes, end_indexes):
-
-                amp = self.tracks[self.main_track_label].value[start:end]
-                mpd = self.tracks[self.main_track_label].fs * 2
-                idx_peak = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=False, show=False, kpsh=False)
-                idx_valley = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=True, show=False, kpsh=False)
-                idx_upstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=False, show=False, kpsh=False)
-                idx_downstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=True, show=False, kpsh=False)
+            total_peak_indices = np.array([], dtype="int32")
+            total_valley_indices = np.array([], dtype="int32")
+            total_upstroke_indices = np.array([], dtype="int32")
+            total_downstroke_indices = np.array([], dtype="int32")
+            track = self.tracks[self.main_track_label]
+            for idx_peak, idx_valley, idx_upstroke, idx_downstroke in detect_segments(
+                    detect_respiration_segment, self.signal, start_indexes, end_indexes, track.fs,
+                    min_distance=track.fs * 2, **detection_settings(track.fs)):
 
                 total_peak_indices = np.append(total_peak_indices, idx_peak)
                 total_valley_indices = np.append(total_valley_indices, idx_valley)
@@ -215,6 +213,8 @@ class EXAMPLE_RESPIRATION(Database):
         PALMS.get().ECG_DATA = self.ecg_raw
         self.tracks[self.main_track_label].value = self.ecg_raw
         self.tracks[self.main_track_label].viewvalue = self.ecg_raw
+        self.signal = SegmentedSignal.from_indexes(self.ecg_raw, self.start_indexes, self.end_indexes,
+                                                   self.tracks[self.main_track_label].fs)
         self.redetect_peaks()
 
     def save(self, **kwargs):
@@ -225,3 +225,13 @@ class EXAMPLE_RESPIRATION(Database):
 
     def load(self, filename):
         super().load(filename)
+
+
+def detect_respiration_segment(amp, fs):
+    """peaks, valleys, upstrokes and downstrokes of one continuous segment, relative to the segment. Runs in the detection workers"""
+    mpd = fs * 2
+    idx_peak = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=False, show=False, kpsh=False)
+    idx_valley = detect_peaks(amp, mph=np.median(amp), mpd=mpd, valley=True, show=False, kpsh=False)
+    idx_upstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=False, show=False, kpsh=False)
+    idx_downstroke = detect_peaks(np.diff(amp), mph=np.median(np.diff(amp)), mpd=mpd, valley=True, show=False, kpsh=False)
+    return idx_peak, idx_valley, idx_upstroke, idx_downstroke
@@ -0,0 +1,181 @@
+"""
+Append-only journal of the edits made to a session (.h5, logic/session_file.py) after its last full save, so that a
+crash or a power loss does not lose them. The journal is a text file next to the session (JOURNAL_SUFFIX) with one
+JSON line per record: a header with the journal_id of the save it continues, then the edits. An edit has the
+changes of the state of the session since the previous one: the beats and outliers added and removed (SET_DATASETS),
+and the new value of the noise partitions (VALUE_DATASETS) and of the other attributes, samples, flags and algorithm
+outliers that changed. The lines are written
+and synced by a background thread, so the interface is not stalled by the disk.
+
+Opening the session replays the edits of its journal on top of it (replay), unless the journal belongs to another
+save (a crash between the save and the start of its new journal leaves a journal whose edits are already saved). A
+line cut by a crash ends the replay.
+"""
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+JOURNAL_SUFFIX = '.journal'
+# sorted sample arrays, journaled as the samples added and removed
+SET_DATASETS = ('annotations', 'threshold_outliers')
+# arrays journaled whole: the start and end times of the noise partitions, in the order of the partitions
+VALUE_DATASETS = ('noise_start_indexes', 'noise_end_indexes')
+DATASETS = SET_DATASETS + VALUE_DATASETS
+# sections of the state of a session
+SECTIONS = ('attributes', 'datasets', 'samples', 'flags', 'algorithm_outliers')
+
+
+def journal_path(session_path):
+    return f"{session_path}{JOURNAL_SUFFIX}"
+
+
+def _plain(value):
+    """numbers and arrays of numpy as values of json"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def _copy_state(state):
+    """copy of the arrays of a state, the scalars are kept as they are"""
+    return {section: {key: np.copy(value) if isinstance(value, np.ndarray) else value
+                      for key, value in state.get(section, {}).items()} for section in SECTIONS}
+
+
+def _changed(previous, current):
+    """keys of current whose values are not in previous or differ"""
+    return [key for key, value in current.items()
+            if key not in previous or np.shape(previous[key]) != np.shape(value)
+            or not np.array_equal(previous[key], value)]
+
+
+class EditJournal:
+    """journal of a session that records the changes of its state (sections of SECTIONS), see record"""
+
+    def __init__(self, session_path, journal_id, state, append=False):
+        """
+        state: state of the session when the journal starts (just saved, or opened and replayed); append continues
+        the journal of journal_id instead of starting a new one
+        """
+        self.path = journal_path(session_path)
+        self.state = _copy_state(state)
+        if append and os.path.isfile(self.path):
+            with open(self.path, 'rb+') as file:
+                # a line cut by a crash is removed, the new edits are written after the last complete one
+                data = file.read()
+                file.truncate(data.rfind(b'\n') + 1)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.file = open(self.path, 'w', encoding='utf-8')
+            self._write_line(json.dumps({'journal_id': journal_id}))
+        self.lines = queue.Queue()
+        self.thread = threading.Thread(target=self._write_lines, daemon=True)
+        self.thread.start()
+
+    def record(self, state):
+        """queues an edit with the changes from the last state recorded; returns False if nothing changed"""
+        edit = {}
+        for key, value in state.get('datasets', {}).items():
+            previous = self.state['datasets'].get(key)
+            if key in SET_DATASETS:
+                previous = np.array([], dtype=np.int64) if previous is None else previous
+                added, removed = np.setdiff1d(value, previous), np.setdiff1d(previous, value)
+                if added.size or removed.size:
+                    edit.setdefault('datasets', {})[key] = {'add': added, 'remove': removed}
+            elif key in _changed(self.state['datasets'], {key: value}):
+                edit.setdefault('datasets', {})[key] = {'value': value}
+        for section in ('attributes', 'flags'):
+            changed = _changed(self.state[section], state.get(section, {}))
+            if changed:
+                edit[section] = {key: state[section][key] for key in changed}
+        for section in ('samples', 'algorithm_outliers'):
+            # written whole, as keys can also be removed
+            current = state.get(section, {})
+            if _changed(self.state[section], current) or set(self.state[section]) - set(current):
+                edit[section] = current
+        if not edit:
+            return False
+        self.lines.put(json.dumps(edit, default=_plain))
+        self.state = _copy_state(state)
+        return True
+
+    def _write_line(self, line):
+        self.file.write(line + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _write_lines(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                break
+            self._write_line(line)
+        self.file.close()
+
+    def close(self):
+        """writes the queued edits and closes the file"""
+        self.lines.put(None)
+        self.thread.join()
+
+
+def read_edits(session_path, journal_id):
+    """edits of the journal of a session, none if there is no journal or it continues another save"""
+    path = journal_path(session_path)
+    if not os.path.isfile(path):
+        return []
+    edits = []
+    with open(path, 'r', encoding='utf-8') as file:
+        try:
+            header = json.loads(file.readline())
+        except ValueError:
+            return []
+        if header.get('journal_id') != journal_id:
+            return []
+        for line in file:
+            try:
+                edits.append(json.loads(line))
+            except ValueError:
+                # cut by a crash while it was written
+                break
+    return edits
+
+
+def _value(value):
+    """value of json as the value of the session file (numpy arrays and scalars)"""
+    return np.asarray(value)[()]
+
+
+def _like(values, dataset):
+    """
+    journaled samples as an array with the type of dataset, unless they do not fit in it (times in seconds of a
+    dataset that was saved as integers or empty), so they are not truncated
+    """
+    values = np.asarray(values)
+    if values.size == 0 or np.can_cast(values.dtype, dataset.dtype, casting='same_kind'):
+        return values.astype(dataset.dtype)
+    return values
+
+
+def replay(state, edits):
+    """state of the session (sections of SECTIONS) with the edits applied in order"""
+    state = _copy_state(state)
+    for edit in edits:
+        for key, change in edit.get('datasets', {}).items():
+            if 'value' in change:
+                state['datasets'][key] = np.asarray(change['value'])
+                continue
+            values = state['datasets'].get(key, np.array([], dtype=np.int64))
+            values = np.setdiff1d(values, _like(change['remove'], values))
+            state['datasets'][key] = np.union1d(values, _like(change['add'], values))
+        for section in ('attributes', 'flags'):
+            for key, value in edit.get(section, {}).items():
+                state[section][key] = _value(value)
+        if 'samples' in edit:
+            state['samples'] = {key: _value(value) for key, value in edit['samples'].items()}
+        if 'algorithm_outliers' in edit:
+            state['algorithm_outliers'] = {key: np.asarray(value) for key, value in edit['algorithm_outliers'].items()}
+    return state
+
@@ -0,0 +1,171 @@
+"""
+HRV results of a selection of RR intervals (s), computed from the analysis settings (settings.json) only.
+The results panel and the exports use these functions, and so does the headless batch processing
+(logic/batch_engine.py), which must not depend on Qt or on the state of the application.
+"""
+import numpy as np
+
+from modified_dependencies.pyhrv import time_domain as td
+from modified_dependencies.pyhrv import nonlinear as nl
+from utils.detrending import smoothness_priors_detrend
+
+DEFAULT_BIN_SIZE = 1000/128  # ms
+
+
+def get_stationary_rr(previous_rr, settings):
+    """RR intervals without their trend, with the detrending method of the settings"""
+    detrended_rr = previous_rr
+
+    if (settings['detrending_method'] == 1): # smoothn priors
+        regularization = settings['smoothing_parameter']
+        # banded (pentadiagonal) solver, linear in the number of beats
+        detrended_rr = smoothness_priors_detrend(previous_rr, regularization)
+
+    elif (settings['detrending_method'] in (2, 3, 4)): # 1st, 2nd or 3rd order polynomial
+        x = np.arange(len(previous_rr))
+        coefficients = np.polyfit(x, previous_rr, settings['detrending_method'] - 1)
+        trend = np.polyval(coefficients, x)
+        detrended_rr = previous_rr - trend
+
+    return detrended_rr
+
+
+def hrv_tinn(rri, binsize=DEFAULT_BIN_SIZE):
+    # Convert IBI values from seconds to milliseconds
+    rri = rri * 1000
+    bins = np.arange(np.min(rri), np.max(rri) + binsize, binsize)
+    bar_y, bar_x = np.histogram(rri, bins=bins)
+
+    min_error = 2 ** 14
+    X = bar_x[np.argmax(bar_y)]  # bin where Y is max
+    Y = np.max(bar_y)  # max value of Y
+    n = bar_x[0]
+    m = X + binsize  # starting search value of M
+    N = 0
+    M = 0
+    # start to find best values of M and N where least square is minimized
+    while n < X:
+        while m < np.max(rri):
+            n_start = np.where(bar_x == n)[0][0]
+            n_end = np.where(bar_x == X)[0][0]
+            qn = np.polyval(np.polyfit([n, X], [0, Y], deg=1), bar_x[n_start:n_end + 1])
+            m_start = np.where(bar_x == X)[0][0]
+            m_end = np.where(bar_x == m)[0][0]
+            qm = np.polyval(np.polyfit([X, m], [Y, 0], deg=1), bar_x[m_start:m_end + 1])
+            q = np.zeros(len(bar_x))
+            q[n_start:n_end + 1] = qn
+            q[m_start:m_end + 1] = qm
+            # least squares error
+            error = np.sum((bar_y[n_start:m_end + 1] - q[n_start:m_end + 1]) ** 2)
+            if error < min_error:
+                N = n
+                M = m
+                min_error = error
+            m += binsize
+        n += binsize
+    return round(M - N, 3)
+
+
+def stress_index(rr_intervals, rr_values_ms):
+    """Baevsky stress index, from the original intervals (mode) and the detrended ones (histogram and range)"""
+    rr_values = rr_intervals
+
+    # amo
+    bin_width = 0.050 # kubios documentation says 50
+    bins = np.arange(np.min(rr_values_ms), np.max(rr_values_ms) + bin_width, bin_width)
+    hist, edges = np.histogram(rr_values_ms, bins)
+    most_common_bin_index = np.argmax(hist)
+    amo = hist[most_common_bin_index]/len(rr_values_ms)
+
+    # mo
+    mo = np.abs(np.median(rr_values)) # original ones, detrended values makes no sense
+
+    # mxdmn
+    mxdmn = rr_values_ms.max() - rr_values_ms.min()
+
+    si_index = (amo*100)/(2*mo*mxdmn)
+
+    return round(np.sqrt(si_index), 3)
+
+
+def frequency_bands(settings):
+    """pyhrv frequency bands from the settings"""
+    return {'ulf': (0, 0), 'vlf': (float(settings['vlf_min']), float(settings['vlf_max'])),
+            'lf': (float(settings['lf_min']), float(settings['lf_max'])),
+            'hf': (float(settings['hf_min']), float(settings['hf_max']))}
+
+
+def time_results(rr_intervals, settings):
+    """mean_rr, sdnn, mean_hr, std_hr, min_hr, max_hr, rmssd, nnxx, pnnxx, triangular_index, tinn, stress_index, sdnn_index"""
+
+    # get detrended
+    detrended_rr = get_stationary_rr(rr_intervals, settings)
+
+    mean_rr = round(np.mean(rr_intervals), 3)
+    sdnn = td.sdnn(detrended_rr)
+    sdnn = round(sdnn['sdnn'], 3)
+    hr_results = td.hr_parameters(rr_intervals)
+    mean_hr = round(hr_results['hr_mean'], 3)
+    max_hr = round(hr_results['hr_max'], 3)
+    min_hr = round(hr_results['hr_min'], 3)
+    std_hr = round(hr_results['hr_std'], 3)
+    sdnn_index = sdnn/mean_rr
+    rmssd = td.rmssd(detrended_rr)
+    rmssd = round(rmssd['rmssd'], 3)
+    total_nnxx = td.nnXX(detrended_rr, threshold=(settings["nnxx_threshold"]))
+    nnxx = round(total_nnxx['nn'+str(settings["nnxx_threshold"])], 3)
+    pnnxx = round(total_nnxx['pnn'+str(settings["nnxx_threshold"])], 3)
+    triangular_index = td.triangular_index(detrended_rr, binsize=DEFAULT_BIN_SIZE, plot=False, show=False, figsize=None, legend=False)
+    triangular_index = round(triangular_index['tri_index'], 3)
+    try:
+        tinn = hrv_tinn(detrended_rr)
+    except:
+        tinn = None
+
+    # Calculate Baevsky Stress Index
+    stress = stress_index(rr_intervals, detrended_rr)
+
+    return mean_rr, sdnn, mean_hr, std_hr, min_hr, max_hr, rmssd, nnxx, pnnxx, triangular_index, tinn, stress, sdnn_index
+
+
+def _band_results(result, prefix, norm_key):
+    """peak (vlf, lf, hf), absolute (ms^2), log and relative powers, normalized lf and hf, total power and lf/hf ratio"""
+    values = []
+    for key in ('_peak', '_abs', '_log', '_rel'):
+        values += [round(result[prefix + key][band], 3) for band in (1, 2, 3)]
+    values += [round(result[prefix + norm_key][0], 3), round(result[prefix + norm_key][1], 3)]
+    values += [round(result[prefix + '_total'], 3), round(result[prefix + '_ratio'], 3)]
+    return values
+
+
+def frequency_results(rr_intervals, settings, fbands=None, cache=None):
+    """
+    16 values of the FFT spectrum (Welch, or Lomb-Scargle if selected in the settings) followed by the same 16 of the
+    AR spectrum, in the order of _band_results. cache (a ResultsCache) shares the spectra, as the results panel does
+    (logic/spectral_results.py)
+    """
+    from logic.spectral_results import spectral_result
+    return spectral_result(rr_intervals, settings, fbands, cache).values()
+
+
+def nonlinear_results(rr_intervals, settings):
+    """sd1, sd2, sd_ratio, apen, sampen, dfa1, dfa2"""
+    detrend = settings["nonlinear_detrending"]
+    if detrend:
+        rr_intervals = get_stationary_rr(rr_intervals, settings)
+    first_results = nl.poincare(rr_intervals, show=False)
+    second_results = nl.dfa(rr_intervals, show=False, short=[settings["n1_min"], settings["n1_max"]], long=[settings["n2_min"], settings["n2_max"]])
+    samp_en = nl.sample_entropy(rr_intervals, dim=settings["embedding_dimension"], tolerance=settings["tolerance"])
+    ap_en = nl.approximate_entropy(rr_intervals, dim=settings["embedding_dimension"], tolerance=settings["tolerance"])
+
+    sd1 = round(first_results['sd1'], 3)
+    sd2 = round(first_results['sd2'], 3)
+    sd_ratio = round(first_results['sd_ratio'], 3)
+
+    apen = round(ap_en['apen'], 3)
+    sampen = round(samp_en['sampen'], 3)
+
+    dfa1 = round(second_results['dfa_alpha1'], 3)
+    dfa2 = round(second_results['dfa_alpha2'], 3)
+
+    return sd1, sd2, sd_ratio, apen, sampen, dfa1, dfa2
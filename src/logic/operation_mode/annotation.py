@@ -16,7 +16,7 @@ from qtpy.QtCore import Signal
 
 from logic.databases.DatabaseHandler import Database
 from utils.detect_peaks import detect_peaks
-from utils.utils_general import find_closest, dict_to_df_with_nans
+from utils.utils_general import find_closest, find_closest_sorted, dict_to_df_with_nans
 from logic.operation_mode.noise_partitioning import NoisePartitions
 
 class Annotation(QObject):
@@ -24,6 +24,7 @@ class Annotation(QObject):
     signal_delete_annotation = pyqtSignal(float)
 
     def __init__(self, fiducial_name, x_=np.array([]), y_=np.array([]), parent=None):
+        # x (times) and idx (samples) are kept sorted: set sorted by SingleFiducialConfig, inserted in order by add
         super(QObject, self).__init__(parent)
         self.name = fiducial_name.lower()
         self.x = x_
@@ -66,7 +67,7 @@ class Annotation(QObject):
         fConf = AnnotationConfig.get()[fiducial_name]
         if fConf.annotation.x.size > 0:
             # closest_idx, _, _ = find_closest(fConf.annotation.x, np.array([x]))
-            closest_idx = np.argmin(abs(x - fConf.annotation.x))
+            closest_idx = find_closest_sorted(fConf.annotation.x, x)
             deleted_x, deleted_y = fConf.annotation.x[closest_idx], fConf.annotation.y[closest_idx]
 
             fConf.annotation.x = np.delete(fConf.annotation.x, closest_idx)
@@ -164,7 +165,7 @@ class Annotation(QObject):
         ts = track.get_time()
         fs = track.get_fs()
 
-        x_ind = np.argmin(abs(ts - x))
+        x_ind = find_closest_sorted(ts, x)
         left_x_ind, right_x_ind = int(max([x_ind - round(fs * window), 0])), int(min([x_ind + round(fs * window), amp.size]))
         left_x_ind, right_x_ind = int(max([allowed_region_idx[0], left_x_ind])), int(min(
             [allowed_region_idx[-1], right_x_ind]))  # both within window and allowed region
@@ -189,194 +190,111 @@ class Annotation(QObject):
 
     def create_RRinterval_track(self, correct=False):
         from gui import PALMS
+        from logic import rr_track
         db = Database.get()
         
         track_fs = db.tracks[db.main_track_label].fs
-        track_ts = db.tracks[db.main_track_label].ts
 
         fs = track_fs  # maximum zooming is defined by the lowest sampling freq of all tracks
         #if PALMS.get().RR_ONLY is False:
         #    rr_ts = np.arange(track_ts[0], round(track_ts[-1]), 1 / fs).astype(float)
         #else:
-        rr_ts = np.arange(track_ts[0], PALMS.get().END_MISSING_INDEXES[-1] / PALMS.get().FREQUENCY, 1 / PALMS.get().FREQUENCY).astype(float)
+        rr_length = rr_track.rr_length(PALMS.get().END_MISSING_INDEXES[-1], PALMS.get().FREQUENCY)
         
         annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
         annotations = np.array(annotations[0]) # points in which there is peak
-        
-        total_rr = np.zeros_like(rr_ts) # interpolated values here
-        local_rr = np.zeros_like(rr_ts) # just r intervals and 0s
-        current_index = 0
-        start_indexes = PALMS.get().START_MISSING_INDEXES
-        end_indexes = PALMS.get().END_MISSING_INDEXES
-
-        for start, end in zip(start_indexes, end_indexes):
-            
-            current_annotations = annotations[(annotations >= start) & (annotations <= end)]
-            
-            if (current_annotations != []):
-                annotation_intervals = np.diff(current_annotations)
-                
-                interval_times = annotation_intervals / track_fs # r-r intervals
-
-                if (correct):
-                    # get interpolation points and get their value
-                    annotation_indexes = np.array([], dtype="int32")
-                    PALMS.get().INTERPOLATIONS = np.array(PALMS.get().INTERPOLATIONS)
-                    interpolation_indeces = np.concatenate((PALMS.get().INTERPOLATIONS, PALMS.get().algorithm_outliers.get("interpolate", np.array([], dtype="int32")))) # time where there is interpolation
-                    if (len(interpolation_indeces) != 0):
-                        interpolation_indeces = np.array(interpolation_indeces) 
-                        interpolation_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(interpolation_indeces)# sample in which there is interpolation
-                        annotation_indexes = np.where(np.isin(current_annotations, interpolation_samples))[0]# index of annotation in which there is interpolation (interval_time is this-1)
-
-                    for annotation_index in annotation_indexes: 
-
-                        rr_index = int(annotation_index)-1
-
-                        # get previous 5 rr_intervals
-                        start_index = max(0, (rr_index - 5))
-                        window_pre = interval_times[start_index:(rr_index-1)]
-
-                        end_index = min(len(interval_times), (rr_index + 6))
-                        window_post = interval_times[(rr_index+1):end_index]
-                    
-                        mean = np.mean(np.concatenate((window_pre, window_post)))
-
-                        interval_times[rr_index] = mean
-                
-                local_rr[current_annotations[1:]] = interval_times
-                
-                if (start == 0 and len(db.start_indexes)!=1): # if start is the first in a list with more indexes
-                    interpolated_rr = np.interp(list(range(start, end)), current_annotations[1:], interval_times)
-                elif (current_index > 0 and current_index < len(db.start_indexes)-1): # in the middle
-                    interpolated_rr = np.interp(list(range(start, end)), current_annotations[1:], interval_times)
-                else:
-                    interpolated_rr = np.interp(list(range(start, end)), current_annotations[1:], interval_times)
-                
-                total_rr[start:end] = interpolated_rr
-
-                
-            current_index = current_index + 1
+
+        interpolation_samples = np.array([], dtype="int32")
+        if (correct):
+            # get interpolation points and get their value
+            PALMS.get().INTERPOLATIONS = np.array(PALMS.get().INTERPOLATIONS)
+            interpolation_indeces = np.concatenate((PALMS.get().INTERPOLATIONS, PALMS.get().algorithm_outliers.get("interpolate", np.array([], dtype="int32")))) # time where there is interpolation
+            if (len(interpolation_indeces) != 0):
+                interpolation_samples = np.vectorize(PALMS.get().from_time_to_closest_sample)(interpolation_indeces)# sample in which there is interpolation
+
+        # shared with the batch processing (logic/rr_track.py)
+        total_rr, local_rr = rr_track.create_rr(annotations, PALMS.get().START_MISSING_INDEXES, PALMS.get().END_MISSING_INDEXES,
+                                                track_fs, PALMS.get().FREQUENCY, rr_length, interpolation_samples)
 
         from gui.tracking import Wave
         rr_int_wave = Wave(total_rr, fs, offset=0, label='RR', unit='sec')
         rr_int_wave.type = 'RR'
         
-        # for convenience when getting results, local_rr has 0 values when noise
-        noise_start_points = NoisePartitions.all_startpoints()
-        noise_end_points = NoisePartitions.all_endpoints()
-
-        for start, end in zip(noise_start_points, noise_end_points):
-            local_rr[PALMS.get().from_time_to_closest_sample(start): PALMS.get().from_time_to_closest_sample(end)] = 0
+        # beats inside noise are flagged and left out of the results
+        local_rr.set_noise(self.get_noise_sample_ranges())
 
         return rr_int_wave, local_rr
 
+    @staticmethod
+    def get_noise_sample_ranges():
+        from gui import PALMS
+        noise_start_points = NoisePartitions.all_startpoints()
+        noise_end_points = NoisePartitions.all_endpoints()
+        return [(PALMS.get().from_time_to_closest_sample(start), PALMS.get().from_time_to_closest_sample(end))
+                for start, end in zip(noise_start_points, noise_end_points)]
+
 
     def update_RRinterval_track(self, annotation_change, change_type):
         # annotation_change: index of the sample where the change will be done
         # change_type: 0 to add, 1 to delete, 2 to interpolate
+        # only the intervals next to the changed beat are touched, the RR wave and the RR store are updated in place
+        # returns the RR wave, the RR store and the [start, end) samples of the wave that changed
 
         from gui import PALMS
-        import copy
-        old_rr_intervals = copy.deepcopy(PALMS.get().fiducials.value)
-        intervals = copy.deepcopy(PALMS.get().rr_intervals)
+        from logic import rr_track
+        rr_int_wave = PALMS.get().fiducials
+        old_rr_intervals = rr_int_wave.value
+        intervals = PALMS.get().rr_intervals
 
         annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
-        annotations = copy.deepcopy(np.array(annotations[0])) # points in which there is peak
-
-        try:
-            previous_annotation = max(annotations[np.where(annotations < annotation_change)[0][-1]], 0)
-        except:
-            previous_annotation = 0
+        annotations = np.asarray(annotations[0]) # points in which there is peak (sorted)
+        last_sample = len(PALMS.get().ECG_DATA)-2
 
-        try: 
-            next_annotation = min(annotations[np.where(annotations > annotation_change)[0][0]], len(PALMS.get().ECG_DATA)-2)
-        except:
-            next_annotation = len(PALMS.get().ECG_DATA)-2
         # for add: get second next
-        try:
-            second_next_annotation = min(annotations[np.where(annotations > next_annotation)[0][0]], len(PALMS.get().ECG_DATA)-2)
-        except:
-            second_next_annotation = len(PALMS.get().ECG_DATA)-2
+        previous_annotation, next_annotation, second_next_annotation = rr_track.neighbour_beats(annotations, annotation_change, last_sample)
 
         if change_type == 1: # if delete the current disapears, so current annotation is really previous
             first_interval = (next_annotation-previous_annotation)/PALMS.get().FREQUENCY # from previous to added
             second_interval = (second_next_annotation-next_annotation)/PALMS.get().FREQUENCY # from added to next
-            local_rr = np.interp(list(range(previous_annotation, second_next_annotation)), [previous_annotation, next_annotation, second_next_annotation], [old_rr_intervals[previous_annotation], first_interval, second_interval])
+            local_rr = np.interp(np.arange(previous_annotation, second_next_annotation), [previous_annotation, next_annotation, second_next_annotation], [old_rr_intervals[previous_annotation], first_interval, second_interval])
 
         elif change_type == 0: # add
             first_interval = (annotation_change-previous_annotation)/PALMS.get().FREQUENCY # from previous to added
             second_interval = (next_annotation-annotation_change)/PALMS.get().FREQUENCY # from added to next
             third_interval = (second_next_annotation-next_annotation)/PALMS.get().FREQUENCY
-            local_rr = np.interp(list(range(previous_annotation, second_next_annotation)), [previous_annotation, annotation_change, next_annotation, second_next_annotation], [old_rr_intervals[previous_annotation], first_interval, second_interval, third_interval])
+            local_rr = np.interp(np.arange(previous_annotation, second_next_annotation), [previous_annotation, annotation_change, next_annotation, second_next_annotation], [old_rr_intervals[previous_annotation], first_interval, second_interval, third_interval])
         
         elif change_type == 2: # add interpolation
-            annotation_index = np.where(annotations == annotation_change)[0][0]
-            min_index = max(0, annotation_index-5)
-            max_index = min(len(PALMS.get().ECG_DATA), annotation_index+5)
-            # to get mean rr: sum all and divide by how many and frequency
-            interpolated_value = np.mean(np.diff(annotations[min_index:max_index])) / (PALMS.get().FREQUENCY)
-            local_rr = np.interp(list(range(previous_annotation, next_annotation)), [previous_annotation, annotation_change, next_annotation], [old_rr_intervals[previous_annotation], interpolated_value, old_rr_intervals[next_annotation]])
+            new_value = rr_track.interpolated_interval(annotations, annotation_change, PALMS.get().FREQUENCY, len(PALMS.get().ECG_DATA))
+            local_rr = np.interp(np.arange(previous_annotation, next_annotation), [previous_annotation, annotation_change, next_annotation], [old_rr_intervals[previous_annotation], new_value, old_rr_intervals[next_annotation]])
 
         elif change_type == 3: # delete interpolation
-            real_value = (annotation_change-previous_annotation) / PALMS.get().FREQUENCY
-            local_rr = np.interp(list(range(previous_annotation, next_annotation)), [previous_annotation, annotation_change, next_annotation], [old_rr_intervals[previous_annotation], real_value, old_rr_intervals[next_annotation]])
-
-        if change_type==0: # add
-            old_rr_intervals[previous_annotation:second_next_annotation] = local_rr
-            #if (previous_annotation != annotations[0]):
-             #   intervals[previous_annotation] = old_rr_intervals[previous_annotation]
-            intervals[annotation_change] = old_rr_intervals[annotation_change]
-            intervals[next_annotation] = old_rr_intervals[next_annotation]
-
-        elif change_type==1: # delete
-            old_rr_intervals[previous_annotation:second_next_annotation] = local_rr
-            #if (previous_annotation != annotations[0]):
-             #   intervals[previous_annotation] = old_rr_intervals[previous_annotation]
-            non_null_indices = np.where(intervals[previous_annotation+10:second_next_annotation] != 0)[0] + previous_annotation + 10
-            intervals = np.delete(intervals, non_null_indices[0])  # Adjust second index due to the removal of the first
-            intervals = np.delete(intervals, non_null_indices[1]-1) 
-            intervals = np.insert(intervals, annotation_change, old_rr_intervals[annotation_change])
-            #intervals[next_annotation] = old_rr_intervals[next_annotation]
-
-        else:
-            old_rr_intervals[previous_annotation:next_annotation] = local_rr
-            #if (previous_annotation != annotations[0]):
-             #   intervals[previous_annotation] = old_rr_intervals[previous_annotation]
-            intervals[annotation_change] = old_rr_intervals[annotation_change]
-
-        from gui.tracking import Wave
-        rr_int_wave = Wave(old_rr_intervals, int(PALMS.get().FREQUENCY), offset=0, label='RR', unit='sec')
-        rr_int_wave.type = 'RR'
+            new_value = (annotation_change-previous_annotation) / PALMS.get().FREQUENCY
+            local_rr = np.interp(np.arange(previous_annotation, next_annotation), [previous_annotation, annotation_change, next_annotation], [old_rr_intervals[previous_annotation], new_value, old_rr_intervals[next_annotation]])
 
+        rr_int_wave.update_value_range(previous_annotation, local_rr)
+        rr_track.update_rr_store(intervals, annotations, annotation_change, change_type, PALMS.get().FREQUENCY, len(PALMS.get().ECG_DATA))
 
-        return rr_int_wave, intervals
+        return rr_int_wave, intervals, (previous_annotation, previous_annotation + len(local_rr))
     
     def updateFiducialsNoise(self):
 
         from gui import PALMS
         import copy
 
-        rr_intervals = copy.deepcopy(PALMS.get().fiducials.value)
+        rr_intervals = PALMS.get().fiducials.value
 
         annotations = [fiducial.annotation.idx for fiducial in AnnotationConfig.get().fiducials]
         annotations = np.array(annotations[0]) # points in which there is peak
 
-        mask = np.ones(len(rr_intervals))
-        mask[annotations] = 0
-
-        fiducials = copy.deepcopy(rr_intervals)
-        fiducials[mask==1] = 0
+        from logic.rr_store import RRStore
+        fiducials = RRStore.from_beats(annotations, rr_intervals[annotations], PALMS.get().FREQUENCY, len(rr_intervals))
 
         # noise
-        noise_start_points = NoisePartitions.all_startpoints()
-        noise_end_points = NoisePartitions.all_endpoints()
-
-        for start, end in zip(noise_start_points, noise_end_points):
-            fiducials[PALMS.get().from_time_to_closest_sample(start): PALMS.get().from_time_to_closest_sample(end)] = 0
-
+        fiducials.set_noise(self.get_noise_sample_ranges())
 
         # update fiducials
-        PALMS.get().rr_intervals = copy.deepcopy(fiducials)
+        PALMS.get().rr_intervals = fiducials
 
 
 class SingleFiducialConfig:
@@ -432,7 +350,8 @@ class SingleFiducialConfig:
 
     def set_annotation_from_time(self, ts, track):
         # TODO: make it properly via init of Annotation(...)
-        ts = ts[~np.isnan(ts)]
+        # kept sorted: add (bisect) and delete (find_closest_sorted) rely on it
+        ts = np.sort(ts[~np.isnan(ts)])
         self.annotation.x = ts
         idx, _, _ = find_closest(track.time, ts)
         self.annotation.y = track.value[idx]
@@ -440,7 +359,8 @@ class SingleFiducialConfig:
 
     def set_annotation_from_idx(self, idx, track):
         # TODO: make it properly via init of Annotation(...)
-        idx = idx[~np.isnan(idx)]
+        # kept sorted: add (bisect) and delete (find_closest_sorted) rely on it
+        idx = np.sort(idx[~np.isnan(idx)])
         self.annotation.idx = idx
         self.annotation.x = track.time[idx]
         self.annotation.y = track.value[idx]
@@ -0,0 +1,379 @@
+"""
+Noise and outlier (ectopic, missed and extra beats) detection on RR intervals. These functions only use the RR
+store, the beat annotations (samples) and plain arrays, so that they are shared by the left options panel and by the
+headless batch processing (logic/batch_engine.py).
+"""
+import numpy as np
+
+# beat correction level (settings "beat_correction_level", index of the threshold combobox): (threshold (s), window)
+THRESHOLD_LEVELS = {1: (0.45, 10),
+                    2: (0.35, 10),
+                    3: (0.25, 10),
+                    4: (0.15, 10),
+                    5: (0.05, 10)}
+
+# noise detection level (settings "noise_detection_level"): (noise size limit, noise length limit (beats)).
+# Level 5 takes them from the settings "between_beats" and "minimum_noise"
+NOISE_LEVELS = {1: (0.4, 15),
+                2: (0.35, 25),
+                3: (0.3, 35),
+                4: (0.25, 45)}
+
+MINIMUM_NOISE_BEATS = 3
+
+ROLLING_BLOCK = 2 ** 14  # windows per block of rolling_statistic
+
+
+def clean_segments(noise_start_points, noise_end_points, n_samples, to_sample):
+    """
+    Start and end samples of the parts of the signal without noise, from the noise partitions (in seconds).
+    to_sample converts a time to the closest sample
+    """
+    noise_start_points = np.asarray(noise_start_points)
+    noise_end_points = np.asarray(noise_end_points)
+
+    # if there are noise segments, iterate through them. Otherwise start in 0 and end in last sample
+    if (noise_start_points.size == 0):
+        noise_end_samples = np.append(noise_end_points, 0)
+        noise_start_samples = np.append(noise_start_points, n_samples-1)
+
+    else:
+        # check if first part of the signal is good (add initial point) or noise (delete initial point)
+        if (noise_start_points[0] != 0):
+            noise_end_points = np.insert(noise_end_points, 0, 0)
+        else:
+            noise_start_points = np.delete(noise_start_points, 0)
+
+        try:
+            noise_start_samples = np.vectorize(to_sample)(np.array(noise_start_points))
+        except:
+            noise_start_samples = np.array([], dtype="int32")
+        try:
+            noise_end_samples = np.vectorize(to_sample)(np.array(noise_end_points))
+        except:
+            noise_end_samples = np.array([], dtype="int32")
+
+        # same test for last part of the signal
+        if (noise_end_samples[-1] != n_samples):
+            noise_start_samples = np.append(noise_start_samples, n_samples)
+        else:
+            noise_end_samples = np.delete(noise_end_samples, -1)
+
+    return noise_end_samples, noise_start_samples
+
+
+#@jit(nopython=True, cache=True)
+def threshold_mask(rr_intervals_values, window_size, threshold):
+    """
+    True for the RR intervals (s) that differ more than threshold (s) from the mean of their window, the same
+    windows as the decision algorithm. rr_intervals_values can be any part of the RR intervals (one clean segment)
+    """
+    rr_intervals_values = np.asarray(rr_intervals_values)
+    if len(rr_intervals_values) < 2:
+        # no window has values
+        return np.zeros(len(rr_intervals_values), dtype=bool)
+    mean_rr = rolling_statistic(rr_intervals_values, window_size, np.mean, sort=False)
+    return (mean_rr < (rr_intervals_values - threshold)) | (mean_rr > (rr_intervals_values + threshold))
+
+
+def threshold_loop(noise_end_samples, noise_start_samples, rr_intervals, window_size, threshold, annotations, frequency):
+    """times (s) of the beats closing the threshold outliers of all the parts without noise"""
+    threshold_outliers = []
+    # loop from end to start
+    for new_end, new_start in zip(noise_end_samples, noise_start_samples):
+
+        start_beat = 0
+        if (new_end != 0):
+            start_beat = np.count_nonzero(annotations < new_end)
+
+        rr_intervals_values = rr_intervals.between(int(new_end), int(new_start))
+        threshold_outliers.append(np.flatnonzero(threshold_mask(rr_intervals_values, window_size, threshold)) + start_beat)
+
+    threshold_outliers = np.concatenate(threshold_outliers + [np.empty(0, dtype=np.int64)])
+    outlier_beats = np.minimum(threshold_outliers+1, len(annotations)-2) + 1
+    return np.asarray(annotations)[outlier_beats].astype(np.int64)/frequency
+
+
+def algorithm_beats(noise_end_samples, noise_start_samples, rr_intervals, annotations):
+    """extra, missed, ectopic and long/short beats (beat indexes) of all the parts without noise"""
+    start_beat = 0
+
+    long_short_beats = np.empty(0, dtype=np.int64)
+    miss_beats = np.empty(0, dtype=np.int64)
+    extra_beats = np.empty(0, dtype=np.int64)
+    ectopic_beats = np.empty(0, dtype=np.int64)
+
+    # loop from end to start
+    for new_end, new_start in zip(noise_end_samples, noise_start_samples):
+
+        if (new_end != 0):
+            start_beat = len(annotations[annotations < new_end])-1
+
+        rr_intervals_values = rr_intervals.between(int(new_end), int(new_start))
+
+        if rr_intervals_values.size == 0:
+            continue
+
+        current_extra_beats, current_miss_beats, current_ectopic_beats, current_long_short_beats = algorithm_loop(rr_intervals_values, start_beat)
+        extra_beats = np.concatenate((extra_beats, current_extra_beats))
+        miss_beats = np.concatenate((miss_beats, current_miss_beats))
+        ectopic_beats = np.concatenate((ectopic_beats, current_ectopic_beats))
+        long_short_beats = np.concatenate((long_short_beats, current_long_short_beats))
+
+    # dRR is the difference of r-intervals, so the difference of difference of beats
+    # dRR is supposed to be of size (len(peaks)-1), so len(rr_intervals)
+    # an outliers in dRR[i] means an outlier in peak[i+1]
+    return np.unique(extra_beats), np.unique(miss_beats), np.unique(ectopic_beats), np.unique(long_short_beats)
+
+
+def apply_algorithm(annotations, extra_beats, miss_beats, ectopic_beats, long_short_beats, update_rr, set_annotations, to_time):
+    """
+    Corrects the beats found by algorithm_beats: extra beats are deleted, missed beats added and ectopic and
+    long/short beats interpolated. update_rr(sample, change_type) updates the RR intervals around a beat
+    (0 add, 1 delete, 2 interpolate, see Annotation.update_RRinterval_track), set_annotations(annotations) stores the
+    new beats and to_time converts a sample to seconds. Returns the corrected beats (in seconds) by type and the
+    corrected annotations
+    """
+    algorithm_outliers = {}
+
+    for extra_beat in extra_beats: # in peak index
+        if extra_beat in algorithm_outliers.get("delete", np.array([],dtype="int32")):
+            continue
+        # delete peak in (extra_beat+1)
+        previous_beat = annotations[extra_beat+1]
+        annotations = np.delete(annotations, (extra_beat+1))
+        previous_values = algorithm_outliers.get("delete", np.array([],dtype="int32"))
+        beat_time = to_time(previous_beat)
+        previous_values = np.append(previous_values, beat_time)
+        algorithm_outliers["delete"] = previous_values
+        # delete value to miss and interpolated, as one less value on the rr_intervals (only values after outlier)
+        extra_beats[extra_beats > extra_beat+1] -= 1
+        miss_beats[miss_beats > extra_beat+1] -= 1
+        ectopic_beats[ectopic_beats > extra_beat+1] -= 1
+        long_short_beats[long_short_beats > extra_beat+1] -= 1
+        update_rr(previous_beat, 1)
+        set_annotations(annotations)
+
+    for miss_beat in miss_beats: # in peak index
+        if miss_beat in algorithm_outliers.get("delete", np.array([],dtype="int32")) or miss_beat in algorithm_outliers.get("add", np.array([],dtype="int32")):
+            continue
+        # add peak between (extra_beat), which is previous, and (extra_beat+1), which is current
+        previous_annotation = annotations[miss_beat]
+        current_annotation = annotations[miss_beat+1]
+        new_annotation = int((previous_annotation+current_annotation)/2)
+        annotations = np.insert(annotations, (miss_beat+1), new_annotation)
+        previous_values = algorithm_outliers.get("add", np.array([],dtype="int32"))
+        beat_time = to_time(new_annotation)
+        previous_values = np.append(previous_values, beat_time)
+        algorithm_outliers["add"] = previous_values
+        # add value to miss interpolated, as one more value on the rr_intervals (only values after outlier)
+        # no need to change miss, as outliers are stored as sample number
+        miss_beats[miss_beats > miss_beat] += 1
+        ectopic_beats[ectopic_beats > miss_beat] += 1
+        long_short_beats[long_short_beats > miss_beat] += 1
+        update_rr(new_annotation, 0)
+        set_annotations(annotations)
+
+    for interpolated_beat in ectopic_beats:
+        if interpolated_beat in algorithm_outliers.get("delete", np.array([],dtype="int32")) or interpolated_beat in algorithm_outliers.get("add", np.array([],dtype="int32")) or interpolated_beat in algorithm_outliers.get("interpolate", np.array([],dtype="int32")):
+            continue
+        beat_sample = annotations[interpolated_beat+1]
+        beat_time = to_time(beat_sample)
+        previous_values = algorithm_outliers.get("interpolate", np.array([],dtype="int32"))
+        previous_values = np.append(previous_values, beat_time)
+        algorithm_outliers["interpolate"] = previous_values
+        update_rr(beat_sample, 2)
+        set_annotations(annotations)
+
+    for long_short_beat in long_short_beats:
+        if long_short_beat in algorithm_outliers.get("delete", []) or long_short_beat in algorithm_outliers.get("add", []) or long_short_beat in algorithm_outliers.get("interpolate", []):
+            continue
+        beat_sample = annotations[long_short_beat+1]
+        beat_time = to_time(beat_sample)
+        previous_values = algorithm_outliers.get("interpolate", [])
+        previous_values = np.append(previous_values, beat_time)
+        algorithm_outliers["interpolate"] = previous_values
+        update_rr(beat_sample, 2)
+        set_annotations(annotations)
+
+    return algorithm_outliers, annotations
+
+
+def rolling_statistic(values, half_width, statistic, sort=True):
+    """
+    statistic(windows, axis=1) of the windows values[max(i - half_width, 0):min(i + half_width, n - 1)] of every i
+    (the last value never enters a window). The full windows are strided views, evaluated by blocks of ROLLING_BLOCK
+    rows so memory stays bounded, and only the shorter windows at the edges are evaluated one by one. The statistic is
+    the numpy function itself (np.median, np.percentile, np.mean), so the values are the same as window by window.
+    With sort, the rows are sorted first: sorting short rows is much faster than the partition of np.percentile,
+    which is then cheap. Order dependent statistics (np.mean) need sort=False
+    """
+    values = np.asarray(values)
+    n = len(values)
+    result = np.empty(n, dtype=np.float64)
+    starts = np.maximum(np.arange(n) - half_width, 0)
+    ends = np.minimum(np.arange(n) + half_width, n - 1)
+    full = np.flatnonzero(ends - starts == 2 * half_width)
+    for i in np.flatnonzero(ends - starts != 2 * half_width):
+        result[i] = statistic(values[starts[i]:ends[i]][np.newaxis], axis=1)[0]
+    if len(full):
+        windows = np.lib.stride_tricks.sliding_window_view(values, 2 * half_width)
+        for block_start in range(full[0], full[-1] + 1, ROLLING_BLOCK):
+            block_end = min(block_start + ROLLING_BLOCK, full[-1] + 1)
+            block = windows[starts[block_start]:starts[block_end - 1] + 1]
+            if sort:
+                block = np.sort(block, axis=1)
+            result[block_start:block_end] = statistic(block, axis=1)
+    return result
+
+
+def quartile_deviation(windows, axis):
+    """difference of the 75th and 25th percentiles"""
+    return np.percentile(windows, 75, axis=axis) - np.percentile(windows, 25, axis=axis)
+
+
+def algorithm_loop(rr_intervals_values, start_beat):
+    """
+    extra, missed, ectopic and long/short beats (indices + start_beat) of a clean segment with the decision
+    algorithm of Lipponen and Tarvainen, on rolling quartile deviations of dRR and mRR and rolling medians of RR
+    """
+    rr_intervals_values = np.asarray(rr_intervals_values)
+    if len(rr_intervals_values) < 2:
+        # no window has values
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(4))
+
+    dRRs = np.diff(rr_intervals_values)
+    dRRs = np.concatenate((np.array([0]), dRRs))
+
+    # Window size
+    window_size = 45
+    alpha = 5.2
+    threshold1 = alpha*rolling_statistic(np.abs(dRRs), window_size, quartile_deviation)
+    dRR = dRRs/threshold1
+
+    m_window_size = 5
+    medRR = rolling_statistic(rr_intervals_values, m_window_size, np.median)
+    mRRs = rr_intervals_values - medRR
+    mRRs = np.where(mRRs < 0, 2 * mRRs, mRRs)
+
+    threshold2 = alpha*rolling_statistic(np.abs(mRRs), window_size, quartile_deviation)
+    mRR = mRRs/threshold2
+
+    # the previous or the next but one dRR, the larger one for positive dRR and the smaller one otherwise
+    s11 = dRR
+    previous_dRR = dRR[np.maximum(np.arange(len(dRR)) - 1, 0)]
+    next_dRR = dRR[np.minimum(np.arange(len(dRR)) + 2, len(dRR) - 1)]
+    s12 = np.where(dRR > 0,
+                   np.where(next_dRR > previous_dRR, next_dRR, previous_dRR),
+                   np.where(next_dRR < previous_dRR, next_dRR, previous_dRR))
+
+    # decision algorithm.
+    c1 = 0.13
+    c2 = 0.17
+
+    eq1 = (s11 > 1) & (s12 < (-c1*s11 + c2))
+    eq2 = (s11 < -1) & (s12 > (-c1*s11 - c2))
+    ectopic = (np.abs(dRR) > 1) & (eq1 | eq2)
+
+    # the other beats that have a next beat
+    rr = rr_intervals_values
+    sign = np.sign(dRR[:-1])
+    eq3 = (sign*dRR[1:]) < -1
+    eq4 = np.abs(mRR[:-1]) > 3
+    eq5 = np.append((sign[:-1]*dRR[2:]) < -1, False)
+    candidate = ~ectopic[:-1] & ((np.abs(dRR[:-1]) > 1) | eq4) & (eq3 | eq4 | eq5)
+    eq6 = (np.abs(rr[:-1]/2 - medRR[:-1])) < threshold2[:-1]
+    eq7 = (np.abs(rr[:-1] + rr[1:] - medRR[:-1])) < threshold2[:-1]
+
+    miss_beats = np.flatnonzero(candidate & eq6) + start_beat
+    extra_beats = np.flatnonzero(candidate & ~eq6 & eq7) + start_beat  # this and next
+    long_short_beats = np.flatnonzero(candidate & ~eq6 & ~eq7) + start_beat  # this and next (eq5) or this
+    ectopic_beats = np.flatnonzero(ectopic) + start_beat
+
+    return extra_beats, miss_beats, ectopic_beats, long_short_beats
+
+
+#@jit(nopython=True, cache=True)
+def get_noise_loop(current_outliers, current_samples, annotations, noise_length_limit, last_peak_sample, minimum_noise_beats, rr_intervals, noise_size_limit, new_start_sample):
+
+    new_start_noise = np.empty(0, dtype=np.float64)
+    new_end_noise = np.empty(0, dtype=np.float64)
+
+    current_cluster = np.empty(0, dtype=np.float64)
+    current_cluster_sample = np.empty(0, dtype=np.int32)
+    previous_sample = 0
+
+    for i in range(len(current_outliers)):
+        current_outlier = current_outliers[i]
+        current_sample = current_samples[i]
+
+        midle_annotations = annotations[(annotations > previous_sample) & (annotations <= current_sample)]
+
+        if len(midle_annotations) < noise_length_limit:
+            current_cluster = np.append(current_cluster, current_outlier)
+            current_cluster_sample = np.append(current_cluster_sample, current_sample)
+
+            if current_sample >= last_peak_sample:
+                if len(current_cluster) > minimum_noise_beats:
+                    outliers_times = rr_intervals.at(current_cluster_sample)
+                    outliers_length = np.sum(outliers_times)
+                    total_times = rr_intervals.between(current_cluster_sample[0], current_cluster_sample[-1])
+                    total_length = np.sum(total_times)
+                    outliers_proportion = outliers_length / total_length
+
+                    if outliers_proportion > noise_size_limit:
+                        new_start_noise = np.append(new_start_noise, current_cluster[0])
+                        new_end_noise = np.append(new_end_noise, new_start_sample)
+
+                current_cluster = np.empty(0, dtype=np.float64)
+                current_cluster_sample = np.empty(0, dtype=np.int32)
+                current_cluster = np.append(current_cluster, current_outlier)
+                current_cluster_sample = np.append(current_cluster_sample, current_sample)
+
+        else:
+            if len(current_cluster) > minimum_noise_beats:
+                outliers_times = rr_intervals.at(current_cluster_sample)
+                outliers_length = np.sum(outliers_times)
+                total_times = rr_intervals.between(current_cluster_sample[0], current_cluster_sample[-1])
+                total_length = np.sum(total_times)
+                outliers_proportion = outliers_length / total_length
+
+                if outliers_proportion > noise_size_limit:
+                    new_start_noise = np.append(new_start_noise, current_cluster[0])
+                    new_end_noise = np.append(new_end_noise, current_cluster[-1])
+
+            current_cluster = np.empty(0, dtype=np.float64)
+            current_cluster_sample = np.empty(0, dtype=np.int32)
+
+        previous_sample = current_sample
+
+    return new_start_noise, new_end_noise
+
+
+def noise_clusters(all_outliers, all_samples, annotations, rr_intervals, noise_end_samples, noise_start_samples, noise_size_limit, noise_length_limit, to_time):
+    """
+    New noise intervals (start, end in seconds) of each part without noise, where the outliers (in seconds, and
+    all_samples their samples) are too close to each other
+    """
+    last_peak_sample = round(annotations[-1])
+    noise_intervals = []
+
+    # loop from end to start
+    for new_end_sample, new_start_sample in zip(noise_end_samples, noise_start_samples):
+
+        # i need to get the times of the outliers and get the ones in this interval
+        current_outliers = all_outliers[(all_outliers < new_start_sample) & (all_outliers > new_end_sample)]
+
+        # same for outlier samples (i can use same indexes as before)
+        current_samples = all_samples[(all_outliers < new_start_sample) & (all_outliers > new_end_sample)]
+
+        current_outliers = np.array(current_outliers)
+        current_outliers = np.append(current_outliers, to_time(last_peak_sample))
+        current_samples = np.array(current_samples)
+        current_samples = np.append(current_samples, last_peak_sample)
+        current_samples = current_samples.astype(int)
+
+        new_start_noise, new_end_noise = get_noise_loop(current_outliers, current_samples, annotations, noise_length_limit, last_peak_sample, MINIMUM_NOISE_BEATS, rr_intervals, noise_size_limit, new_start_sample)
+        noise_intervals.append((new_start_noise, new_end_noise))
+
+    return noise_intervals
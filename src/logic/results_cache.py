@@ -0,0 +1,58 @@
+"""
+Results of the analyses shown in the results panel, kept by partition. A key holds the analysis, the partition
+bounds (samples), the fingerprint of the beats inside them (RRStore.fingerprint: positions, intervals, noise and
+correction flags) and a hash of the analysis settings, so an entry is found again only while none of them changed:
+editing the peaks or the outlier flags inside a partition, or moving its bounds, computes its results again, while
+edits elsewhere, switching tabs and exporting unchanged partitions reuse them.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = 64  # results kept, the least recently used are dropped
+
+
+def settings_hash(settings):
+    """hash of the analysis settings (a dict of json values)"""
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def values_hash(values):
+    """hash of an array of RR intervals"""
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()
+
+
+class ResultsCache:
+    """least recently used results by key"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+
+    @staticmethod
+    def partition_key(analysis, rr_intervals, start, end, settings, *extra):
+        """key of an analysis of the beats of the RRStore in [start, end) (samples), extra being its other inputs"""
+        return (analysis, start, end, rr_intervals.fingerprint(start, end), settings_hash(settings)) + extra
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def add(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def get(self, key, compute):
+        """result of the key, from compute() if it is not kept"""
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        result = compute()
+        self.add(key, result)
+        return result
+
+    def clear(self):
+        self._results.clear()
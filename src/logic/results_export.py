@@ -0,0 +1,307 @@
+"""
+Layout of the exported HRV results (csv). The left options panel and the headless batch processing
+(logic/batch_engine.py) fill the same table, so both exports are identical.
+"""
+import csv
+import datetime as dtime
+from datetime import timedelta
+
+import numpy as np
+
+# samples with fewer RR intervals keep their title but have no results
+MIN_BEATS = 5
+
+DETRENDING_NAMES = {0: "None",
+                    2: "1st order Polynomial",
+                    3: "2nd order Polynomial",
+                    4: "3rd order Polynomial"}
+
+
+def software_rows():
+    current_time = dtime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        [f"HRV analysis results of {current_time}"],
+        ["Program name"],
+        ["Released on December 2023"],
+        [""]
+    ]
+
+
+def file_rows(file_name, first_datetime, last_datetime, frequency):
+    """first_datetime and last_datetime in the "%d--%H:%M:%S" format of the application"""
+    measurement_date_start = first_datetime.replace('--', ' ').strip()
+    measurement_date_end = last_datetime.replace('--', ' ').strip()
+    time_duration = dtime.datetime.strptime(measurement_date_end, "%d %H:%M:%S") - dtime.datetime.strptime(measurement_date_start, "%d %H:%M:%S")
+    return [
+        [f"File name: {file_name}"],
+        [f"Measurement date (start): {measurement_date_start}"],
+        [f"Measurement date (end): {measurement_date_end}"],
+        [f"Time duration (d h:min:s): {time_duration}"],
+        [f"Measurement rate (hz): {frequency}"],
+        [""]
+    ]
+
+
+def parameter_rows(settings, samples_number, bands=None):
+    """bands: texts of (vlf_min, vlf_max, lf_min, lf_max, hf_min, hf_max), by default the ones of the settings"""
+    if bands is None:
+        bands = [str(settings[key]) for key in ("vlf_min", "vlf_max", "lf_min", "lf_max", "hf_min", "hf_max")]
+    vlf_min, vlf_max, lf_min, lf_max, hf_min, hf_max = bands
+
+    detrending_method = DETRENDING_NAMES.get(settings['detrending_method'])
+    if (settings['detrending_method'] == 1):
+        detrending_method = "Smoothn priors (lambda="+str(settings["smoothing_parameter"])+")"
+
+    hr_as_average_of = str(settings["average_hr"])+" beats"
+    nnxx_threshold = str(settings["nnxx_threshold"])+" ms"
+    interpolation_rate = "4 hz"
+    spectrum_points = str(settings["spectrum_points"])+" points/Hz"
+    if (settings["lomb_scargle"] == False):
+        ma_order = settings["ma_order"]
+    else:
+        ma_order = "-"
+    ar_model_order = settings["ar_order"]
+    apply_detrending = settings["nonlinear_detrending"]
+    entropy_dimension = settings["embedding_dimension"]
+    entropy_tolerance = str(settings["tolerance"])+" x SD"
+    dfa_short_term = str(settings["n1_min"])+"-"+str(settings["n1_max"])+" beats"
+    dfa_long_term = str(settings["n2_min"])+"-"+str(settings["n2_max"])+" beats"
+    return [
+        ["Parameters"],
+        [f"Number of samples: {samples_number}"],
+        [f"Detrending method: {detrending_method}"],
+        [f"Min/Max HR as average of: {hr_as_average_of}"],
+        [f"Threshold for NNxx/pNNxx: {nnxx_threshold}"],
+        ["Frequency bands"],
+        [f"VLF: {vlf_min} - {vlf_max} Hz"],
+        [f"LF: {lf_min} - {lf_max} Hz"],
+        [f"HF: {hf_min} - {hf_max} Hz"],
+        [f"Interpolation rate: {interpolation_rate}"],
+        [f"Spectrum points: {spectrum_points}"],
+        ["FFT spectrum options"],
+        ["AR spectrum options"],
+        [f"AR model order: {ar_model_order}"],
+        [f"FFT moving average order: {ma_order}"],
+        [f"Apply detrending for nonlinear analysis: {apply_detrending}"],
+        [f"Entropy, embedding dimension: {entropy_dimension}"],
+        [f"Entropy, tolerance: {entropy_tolerance}"],
+        [f"DFA, short-term fluctuations: {dfa_short_term}"],
+        [f"DFA, long-term fluctuations: {dfa_long_term}"],
+        [""]
+    ]
+
+
+# row names of each group of results, in the order of logic.hrv_analysis
+TIME_ROWS = ["Mean RR (ms)", "SDNN (ms)", "Mean HR (beats/min)", "SD HR (beats/min)", "Mim HR (beats/min)",
+             "Max HR (beats/min)", "RMSSD (ms)", "NNxx (beats)", "pNNxx (%)", "RR tri index", "TINN (ms)",
+             "Stress index", "SDNN index (ms)"]
+FREQUENCY_ROWS = ["VLF (Hz)", "LF (Hz)", "HF (Hz)", "VLF (ms^2)", "LF (ms^2)", "HF (ms^2)", "VLF (log)", "LF (log)",
+                  "HF (log)", "VLF (%)", "LF (%)", "HF (%)", "LF (n.u.)", "HF (n.u.)", "Total power (ms^2)",
+                  "LF/HF ratio"]
+NONLINEAR_ROWS = ["SD1 (ms)", "SD2 (ms)", "SD2/SD1 ratio", "Approximate entropy (ApEn)", "Sample entropy (SampEn)",
+                  "alpha 1", "alpha 2"]
+
+
+def sample_dates(first_datetime, start, end):
+    """limits (s from the start of the file) of a sample in the "%d--%H:%M:%S" format"""
+    datetime_obj = dtime.datetime.strptime(first_datetime, "%d--%H:%M:%S")
+    return ((datetime_obj + timedelta(seconds=start)).strftime("%d--%H:%M:%S"),
+            (datetime_obj + timedelta(seconds=end)).strftime("%d--%H:%M:%S"))
+
+
+# combined results of many files (logic/batch_export.py): one row per sample
+SUMMARY_HEADER = (["File name", "Sample", "Sample start (d--hh:mm:ss)", "Sample end (d--hh:mm:ss)", "Beats total",
+                   "Beats corrected", "Beats corrected (%)", "Effective data length (s)",
+                   "Effective data length (ratio)"]
+                  + TIME_ROWS
+                  + [name + " FFT" for name in FREQUENCY_ROWS]
+                  + [name + " AR" for name in FREQUENCY_ROWS]
+                  + NONLINEAR_ROWS)
+
+
+def summary_row(file_name, title, first_datetime, start, end, rr_local, corrected_number, time_results,
+                frequency_results, nonlinear_results):
+    """row of SUMMARY_HEADER with the same values as the columns of the sample in ResultsTable"""
+    outliers_times = corrected_number*0.7
+    non_outliers_times = np.sum(rr_local)-outliers_times
+    return ([file_name, title, *sample_dates(first_datetime, start, end), len(rr_local), corrected_number,
+             (100 * corrected_number) / (len(rr_local) + corrected_number), non_outliers_times,
+             non_outliers_times/(outliers_times+non_outliers_times)]
+            + list(time_results) + list(frequency_results) + list(nonlinear_results))
+
+
+class ResultsTable:
+    """
+    Results of the samples of one file, one column (two for the results: FFT and AR spectrum) per sample.
+    Every sample gets its title with add_title, and then its results with add_sample if it has enough beats
+    """
+
+    def __init__(self, first_datetime, original_datetime=None):
+        self.first_datetime = first_datetime
+        self.original_datetime = original_datetime
+
+        self.sample_titles = [""]
+        self.sample_titles_results = [""]
+        self.sample_titles_spectrum = []
+        self.sample_limits = ["Sample limits (d--hh:mm:ss)"]
+        self.beats_total = ["Beats total"]
+        self.beats_corrected = ["Beats corrected"]
+        self.beats_corrected_ratio = ["Beats corrected (%)"]
+        self.effective_data_length = ["Effective data length (s)"]
+        self.effective_data_length_ratio = ["Effective data length (ratio)"]
+        self.pns_index = ["PNS index"]
+        self.sns_index = ["SNS index"]
+        self.frequency_domain_title = ["Frequency-Domain Results"]
+        self.results = {name: [name] for name in TIME_ROWS + FREQUENCY_ROWS + NONLINEAR_ROWS}
+        self.rr_row1 = []
+        self.rr_row2 = []
+        self.rr_row_units = []
+        self.peaks_columns = []
+        self.rr_intervals_columns = []
+
+        if original_datetime != None:
+            self.previous_rr_sum = original_datetime
+        else:
+            self.previous_rr_sum = 0
+
+    def add_title(self, title):
+        self.sample_titles.append(title)
+        self.sample_titles_results.append(title)
+        self.sample_titles_results.append("")
+        self.sample_titles_spectrum.append(title)
+        self.sample_titles_spectrum.append("")
+
+    def add_sample(self, start, end, rr_local, corrected_number, time_results, frequency_results, nonlinear_results):
+        """
+        start and end of the sample in seconds, rr_local its RR intervals (s) and corrected_number the outliers
+        corrected in it. The results are the tuples of logic.hrv_analysis
+        """
+        # append sample limits
+        current_start_date, current_end_date = sample_dates(self.first_datetime, start, end)
+        self.sample_limits.append(f"{current_start_date} - {current_end_date}")
+
+        self.beats_total.append(len(rr_local))
+        self.beats_corrected.append(corrected_number)
+        self.beats_corrected_ratio.append((100 * corrected_number) / (len(rr_local) + corrected_number))
+
+        # outliers time
+        outliers_times = corrected_number*0.7
+        non_outliers_times = np.sum(rr_local)-outliers_times
+        self.effective_data_length.append(non_outliers_times)
+        self.effective_data_length_ratio.append(non_outliers_times/(outliers_times+non_outliers_times))
+
+        # general results
+        self.pns_index += ["0", ""]
+        self.sns_index += ["0", ""]
+        for name, value in zip(TIME_ROWS, time_results):
+            self.results[name] += [value, ""]
+
+        # FFT and AR spectrum side by side
+        self.frequency_domain_title += ["FFT spectrum", "AR spectrum"]
+        half = len(FREQUENCY_ROWS)
+        for k, name in enumerate(FREQUENCY_ROWS):
+            self.results[name] += [frequency_results[k], frequency_results[half + k]]
+
+        for name, value in zip(NONLINEAR_ROWS, nonlinear_results):
+            self.results[name] += [value, ""]
+
+        # RR values
+        self.rr_row1 += ["RR data", ""]
+        self.rr_row2 += ["Time", "RR interval"]
+        self.rr_row_units += ["(s)", "(s)"]
+
+        if self.original_datetime != None:
+            rr_sum = np.cumsum(rr_local)
+            rr_sum = np.insert(rr_sum, 0, 0)
+
+            from dateutil import parser
+            from dateutil.relativedelta import relativedelta
+            dt = parser.parse(self.original_datetime)
+            peaks_values_local = [dt + relativedelta(seconds=seconds) for seconds in rr_sum[:-1]]
+        else:
+            peaks_values_local = self.previous_rr_sum + np.cumsum(rr_local)
+
+        self.rr_intervals_columns.append(rr_local)
+        self.peaks_columns.append(peaks_values_local)
+        self.previous_rr_sum = peaks_values_local[-1]
+
+    def rows(self):
+        results = self.results
+        return [
+            ["RR Interval Samples Selected for Analysis"],
+            self.sample_titles,
+            self.sample_limits,
+            ["Sample Analysis Type: Single samples"],
+            ["Beat correction: Automatic correction"],
+            self.beats_total,
+            self.beats_corrected,
+            self.beats_corrected_ratio,
+            self.effective_data_length,
+            self.effective_data_length_ratio,
+            [""],
+            [""],
+            ["RESULTS FOR SINGLE SAMPLES"],
+            self.sample_titles_results,
+            ["Results overview"],
+            self.pns_index,
+            self.sns_index,
+            results["Stress index"],
+            [""],
+            ["Time domain results"],
+            ["Statistical parameters"],
+        ] + [results[name] for name in TIME_ROWS[:9] + ["SDNN index (ms)"]] + [
+            ["Geometric parameters"],
+            results["RR tri index"],
+            results["TINN (ms)"],
+            [""],
+            self.frequency_domain_title,
+            ["Peak frequencies"],
+        ] + [results[name] for name in FREQUENCY_ROWS[0:3]] + [
+            ["Absolute powers"],
+        ] + [results[name] for name in FREQUENCY_ROWS[3:9]] + [
+            ["Relative powers"],
+        ] + [results[name] for name in FREQUENCY_ROWS[9:12]] + [
+            ["Normalized powers"],
+        ] + [results[name] for name in FREQUENCY_ROWS[12:16]] + [
+            [""],
+            [""],
+            ["Nonlinear results"],
+            ["Poincare plot"],
+        ] + [results[name] for name in NONLINEAR_ROWS[0:5]] + [
+            ["Detrended fluctuation analysis (DFA)"],
+            results["alpha 1"],
+            results["alpha 2"],
+            [""],
+            [""],
+            ["RR INTERVAL DATA and SPECTRUM ESTIMATES"],
+            self.sample_titles_spectrum,
+            self.rr_row1,
+            self.rr_row2,
+            self.rr_row_units,
+        ]
+
+    def rr_rows(self):
+        """rows with the time of each beat and its RR interval, two columns per sample"""
+        if len(self.peaks_columns) == 0:
+            return
+        max_length = max(len(sample) for sample in self.peaks_columns + self.rr_intervals_columns)
+        for i in range(max_length):
+            current_row_values = []
+            for sample_index in range(len(self.peaks_columns)):
+                if i < len(self.peaks_columns[sample_index]):
+                    current_row_values.append(self.peaks_columns[sample_index][i])
+                else:
+                    current_row_values.append("")
+
+                if i < len(self.rr_intervals_columns[sample_index]):
+                    current_row_values.append(self.rr_intervals_columns[sample_index][i])
+                else:
+                    current_row_values.append("")
+            yield current_row_values
+
+    def write(self, output_file, header_rows):
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerows(header_rows)
+            writer.writerows(self.rows())
+            writer.writerows(self.rr_rows())
@@ -0,0 +1,151 @@
+import hashlib
+
+import numpy as np
+
+
+class RRStore:
+    """
+    Beat-indexed store of RR intervals. Each entry is the interval (in seconds) that ends at the beat placed at
+    `samples[i]`, so memory is proportional to the number of beats instead of the number of signal samples.
+    Beats inside noise regions are kept but flagged, so they can be restored when the noise is removed.
+    Slicing by sample range gives the same values as the old dense per-sample arrays filtered with `rr[rr != 0]`.
+    """
+
+    def __init__(self, samples=None, intervals=None, fs: float = 1, n_samples: int = 0):
+        self.samples = np.array([] if samples is None else samples, dtype=np.int64)
+        self.intervals = np.array([] if intervals is None else intervals, dtype=float)
+        self.noise = np.zeros(len(self.samples), dtype=bool)
+        self.corrected = np.zeros(len(self.samples), dtype=bool)
+        self.noise_ranges = []
+        self.fs = fs
+        self.n_samples = int(n_samples)
+
+    @classmethod
+    def from_beats(cls, samples, intervals, fs: float, n_samples: int):
+        """ Store from (possibly unsorted) beat samples; when a sample is repeated the last interval is kept """
+        samples = np.asarray(samples, dtype=np.int64)
+        intervals = np.asarray(intervals, dtype=float)
+        order = np.argsort(samples, kind='stable')
+        samples, intervals = samples[order], intervals[order]
+        last = np.append(samples[1:] != samples[:-1], True) if len(samples) else np.array([], dtype=bool)
+        return cls(samples[last], intervals[last], fs, n_samples)
+
+    @classmethod
+    def from_dense(cls, values, fs: float):
+        """ Store from an old per-sample array (RR value at beat samples, 0 elsewhere), as saved in session files """
+        values = np.asarray(values, dtype=float)
+        samples = np.flatnonzero(values)
+        return cls(samples, values[samples], fs, len(values))
+
+    def to_dense(self) -> np.ndarray:
+        """ Per-sample array with the RR value at each valid beat and 0 elsewhere, as saved in session files """
+        dense = np.zeros(max(self.n_samples, self.samples[-1] + 1 if len(self.samples) else 0))
+        valid = self._valid()
+        dense[self.samples[valid]] = self.intervals[valid]
+        return dense
+
+    def copy(self):
+        new = RRStore(self.samples.copy(), self.intervals.copy(), self.fs, self.n_samples)
+        new.noise = self.noise.copy()
+        new.corrected = self.corrected.copy()
+        new.noise_ranges = list(self.noise_ranges)
+        return new
+
+    def __len__(self):
+        return len(self.samples)
+
+    def _valid(self) -> np.ndarray:
+        return ~self.noise & (self.intervals != 0)
+
+    def valid_samples(self) -> np.ndarray:
+        """ Sample of the beat closing each valid interval """
+        return self.samples[self._valid()]
+
+    def times(self) -> np.ndarray:
+        """ Time (s) of the beat closing each valid interval """
+        return self.valid_samples() / self.fs
+
+    def values(self) -> np.ndarray:
+        """ All valid RR intervals (s), noise excluded """
+        return self.intervals[self._valid()]
+
+    def index_range(self, start_sample: int, end_sample: int):
+        """ (first, last) positions in values() of the intervals whose beat is in [start_sample, end_sample) """
+        valid_samples = self.valid_samples()
+        return (int(np.searchsorted(valid_samples, start_sample, side='left')),
+                int(np.searchsorted(valid_samples, end_sample, side='left')))
+
+    def between(self, start_sample: int, end_sample: int) -> np.ndarray:
+        """ Valid RR intervals (s) whose beat is in [start_sample, end_sample) """
+        first, last = np.searchsorted(self.samples, [start_sample, end_sample], side='left')
+        valid = self._valid()[first:last]
+        return self.intervals[first:last][valid]
+
+    def samples_between(self, start_sample: int, end_sample: int) -> np.ndarray:
+        """ Beat samples of the valid RR intervals in [start_sample, end_sample) """
+        first, last = np.searchsorted(self.samples, [start_sample, end_sample], side='left')
+        valid = self._valid()[first:last]
+        return self.samples[first:last][valid]
+
+    def fingerprint(self, start_sample: int = 0, end_sample: int = None) -> str:
+        """ Hash of the beats in [start_sample, end_sample) (to the end by default): positions, intervals and flags """
+        end_sample = np.iinfo(np.int64).max if end_sample is None else end_sample
+        first, last = np.searchsorted(self.samples, [start_sample, end_sample], side='left')
+        digest = hashlib.sha1()
+        for values in (self.samples, self.intervals, self.noise, self.corrected):
+            digest.update(np.ascontiguousarray(values[first:last]).tobytes())
+        return digest.hexdigest()
+
+    def at(self, samples) -> np.ndarray:
+        """ RR value at each given sample, 0 when there is no valid beat there """
+        samples = np.atleast_1d(np.asarray(samples, dtype=np.int64))
+        positions = np.searchsorted(self.samples, samples)
+        positions_clipped = np.minimum(positions, max(len(self.samples) - 1, 0))
+        result = np.zeros(len(samples))
+        if len(self.samples):
+            found = (self.samples[positions_clipped] == samples) & self._valid()[positions_clipped]
+            result[found] = self.intervals[positions_clipped[found]]
+        return result
+
+    def sum_between(self, start_sample: int, end_sample: int) -> float:
+        return float(np.sum(self.between(start_sample, end_sample)))
+
+    def set_interval(self, sample: int, value: float, corrected: bool = None):
+        """ Set the interval ending at sample, inserting the beat if it is not in the store """
+        position = int(np.searchsorted(self.samples, sample))
+        if position < len(self.samples) and self.samples[position] == sample:
+            self.intervals[position] = value
+        else:
+            self.samples = np.insert(self.samples, position, sample)
+            self.intervals = np.insert(self.intervals, position, value)
+            self.noise = np.insert(self.noise, position, self._in_noise(sample))
+            self.corrected = np.insert(self.corrected, position, False)
+        if corrected is not None:
+            self.corrected[position] = corrected
+        self.n_samples = max(self.n_samples, int(sample) + 1)
+
+    def update(self, sample: int, value: float):
+        """ Change the interval ending at sample only if that beat is already in the store """
+        position = int(np.searchsorted(self.samples, sample))
+        if position < len(self.samples) and self.samples[position] == sample:
+            self.intervals[position] = value
+
+    def remove_between(self, start_sample: int, end_sample: int):
+        """ Remove the beats in [start_sample, end_sample) """
+        first, last = np.searchsorted(self.samples, [start_sample, end_sample], side='left')
+        keep = np.r_[0:first, last:len(self.samples)]
+        self.samples = self.samples[keep]
+        self.intervals = self.intervals[keep]
+        self.noise = self.noise[keep]
+        self.corrected = self.corrected[keep]
+
+    def set_noise(self, noise_ranges):
+        """ Flag as noise the beats inside the given [start_sample, end_sample) ranges (previous flags are cleared) """
+        self.noise = np.zeros(len(self.samples), dtype=bool)
+        self.noise_ranges = [(int(start), int(end)) for start, end in noise_ranges]
+        for start, end in self.noise_ranges:
+            first, last = np.searchsorted(self.samples, [start, end], side='left')
+            self.noise[first:last] = True
+
+    def _in_noise(self, sample: int) -> bool:
+        return any(start <= sample < end for start, end in self.noise_ranges)
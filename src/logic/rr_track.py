@@ -0,0 +1,119 @@
+"""
+Beats and RR intervals of a recording without Qt or the PALMS state, shared by the application (the ECG database
+and Annotation) and the headless batch processing (logic/batch_engine.py): the beat detection of one segment, the RR
+signal with the interval of each beat interpolated at every sample of the recorded segments with the RR store of the
+beats (logic/rr_store.py), the signal of an RR recording, and the update of the store when one beat changes.
+"""
+import numpy as np
+
+from logic.rr_store import RRStore
+from utils.utils_general import butter_highpass_filter, butter_lowpass_filter
+
+# change types of a beat, as in update_rr_store and logic.outliers.apply_algorithm
+ADD, DELETE, INTERPOLATE, DELETE_INTERPOLATION = 0, 1, 2, 3
+
+
+def detect_ecg_segment(ecg_segment, fs):
+    """R-peaks (relative to the segment) and noise intervals of one continuous segment. Runs in the detection workers"""
+    from utils.QRSDetectorOffline import QRSDetectorOffline
+    ecg_data_filt = butter_highpass_filter(ecg_segment, 5, fs, order=5)  # NB: created and filtered data
+    ecg_data_filt = butter_lowpass_filter(ecg_data_filt, 18, fs, order=5)
+    qrs_detector = QRSDetectorOffline(None, ecg_data_filt, fs, verbose=False, log_data=False, plot_data=False, show_plot=False, apply_noise=False)
+    return qrs_detector.qrs_peaks_indices, np.array(qrs_detector.noise_intervals, dtype=int).reshape(-1, 2)
+
+
+def rr_length(last_sample, frequency):
+    """samples of the RR signal up to last_sample, as len(np.arange(0, last_sample / frequency, 1 / frequency))"""
+    return max(int(np.ceil((last_sample / frequency) / (1 / frequency))), 0)
+
+
+def rr_signal(rr, start_indexes, end_indexes, frequency):
+    """
+    RR intervals (s) of an RR recording interpolated at every sample (frequency) of the segments [start, end), and the
+    samples of the beats (float, as computed for the last segment)
+    """
+    rr = np.asarray(rr)
+    total_rr = np.zeros(rr_length(end_indexes[-1], frequency))
+    for start, end in zip(start_indexes, end_indexes):
+        annotations = np.cumsum(rr)+end-start
+        annotations -= annotations[0]
+        annotations *= frequency
+        in_segment = (annotations >= start) & (annotations <= end)
+        # the rr values interpolated considering their times
+        interpolated_rr = np.interp(np.arange(start, end), annotations[in_segment], rr[in_segment])
+        total_rr[start:end] = interpolated_rr[:(end-start)]
+    return total_rr, annotations
+
+
+def create_rr(annotations, start_indexes, end_indexes, fs, frequency, length, interpolated_samples=()):
+    """
+    RR signal (length samples) and RR store of the beats (samples, sorted) of the segments [start, end]: the interval
+    that ends at each beat, at fs, interpolated over the samples of its segment. The interval of a beat at one of
+    interpolated_samples is replaced by the mean of the intervals around it
+    """
+    annotations = np.asarray(annotations)
+    total_rr = np.zeros(length)  # interpolated values here
+    beat_samples = []  # beats closing each r interval
+    beat_intervals = []  # r intervals
+    for start, end in zip(start_indexes, end_indexes):
+        current_annotations = annotations[(annotations >= start) & (annotations <= end)]
+        if len(current_annotations) < 2:
+            continue
+        interval_times = np.diff(current_annotations) / fs  # r-r intervals
+
+        # index of annotation in which there is interpolation (interval_time is this-1)
+        for annotation_index in np.where(np.isin(current_annotations, interpolated_samples))[0]:
+            rr_index = int(annotation_index)-1
+            # previous and next 5 rr_intervals
+            window_pre = interval_times[max(0, (rr_index - 5)):(rr_index-1)]
+            window_post = interval_times[(rr_index+1):min(len(interval_times), (rr_index + 6))]
+            interval_times[rr_index] = np.mean(np.concatenate((window_pre, window_post)))
+
+        beat_samples.append(current_annotations[1:])
+        beat_intervals.append(interval_times)
+        total_rr[start:end] = np.interp(np.arange(start, end), current_annotations[1:], interval_times)
+
+    # one value per beat instead of per sample
+    rr_store = RRStore.from_beats(np.concatenate(beat_samples) if beat_samples else [],
+                                  np.concatenate(beat_intervals) if beat_intervals else [], frequency, length)
+    return total_rr, rr_store
+
+
+def neighbour_beats(annotations, annotation_change, last_sample):
+    """beat before the sample annotation_change, beat after it and the next one (0 or last_sample when missing)"""
+    position = np.searchsorted(annotations, annotation_change, side='left')
+    previous_annotation = max(annotations[position-1], 0) if position > 0 else 0
+    position = np.searchsorted(annotations, annotation_change, side='right')
+    next_annotation = min(annotations[position], last_sample) if position < len(annotations) else last_sample
+    position = np.searchsorted(annotations, next_annotation, side='right')
+    second_next_annotation = min(annotations[position], last_sample) if position < len(annotations) else last_sample
+    return previous_annotation, next_annotation, second_next_annotation
+
+
+def interpolated_interval(annotations, annotation_change, frequency, signal_length):
+    """interval of a beat interpolated at annotation_change: the mean of the intervals of the 10 beats around it"""
+    annotation_index = np.searchsorted(annotations, annotation_change)
+    min_index = max(0, annotation_index-5)
+    max_index = min(signal_length, annotation_index+5)
+    return np.mean(np.diff(annotations[min_index:max_index])) / frequency
+
+
+def update_rr_store(intervals, annotations, annotation_change, change_type, frequency, signal_length):
+    """
+    RR store intervals updated in place around the beat at the sample annotation_change (change_type: ADD, DELETE,
+    INTERPOLATE or DELETE_INTERPOLATION); annotations are the beats (sorted) of a signal of signal_length samples
+    """
+    previous_annotation, next_annotation, _ = neighbour_beats(annotations, annotation_change, signal_length-2)
+    if change_type == ADD:
+        intervals.set_interval(annotation_change, (annotation_change-previous_annotation)/frequency)
+        intervals.update(next_annotation, (next_annotation-annotation_change)/frequency)
+    elif change_type == DELETE:
+        # the deleted beat is the only one between previous and next, its interval merges into the next one
+        intervals.remove_between(previous_annotation + 1, next_annotation)
+        intervals.update(next_annotation, (next_annotation-previous_annotation)/frequency)
+    elif change_type == INTERPOLATE:
+        new_value = interpolated_interval(annotations, annotation_change, frequency, signal_length)
+        intervals.set_interval(annotation_change, new_value, corrected=True)
+    else:
+        intervals.set_interval(annotation_change, (annotation_change-previous_annotation)/frequency, corrected=False)
+    return intervals
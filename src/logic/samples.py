@@ -0,0 +1,52 @@
+"""
+Samples of a recording without Qt or the PALMS state, shared by the sample options of the application
+(gui/sample_options.py) and the headless batch processing (logic/batch_engine.py): the noise check of a sample and
+the limits of repeated samples.
+"""
+
+
+def is_too_noisy(start, end, minimum_sample_size, noise_start_points, noise_end_points, signal_end):
+    """
+    True if the sample [start, end] (s, end cut at signal_end) is shorter than minimum_sample_size seconds or has more
+    noise (noise partitions from noise_start_points to noise_end_points, s) than its length minus minimum_sample_size
+    """
+    end = min(end, signal_end)
+    maximum_noise = (end-start)-minimum_sample_size
+
+    # when for other reason sample is not long enough (for example if it is at the end of the signal)
+    if ((end-start) < minimum_sample_size):
+        return True
+
+    noise_time = 0
+    for noise_start, noise_end in zip(noise_start_points, noise_end_points):
+        if (noise_start > start and noise_start < end): # some noise starts in the sample
+            # noise starts and finishes in the sample, or goes until the end of it
+            noise_time += (min(noise_end, end)-noise_start)
+        elif (noise_end > start and noise_end < end): # some noise ends in the sample (this means it started before the sample)
+            noise_time += (noise_end-start)
+
+        # all the sample is noise
+        if (noise_start < start and noise_end > end):
+            noise_time += (noise_end-noise_start)
+
+    return noise_time > maximum_noise
+
+
+def repetitions_fit(start_index, duration_index, repetitions, minimum_sample_size, signal_length):
+    """True if the last of the repetitions (samples from start_index, duration_index apart) fits in the signal"""
+    return (start_index + duration_index * (repetitions-1) + minimum_sample_size) <= signal_length
+
+
+def repeated_samples(start, duration, repetitions, step, too_noisy, stop=None):
+    """
+    (start, end) of repetitions samples of duration seconds, each one starting step seconds after the previous one,
+    leaving out the ones too_noisy(start, end); no more samples once a start is after stop
+    """
+    limits = []
+    for _ in range(int(repetitions)):
+        if too_noisy(start, start+duration) is False:
+            limits.append((start, start+duration))
+        start = start + step
+        if stop is not None and start > stop:
+            break
+    return limits
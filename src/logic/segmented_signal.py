@@ -0,0 +1,110 @@
+"""
+A recording as the list of its contiguous blocks: the sample of the recording where each block starts and its
+values, all at the sampling frequency fs. The samples between blocks (the gaps between imported files, or the end
+of a file outside START_INDEXES/END_INDEXES) are not stored, so filtering, detection and the other work per block
+scale with the recorded samples only and never run across a gap. A dense array, with the gaps filled, is made only
+where it is needed (the Wave of a track) or for a window of samples.
+"""
+import tempfile
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+COPY_CHUNK = 1_000_000  # samples copied at a time into a mapped copy
+
+
+def copy_signal(values: np.ndarray) -> np.ndarray:
+    """
+    copy of a dense signal with its dtype, to write filtered blocks into (SegmentedSignal.map with out). A mapped
+    signal (np.memmap) is copied by chunks into a temporary file, mapped too
+    """
+    if not isinstance(values, np.memmap):
+        return np.array(values, copy=True)
+    copy = np.memmap(tempfile.TemporaryFile(), dtype=values.dtype, mode='w+', shape=values.shape)
+    for start in range(0, len(values), COPY_CHUNK):
+        copy[start:start + COPY_CHUNK] = values[start:start + COPY_CHUNK]
+    return copy
+
+
+class SegmentedSignal:
+
+    def __init__(self, blocks: List[Tuple[int, np.ndarray]], fs: float, length: int = None):
+        """blocks: (start sample, values) sorted by start and not overlapping; length: samples of the whole recording"""
+        self.blocks = [(int(start), values) for start, values in blocks]
+        self.fs = fs
+        self.length = int(length) if length is not None else max((start + len(values) for start, values in self.blocks),
+                                                                   default=0)
+
+    @classmethod
+    def from_indexes(cls, values: np.ndarray, start_indexes, end_indexes, fs: float):
+        """blocks [start, end) of a dense array, as views of it (no copy)"""
+        blocks = [(int(start), values[int(start):int(end)]) for start, end in zip(start_indexes, end_indexes)
+                  if int(end) > int(start)]
+        return cls(sorted(blocks, key=lambda block: block[0]), fs, len(values))
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def recorded_samples(self) -> int:
+        return sum(len(values) for _, values in self.blocks)
+
+    @property
+    def start_indexes(self) -> np.ndarray:
+        return np.array([start for start, _ in self.blocks], dtype=np.int64)
+
+    @property
+    def end_indexes(self) -> np.ndarray:
+        return np.array([start + len(values) for start, values in self.blocks], dtype=np.int64)
+
+    def map(self, function: Callable[[np.ndarray], np.ndarray], out: np.ndarray = None) -> 'SegmentedSignal':
+        """
+        function applied to the values of every block (e.g. a filter), which must keep their length. With out (a
+        dense array of the recording, it can be the one of the blocks) the new values are written into it and the
+        blocks returned are views of it
+        """
+        blocks = []
+        for start, values in self.blocks:
+            new_values = np.asarray(function(values))
+            if len(new_values) != len(values):
+                raise ValueError("The function must keep the length of the blocks")
+            if out is not None:
+                out[start:start + len(values)] = new_values
+                new_values = out[start:start + len(values)]
+            blocks.append((start, new_values))
+        return SegmentedSignal(blocks, self.fs, self.length)
+
+    def window(self, start: int, stop: int, fill: float = 0.) -> np.ndarray:
+        """dense values of samples [start, stop), fill in the gaps. A view of a block when it covers the window"""
+        start, stop = max(int(start), 0), min(int(stop), self.length)
+        for block_start, values in self.blocks:
+            if block_start <= start and stop <= block_start + len(values):
+                return values[start - block_start:stop - block_start]
+        dense = np.full(max(stop - start, 0), fill, dtype=self.dtype)
+        for block_start, values in self.blocks:
+            first, last = max(start, block_start), min(stop, block_start + len(values))
+            if first < last:
+                dense[first - start:last - start] = values[first - block_start:last - block_start]
+        return dense
+
+    def __getitem__(self, item):
+        """signal[start:stop] is window(start, stop), so it can be used where a dense array is sliced"""
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError("A SegmentedSignal can only be sliced by contiguous ranges of samples")
+        start, stop, _ = item.indices(self.length)
+        return self.window(start, stop)
+
+    @property
+    def dtype(self):
+        return np.result_type(*[values.dtype for _, values in self.blocks]) if self.blocks else np.dtype(float)
+
+    def to_dense(self, out: np.ndarray = None, fill: float = 0.) -> np.ndarray:
+        """
+        the whole recording as one array: the blocks are written into out (a copy of the original signal keeps its
+        samples in the gaps), or into a new array filled with fill
+        """
+        if out is None:
+            out = np.full(self.length, fill, dtype=self.dtype)
+        for start, values in self.blocks:
+            out[start:start + len(values)] = values
+        return out
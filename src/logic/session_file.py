@@ -0,0 +1,224 @@
+"""
+Session files (.h5) with the signal, beats, outliers, noise and samples of one recording, as saved by the left
+options panel and by the headless batch processing (logic/batch_engine.py) and loaded back in the import window.
+
+Layout (format_version 3, file attribute): the same groups and names as the first files, which had no version and
+still load. The signals of the recording (SIGNAL_DATASETS) are only written when the file is created or when their
+values change (checksum attribute of each dataset): the raw signal and the rr per sample (MAPPED_DATASETS) are
+stored contiguous and uncompressed, so that opening a session maps them from the file (read_signal) instead of
+reading them, and the others are chunked and compressed. The edited datasets (beats, outliers, noise) are small
+resizable datasets and the rest are attributes. Saving again to a session of the same recording, with the same
+mapped signals, opens it in place and only writes the datasets and attributes that changed; any other file is
+written to a temporary file that then replaces it, so a mapped signal is never truncated or overwritten under it;
+the signals mapped from the old file are detached first (detach_signal), as a mapped file cannot be replaced on
+Windows.
+"""
+import os
+import zlib
+
+import h5py
+import numpy as np
+
+FORMAT_VERSION = 3
+
+# written once, when the file is created
+SIGNAL_DATASETS = ('ecg_values', 'original_rr', 'original_fiducials_samples', 'original_fiducials_intervals',
+                   'original_annotations', 'start_indexes', 'end_indexes', 'missing_start_indexes',
+                   'missing_end_indexes')
+# signals read through a memory map when a session is opened (contiguous datasets, from format_version 3)
+MAPPED_DATASETS = ('ecg_values', 'original_rr')
+SIGNAL_CHUNK = 2 ** 16  # values per chunk of the signals
+EDIT_CHUNK = 2 ** 10  # values per chunk of the edited datasets
+FINGERPRINT_VALUES = 4096  # signal values used to recognise the recording of a session
+
+
+def format_version(hdf_file):
+    """version of an open session file, 0 for the files without version"""
+    return int(hdf_file.attrs.get('format_version', 0))
+
+
+def signal_fingerprint(values):
+    """checksum of the length and of evenly spaced values of a signal, cheap for any length"""
+    values = np.asarray(values)
+    step = max(1, len(values) // FINGERPRINT_VALUES)
+    return f"{len(values)}-{zlib.crc32(np.ascontiguousarray(values[::step]).tobytes())}"
+
+
+def signal_checksum(values):
+    """checksum of all the values of a signal"""
+    return zlib.crc32(np.ascontiguousarray(values))
+
+
+def read_signal(file_path, dataset):
+    """
+    values of a dataset of an open session, mapped from the file (copy on write: the file is never modified) when it
+    is contiguous and uncompressed, read otherwise (the files before format_version 3 compress all the signals)
+    """
+    offset = dataset.id.get_offset()
+    if dataset.chunks is not None or offset is None or dataset.dtype.kind not in 'iuf' or dataset.size == 0:
+        return dataset[()]
+    return np.memmap(file_path, dtype=dataset.dtype, mode='c', offset=offset, shape=dataset.shape)
+
+
+def _create_signal(group, key, value):
+    value = np.asarray(value)
+    if key in MAPPED_DATASETS:
+        group.create_dataset(key, data=value)
+        return
+    chunks = (max(1, min(len(value), SIGNAL_CHUNK)),) + value.shape[1:] if value.ndim else None
+    group.create_dataset(key, data=value, chunks=chunks, compression='gzip' if chunks else None, shuffle=bool(chunks))
+
+
+def _write_edited(group, key, value):
+    """writes a resizable dataset, in place when it exists with the same type and only if its values changed"""
+    value = np.asarray(value)
+    if value.ndim != 1:
+        if key in group:
+            del group[key]
+        group.create_dataset(key, data=value)
+        return
+    if key in group:
+        dataset = group[key]
+        if dataset.maxshape == (None,) and dataset.dtype == value.dtype:
+            if dataset.shape == value.shape and np.array_equal(dataset[()], value):
+                return
+            dataset.resize(value.shape)
+            dataset[:] = value
+            return
+        del group[key]
+    group.create_dataset(key, data=value, maxshape=(None,), chunks=(EDIT_CHUNK,))
+
+
+def _set_attributes(attrs, values):
+    """sets the attributes that changed and removes the ones that are not in values"""
+    for key in list(attrs.keys()):
+        if key not in values:
+            del attrs[key]
+    for key, value in values.items():
+        if key not in attrs or not np.array_equal(attrs[key], value):
+            attrs[key] = value
+
+
+def _mapped_from(value, file_path):
+    """True if value is mapped from file_path (read_signal), so it has the values of the file"""
+    return isinstance(value, np.memmap) and value.filename == os.path.abspath(file_path)
+
+
+def detach_signal(value, file_path, copies=None):
+    """
+    value, or a copy of it in a temporary file (segmented_signal.copy_signal) when it is mapped from file_path, so
+    that no mapping keeps file_path from being replaced (Windows does not replace a mapped file); copies ({id: copy})
+    gives the same copy to the holders of the same array
+    """
+    if not _mapped_from(value, file_path):
+        return value
+    from logic.segmented_signal import copy_signal
+    copies = {} if copies is None else copies
+    if id(value) not in copies:
+        copies[id(value)] = (value, copy_signal(value))
+    return copies[id(value)][1]
+
+
+def _can_update(file_path, fingerprint, checksums):
+    """
+    True if file_path is a session of the current format saved from the same recording, whose mapped signals have
+    checksums ({dataset: checksum}, None for a signal mapped from the file)
+    """
+    try:
+        with h5py.File(file_path, 'r') as hdf_file:
+            group1 = hdf_file['group1']
+            return (format_version(hdf_file) == FORMAT_VERSION
+                    and hdf_file.attrs.get('signal_fingerprint') == fingerprint
+                    and all(key in group1 and (checksum is None or group1[key].attrs.get('checksum') == checksum)
+                            for key, checksum in checksums.items()))
+    except (OSError, KeyError):
+        return False
+
+
+def flatten_samples(samples_dictionary):
+    """samples {name: {i: {'start', 'end'}}} as the attributes of group2 ({'name_i_start': sample})"""
+    samples = {}
+    for sample_name, sample_data in samples_dictionary.items():
+        for sample_index, key in sample_data.items():
+            for sample_limit, value in key.items():
+                samples[f'{sample_name}_{sample_index}_{sample_limit}'] = value
+    return samples
+
+
+def write_session(file_path, attributes, datasets, samples_dictionary, flags, algorithm_outliers, journal_id=None,
+                  release=None):
+    """
+    attributes (numbers) and datasets (arrays) go to group1, the samples ({name: {i: {'start', 'end'}}} in samples)
+    to group2, flags (booleans and strings) to group3 and the algorithm outliers ({type: times}) to group4. journal_id
+    identifies this save for the edit journal that continues it (logic/edit_journal.py). release is called before a
+    new file replaces file_path, to detach the signals mapped from it (detach_signal), after emptying datasets
+    """
+    fingerprint = signal_fingerprint(datasets['ecg_values'])
+    # the raw signal is recognised by its fingerprint, the other mapped signals by their checksum
+    mapped = {key: None if _mapped_from(datasets[key], file_path) else signal_checksum(datasets[key])
+              for key in MAPPED_DATASETS if key != 'ecg_values' and key in datasets}
+    update = _can_update(file_path, fingerprint, mapped)
+
+    # a new file is written next to file_path and replaces it at the end (the old one may be mapped by read_signal)
+    path = file_path if update else f"{file_path}.tmp"
+    try:
+        with h5py.File(path, 'r+' if update else 'w') as hdf_file:
+            if not update:
+                hdf_file.attrs['format_version'] = FORMAT_VERSION
+                hdf_file.attrs['signal_fingerprint'] = fingerprint
+                # Create a group for numbers and arrays.
+                hdf_file.create_group('group1')
+                # Create a group for samples dictionary.
+                hdf_file.create_group('group2')
+                # group 3 for boolean and strings
+                hdf_file.create_group('group3')
+                # group 4 for algoruthm outliers dictionary
+                hdf_file.create_group('group4')
+            group1 = hdf_file['group1']
+
+            # fill group 1
+            _set_attributes(group1.attrs, attributes)
+            for key in list(group1.keys()):
+                if key not in datasets:
+                    del group1[key]
+            for key, value in datasets.items():
+                if key in SIGNAL_DATASETS:
+                    if update and key in MAPPED_DATASETS:
+                        # the same as in the file (_can_update), and may be mapped: never rewritten in place
+                        continue
+                    # the raw signal is the one of the file (signal_fingerprint), the others can change with a
+                    # redetection while keeping their length
+                    checksum = mapped.get(key)
+                    if checksum is None and key != 'ecg_values':
+                        checksum = signal_checksum(value)
+                    if key in group1 and (group1[key].shape != np.shape(value) or
+                                          group1[key].attrs.get('checksum') != checksum):
+                        del group1[key]
+                    if key not in group1:
+                        _create_signal(group1, key, value)
+                        if checksum is not None:
+                            group1[key].attrs['checksum'] = checksum
+                else:
+                    _write_edited(group1, key, value)
+
+            if journal_id is not None:
+                hdf_file.attrs['journal_id'] = journal_id
+
+            # fill group 2
+            _set_attributes(hdf_file['group2'].attrs, flatten_samples(samples_dictionary))
+
+            _set_attributes(hdf_file['group3'].attrs, flags)
+
+            _set_attributes(hdf_file['group4'].attrs, {f'{key}': value for key, value in algorithm_outliers.items()})
+
+        if not update:
+            if release is not None:
+                # the references of this save to the mapped signals go first, then the ones of the caller
+                datasets.clear()
+                value = None
+                release()
+            os.replace(path, file_path)
+    finally:
+        # a save that failed leaves no temporary file behind
+        if not update and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,97 @@
+"""
+Frequency domain results of a selection of RR intervals (s), computed once and shared by the results panel (plots
+and tables) and the exports. A SpectralResult holds the PSD and the band parameters of the first spectrum (Welch,
+or Lomb-Scargle if selected in the settings) and of the autoregressive one, each computed when first needed. The
+results are kept in the ResultsCache of the results panel (logic/results_cache.py) by a hash of the RR intervals and
+of the settings they depend on, so switching tabs, changing back the bands or exporting the partition on screen does
+not compute the spectra again, while an edit of the RR intervals or of a setting gives a new result.
+"""
+import hashlib
+import json
+from functools import partial
+
+import numpy as np
+
+from modified_dependencies.pyhrv import frequency_domain as fd
+from logic import hrv_analysis
+from logic.results_cache import values_hash
+
+# settings the spectra depend on (with the frequency bands)
+SPECTRAL_SETTINGS = ('lomb_scargle', 'ma_order', 'spectrum_points', 'ar_order', 'detrending_method',
+                     'smoothing_parameter')
+
+
+class SpectralResult:
+    """PSDs, band parameters and plots of the FFT (or Lomb-Scargle) and AR spectra of some RR intervals (s)"""
+
+    def __init__(self, rr_intervals, settings, fbands):
+        self.rr_intervals = np.asarray(rr_intervals)
+        self.settings = {key: settings[key] for key in SPECTRAL_SETTINGS}
+        self.fbands = fbands
+        # first spectrum: 'lomb' or 'fft' (Welch), as pyhrv names their parameters
+        self.first = 'lomb' if self.settings['lomb_scargle'] else 'fft'
+        self._spectra = {}
+        self._figures = {}
+
+    def _compute(self, name):
+        """parameters, frequencies and powers (ms^2/Hz) of the spectrum, as in the 'normal' mode of pyhrv"""
+        stationary = partial(hrv_analysis.get_stationary_rr, settings=self.settings)
+        if name == 'lomb':
+            _, frequencies, powers = fd.lomb_psd(nni=self.rr_intervals, fbands=self.fbands, mode='dev',
+                                                 ma_size=self.settings['ma_order'],
+                                                 nfft=self.settings['spectrum_points'], stationary=stationary)
+            # the 'normal' mode scales the powers before computing the parameters
+            powers = powers * 10 ** 6
+            params, _ = fd._compute_parameters('lomb', frequencies, powers, self.fbands)
+        elif name == 'fft':
+            params, frequencies, powers = fd.welch_psd(nni=self.rr_intervals, fbands=self.fbands, mode='dev',
+                                                       nfft=self.settings['spectrum_points'], stationary=stationary)
+            powers = powers * 10 ** 6
+        else:
+            params, frequencies, powers = fd.ar_psd(nni=self.rr_intervals, fbands=self.fbands, mode='dev',
+                                                    order=self.settings['ar_order'], stationary=stationary)
+            powers = powers * 10 ** 6
+        return params, frequencies, powers
+
+    def spectrum(self, name):
+        """(parameters, frequencies, powers) of the spectrum 'fft', 'lomb' or 'ar'"""
+        if name not in self._spectra:
+            self._spectra[name] = self._compute(name)
+        return self._spectra[name]
+
+    def parameters(self, name):
+        return self.spectrum(name)[0]
+
+    def figure(self, name):
+        """PSD plot of the spectrum, created once"""
+        if name not in self._figures:
+            params, frequencies, powers = self.spectrum(name)
+            _, freq_i = fd._compute_parameters(name, frequencies, powers, self.fbands)
+            self._figures[name] = fd._plot_psd(name, frequencies, powers, freq_i, params, show=False, show_param=True,
+                                               legend=True, figsize=None)
+        return self._figures[name]
+
+    def values(self):
+        """16 values of the first spectrum followed by the same 16 of the AR spectrum (hrv_analysis._band_results)"""
+        return tuple(hrv_analysis._band_results(self.parameters(self.first), self.first, '_norm')
+                     + hrv_analysis._band_results(self.parameters('ar'), 'ar', '_norm'))
+
+
+def settings_key(settings, fbands):
+    """hash of the settings the spectra depend on and of the frequency bands"""
+    relevant = [settings[key] for key in SPECTRAL_SETTINGS] + [fbands[band] for band in sorted(fbands)]
+    return hashlib.sha1(json.dumps(relevant, default=str).encode()).hexdigest()
+
+
+def spectral_result(rr_intervals, settings, fbands=None, cache=None):
+    """
+    SpectralResult of the RR intervals (s) with the settings, taken from cache (a ResultsCache) while none of them
+    changed, a new one without cache
+    """
+    if fbands is None:
+        fbands = hrv_analysis.frequency_bands(settings)
+    compute = partial(SpectralResult, rr_intervals, settings, fbands)
+    if cache is None:
+        return compute()
+    return cache.get(('spectral', values_hash(rr_intervals), settings_key(settings, fbands)), compute)
+
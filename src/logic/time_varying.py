@@ -0,0 +1,199 @@
+"""
+Sliding windows of pyhrv.tools.time_varying. A window is a range [lo, hi) of the RR intervals, and the parameters in
+RUNNING_PARAMETERS are computed for all the windows at once from running (prefix) sums of the intervals, of their
+squares and of their successive differences, so a whole trajectory is linear in the number of beats. The intervals
+are converted to ms once, as pyhrv does for each window (pyhrv.utils.nn_format), so these parameters are the ones of
+the pyhrv functions. The other parameters run their pyhrv function on every window, called as in CALL_OPTIONS.
+"""
+import importlib
+
+import numpy as np
+
+
+def time_windows(t, window_size, sliding_window):
+    """
+    window centres (the first beat time t (s) at or after each multiple of sliding_window) and the [lo, hi) of the
+    beats with a time at most window_size (s) from the centre, the windows at the start and the end being cut
+    """
+    if sliding_window <= 0:
+        raise ValueError("'sliding_window' must be > 0.")
+    t = np.asarray(t)
+    if len(t) == 0:
+        return np.array([]), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    # the targets are added one by one, as the previous loop did
+    targets = np.cumsum(np.concatenate(([0.], np.full(int(t[-1] // sliding_window) + 2, float(sliding_window)))))
+    indices = np.searchsorted(t, targets, side='left')
+    result = t[indices[indices < len(t)]]
+
+    lo = np.searchsorted(t, result - window_size, side='left')
+    lo[result <= window_size] = 0
+    hi = np.searchsorted(t, result + window_size, side='right')
+    hi[(result > window_size) & (result >= t[-1] - window_size)] = len(t)
+    return result, lo, hi
+
+
+def beat_windows(n, window_size):
+    """[lo, hi) of the windows of window_size beats before and after each beat but the first"""
+    i = np.arange(1, n)
+    lo = np.maximum(i - window_size, 0)
+    hi = np.where(i <= window_size - 1, i + window_size + 1, np.where(i < n - window_size, i + window_size + 1, i))
+    return lo, hi
+
+
+def _running(values):
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def _window_extreme(values, lo, hi, function):
+    """
+    np.minimum or np.maximum (function) of each window, from a sparse table: level k has the extreme of the 2**k values
+    from each position, so every window is covered by two blocks of one level
+    """
+    lengths = hi - lo
+    result = np.full(len(lo), np.nan)
+    if len(values) == 0 or not np.any(lengths > 0):
+        return result
+    table = [values]
+    while 2 ** len(table) <= lengths.max():
+        step = 2 ** (len(table) - 1)
+        table.append(function(table[-1][:-step], table[-1][step:]))
+    valid = lengths > 0
+    levels = np.floor(np.log2(lengths[valid])).astype(np.int64)
+    first = np.empty(len(levels), dtype=values.dtype)
+    second = np.empty(len(levels), dtype=values.dtype)
+    for level in np.unique(levels):
+        in_level = levels == level
+        first[in_level] = table[level][lo[valid][in_level]]
+        second[in_level] = table[level][hi[valid][in_level] - 2 ** level]
+    result[valid] = function(first, second)
+    return result
+
+
+class WindowStatistics:
+    """running sums of the RR intervals (ms, integers as in pyhrv) for windows [lo, hi)"""
+
+    def __init__(self, nn_ms, lo, hi):
+        self.nn = np.asarray(nn_ms, dtype=np.int64)
+        self.lo = np.asarray(lo, dtype=np.int64)
+        self.hi = np.asarray(hi, dtype=np.int64)
+        self.count = self.hi - self.lo
+        self.diff_count = self.count - 1
+        self.differences = np.abs(np.diff(self.nn))
+        self._sums = {}
+
+    def _window_sum(self, name, values, differences=False):
+        """sums of values over the windows ([lo, hi - 1) for the successive differences)"""
+        if name not in self._sums:
+            self._sums[name] = _running(values)
+        sums = self._sums[name]
+        return sums[self.hi - 1 if differences else self.hi] - sums[self.lo]
+
+    @staticmethod
+    def _std(count, total, squares):
+        """standard deviation (ddof 1) from the sum and the sum of squares of each window"""
+        return np.sqrt(1. / (count - 1) * np.maximum(squares - total * total / count, 0))
+
+    def mean(self):
+        return self._window_sum('nn', self.nn) / self.count
+
+    def std(self):
+        # integers: the sums are exact and the numerator has no cancellation error
+        total = self._window_sum('nn', self.nn)
+        squares = self._window_sum('nn2', self.nn ** 2)
+        return np.sqrt(1. / (self.count - 1) * ((self.count * squares - total * total) / self.count))
+
+    def minimum(self):
+        return _window_extreme(self.nn, self.lo, self.hi, np.minimum)
+
+    def maximum(self):
+        return _window_extreme(self.nn, self.lo, self.hi, np.maximum)
+
+    def heart_rate_mean(self):
+        heart_rate = 60000. / self.nn
+        return self._window_sum('hr', heart_rate) / self.count
+
+    def heart_rate_std(self):
+        # centred on the mean heart rate so the sums of squares keep their precision
+        heart_rate = 60000. / self.nn
+        centred = heart_rate - heart_rate.mean()
+        return self._std(self.count, self._window_sum('hr_centred', centred), self._window_sum('hr_centred2', centred ** 2))
+
+    def differences_rms(self):
+        return np.sqrt(1. / self.diff_count * self._window_sum('diff2', self.differences ** 2, True))
+
+    def differences_std(self):
+        centred = self.differences - self.differences.mean()
+        return self._std(self.diff_count, self._window_sum('diff_centred', centred, True),
+                         self._window_sum('diff_centred2', centred ** 2, True))
+
+    def differences_above(self, threshold):
+        return self._window_sum(f'diff_above_{threshold}', self.differences > threshold, True)
+
+
+# parameter -> values of every window from the WindowStatistics
+RUNNING_PARAMETERS = {
+    'nni_mean': lambda s: s.mean(),
+    'hr_mean': lambda s: s.heart_rate_mean(),
+    'hr_min': lambda s: 60000. / s.maximum(),
+    'hr_max': lambda s: 60000. / s.minimum(),
+    'hr_std': lambda s: s.heart_rate_std(),
+    'sdnn': lambda s: s.std(),
+    'sdsd': lambda s: s.differences_std(),
+    'rmssd': lambda s: s.differences_rms(),
+    'nn50': lambda s: s.differences_above(50),
+    'pnn50': lambda s: s.differences_above(50) / s.diff_count * 100,
+    'nn20': lambda s: s.differences_above(20),
+    'pnn20': lambda s: s.differences_above(20) / s.diff_count * 100,
+}
+
+# pyhrv function -> (name of the RR intervals argument, other arguments) to get its parameters without plots
+CALL_OPTIONS = {
+    'pyhrv.time_domain.tinn': ('nni', {'plot': False}),
+    'pyhrv.time_domain.triangular_index': ('nni', {'plot': False}),
+    'pyhrv.time_domain.stress_index': ('nni', {'plot': False}),
+    'pyhrv.frequency_domain.welch_psd': ('nni', {'show': False}),
+    'pyhrv.frequency_domain.ar_psd': ('nni', {'show': False}),
+    'pyhrv.frequency_domain.lomb_psd': ('nni', {'show': False}),
+    'pyhrv.nonlinear.poincare': ('nni', {'mode': 'dev'}),
+    'pyhrv.nonlinear.dfa': ('nn', {}),
+}
+
+
+def pyhrv_function(function_path):
+    """function of a hrv_keys.json path, e.g. pyhrv.time_domain.sdnn"""
+    module_name, function_name = function_path.rsplit('.', 1)
+    return getattr(importlib.import_module('modified_dependencies.' + module_name), function_name)
+
+
+def parameter_values(parameter, function_path, nn, lo, hi):
+    """values of the parameter (hrv_keys.json key, computed by function_path) of the windows [lo, hi) of nn (s)"""
+    if parameter in RUNNING_PARAMETERS:
+        from modified_dependencies.pyhrv.utils import nn_format
+        nn_ms = nn_format(nn) if len(nn) else np.array([], dtype=np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.asarray(RUNNING_PARAMETERS[parameter](WindowStatistics(nn_ms, lo, hi)), dtype=np.float64)
+
+    function = pyhrv_function(function_path)
+    argument, options = CALL_OPTIONS.get(function_path, ('nni', {}))
+    return np.asarray([function(**{argument: nn[start:stop]}, **options)[parameter] for start, stop in zip(lo, hi)])
+
+
+def noise_time(starts, ends, noise_starts, noise_ends):
+    """noise (s) counted in each window [start, end] (s) as in the samples (a noise covering a window counts whole)"""
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    total = np.zeros(len(starts))
+    for noise_start, noise_end in zip(noise_starts, noise_ends):
+        starts_inside = (noise_start > starts) & (noise_start < ends)
+        total += np.where(starts_inside, np.where(noise_end < ends, noise_end - noise_start, ends - noise_start),
+                          np.where((noise_end > starts) & (noise_end < ends), noise_end - starts, 0))
+        total += np.where((noise_start < starts) & (noise_end > ends), noise_end - noise_start, 0)
+    return total
+
+
+def noisy_windows(starts, ends, minimum_data, noise_starts, noise_ends):
+    """True for the windows shorter than minimum_data (s) or with less than minimum_data without noise"""
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    maximum_noise = (ends - starts) - minimum_data
+    return ((ends - starts) < minimum_data) | (noise_time(starts, ends, noise_starts, noise_ends) > maximum_noise)
@@ -70,7 +70,8 @@ def welch_psd(nni=None,
 			  show_param=True,
 			  legend=True,
 			  figsize=None,
-			  mode='normal'):
+			  mode='normal',
+			  stationary=None):
 	"""Computes a Power Spectral Density (PSD) estimation from the NNI series using the Welch’s method
 	and computes all frequency domain parameters from this PSD according to the specified frequency bands.
 
@@ -109,6 +110,8 @@ def welch_psd(nni=None,
 		'normal'	Returns frequency domain parameters and PSD plot figure in a ReturnTuple object
 		'dev'		Returns frequency domain parameters, frequency and power arrays, no plot figure
 		'devplot'	Returns frequency domain parameters, frequency array, power array, and the plot figure
+	stationary : function, optional
+		Detrending applied to the NNI series (default: None: detrending method of the results panel)
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -166,8 +169,7 @@ def welch_psd(nni=None,
 	nn_interpol = f_interpol(t_interpol)
 
 	# Subtract mean value from each sample for suppression of DC-offsets
-	from gui import PALMS
-	nn_interpol = PALMS.get().viewer.results_w.get_stationary_rr(nn_interpol)
+	nn_interpol = _stationary(nn_interpol, stationary)
 
 	# Adapt 'nperseg' according to the total duration of the NNI series (5min threshold = 300000ms)
 	if t.max() < 300000:
@@ -240,7 +242,8 @@ def lomb_psd(
 		show_param=True,
 		legend=True,
 		figsize=None,
-		mode='normal'
+		mode='normal',
+		stationary=None
 	):
 	"""Computes a Power Spectral Density (PSD) estimation from the NNI series using the Lomb-Scargle Periodogram
 	and computes all frequency domain parameters from this PSD according to the specified frequency bands.
@@ -278,6 +281,8 @@ def lomb_psd(
 		'normal'	Returns frequency domain parameters and PSD plot figure in a ReturnTuple object
 		'dev'		Returns frequency domain parameters, frequency and power arrays, no plot figure
 		'devplot'	Returns frequency domain parameters, frequency array, power array, and the plot figure
+	stationary : function, optional
+		Detrending applied to the NNI series (default: None: detrending method of the results panel)
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -326,8 +331,7 @@ def lomb_psd(
 	t = np.cumsum(nn)
 	t -= t[0]
 
-	from gui import PALMS
-	nn = PALMS.get().viewer.results_w.get_stationary_rr(nn)
+	nn = _stationary(nn, stationary)
 
 	# Compute PSD according to the Lomb-Scargle method
 	# Specify frequency grid
@@ -402,7 +406,8 @@ def ar_psd(nni=None,
 		   show_param=True,
 		   legend=True,
 		   figsize=None,
-		   mode='normal'):
+		   mode='normal',
+		   stationary=None):
 	"""Computes a Power Spectral Density (PSD) estimation from the NNI series using the Autoregressive method
 	and computes all frequency domain parameters from this PSD according to the specified frequency bands.
 
@@ -440,6 +445,8 @@ def ar_psd(nni=None,
 		'normal'	Returns frequency domain parameters and PSD plot figure in a ReturnTuple object
 		'dev'		Returns frequency domain parameters, frequency and power arrays, no plot figure
 		'devplot'	Returns frequency domain parameters, frequency array, power array, and the plot figure
+	stationary : function, optional
+		Detrending applied to the NNI series (default: None: detrending method of the results panel)
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -497,17 +504,10 @@ def ar_psd(nni=None,
 	t_interpol = np.arange(t[0], t[-1], 1000./fs)
 	nn_interpol = f_interpol(t_interpol)
 
-	from gui import PALMS
-	nn_data = PALMS.get().viewer.results_w.get_stationary_rr(nn_interpol)
+	nn_data = _stationary(nn_interpol, stationary)
 
 	# Compute autoregressive PSD
-	ar = spectrum.pyule(data=nn_data, order=order, NFFT=nfft, sampling=fs, scale_by_freq=False)
-
-	# Get frequencies and powers
-	frequencies = np.asarray(ar.frequencies())
-	psd = np.asarray(ar.psd)
-	powers = np.asarray(10 * np.log10(psd) * 10**3) 	# * 10**3 to compensate with ms^2 to s^2 conversion
-														# in the upcoming steps
+	frequencies, powers = _ar_spectrum(nn_data, order, nfft, fs)
 
 	# Define metadata
 	meta = biosppy.utils.ReturnTuple((nfft, order, fs, 'cubic'), ('ar_nfft', 'ar_order', 'ar_resampling_frequency',
@@ -554,6 +554,39 @@ def ar_psd(nni=None,
 		return pyhrv.utils.join_tuples(params, figure, meta), frequencies, (powers / 10 ** 6)
 
 
+def _ar_spectrum(nn_data, order, nfft, fs):
+	"""Frequencies and powers of the autoregressive PSD (Yule-Walker) of the resampled NNI series."""
+	ar = spectrum.pyule(data=nn_data, order=order, NFFT=nfft, sampling=fs, scale_by_freq=False)
+
+	# Get frequencies and powers
+	frequencies = np.asarray(ar.frequencies())
+	psd = np.asarray(ar.psd)
+	powers = np.asarray(10 * np.log10(psd) * 10**3) 	# * 10**3 to compensate with ms^2 to s^2 conversion
+														# in the upcoming steps
+	return frequencies, powers
+
+
+def _stationary(nn, stationary=None):
+	"""Removes the trend of the NNI series with the given function, by default with the detrending method selected
+	in the results panel.
+	"""
+	if stationary is None:
+		from gui import PALMS
+		stationary = PALMS.get().viewer.results_w.get_stationary_rr
+	return stationary(nn)
+
+
+def _keep_trend(nn):
+	return nn
+
+
+def _welch_detrending(kwargs, stationary):
+	"""Detrending of the Welch PSDs for the 'detrend' kwarg of psd_comparison() and psd_waterfall(): True (default)
+	detrends the NNI segments with 'stationary', False leaves them as they are.
+	"""
+	return stationary if kwargs.get('detrend', True) else _keep_trend
+
+
 def _compute_parameters(method, frequencies, power, freq_bands):
 	"""Computes PSD HRV parameters from the PSD frequencies and powers.
 
@@ -967,6 +1000,73 @@ PSD_METHODS = {
 }
 
 
+def _resample_segments(segments, fs):
+	"""Cubic interpolation at fs [Hz] of consecutive NNI segments in [ms] from a single spline of the whole series,
+	sampled on the time grid that welch_psd() and ar_psd() use for each segment, and the duration of each segment.
+	"""
+	nn = np.concatenate(segments)
+	t = np.cumsum(nn)
+	t -= t[0]
+	spline = sp.interpolate.make_interp_spline(t, nn, k=3)
+
+	bounds = np.cumsum([0] + [len(segment) for segment in segments])
+	durations = t[bounds[1:] - 1] - t[bounds[:-1]]
+	grids = [t[start] + np.arange(0, duration, 1000. / fs) for start, duration in zip(bounds[:-1], durations)]
+	samples = spline(np.concatenate(grids))
+	return np.split(samples, np.cumsum([len(grid) for grid in grids])[:-1]), durations
+
+
+def _segment_spectra(segments, method, fbands=None, nfft=None, window='hamming', order=16, ma_size=None,
+					 stationary=None):
+	"""Computes the PSDs of a series of NNI segments at once and returns, for each segment, the parameters, frequencies
+	and powers of the 'dev' mode of welch_psd(), ar_psd() or lomb_psd() (method 'welch', 'ar' or 'lomb').
+
+	The series is resampled once for the Welch and autoregressive PSDs (the spline of the whole series only differs
+	from the spline of a single segment near the segment edges), and the Welch PSDs of all the segments with the
+	same number of samples are computed together on a 2D array. The Lomb-Scargle periodogram works on the NNI
+	themselves and the autoregressive models are fitted segment by segment.
+	"""
+	fbands = _check_freq_bands(fbands)
+	segments = [pyhrv.utils.check_input(segment, None) for segment in segments]
+	fs = 4
+
+	if method == 'lomb':
+		nfft = 2 ** 8 if nfft is None else nfft
+		return [lomb_psd(nni=segment, fbands=fbands, nfft=nfft, ma_size=ma_size, mode='dev', stationary=stationary)
+				for segment in segments]
+
+	nfft = 2 ** 12 if nfft is None else nfft
+	resampled, durations = _resample_segments(segments, fs)
+	spectra = []
+	if method == 'welch':
+		# Segments with the same number of samples and segment length share one Welch computation
+		groups = {}
+		for i, (samples, duration) in enumerate(zip(resampled, durations)):
+			groups.setdefault((len(samples), nfft if duration < 300000 else 300), []).append(i)
+		powers = [None] * len(segments)
+		for (_, nperseg), indices in groups.items():
+			data = np.array([_stationary(resampled[i], stationary) for i in indices])
+			frequencies, group_powers = welch(x=data, fs=fs, window=window, nperseg=nperseg, nfft=nfft,
+											  scaling='density', axis=-1)
+			for i, power in zip(indices, group_powers):
+				powers[i] = power
+		meta = biosppy.utils.ReturnTuple((nfft, window, fs, 'cubic'),
+										 ('fft_nfft', 'fft_window', 'fft_resampling_frequency', 'fft_interpolation'))
+		for power in powers:
+			params, _ = _compute_parameters('fft', frequencies, power, fbands)
+			spectra.append((pyhrv.utils.join_tuples(params, meta), frequencies, np.asarray(power / 10 ** 6)))
+
+	elif method == 'ar':
+		meta = biosppy.utils.ReturnTuple((nfft, order, fs, 'cubic'),
+										 ('ar_nfft', 'ar_order', 'ar_resampling_frequency', 'ar_interpolation'))
+		for samples in resampled:
+			frequencies, powers = _ar_spectrum(_stationary(samples, stationary), order, nfft, fs)
+			params, _ = _compute_parameters('ar', frequencies, powers, fbands)
+			spectra.append((pyhrv.utils.join_tuples(params, meta), frequencies, powers / 10 ** 6))
+
+	return spectra
+
+
 def psd_comparison(nni=None,
 				   rpeaks=None,
 				   segments=None,
@@ -974,7 +1074,9 @@ def psd_comparison(nni=None,
 				   fbands=None,
 				   duration=300,
 				   show=True,
-				   kwargs_method=None):
+				   kwargs_method=None,
+				   plot=True,
+				   stationary=None):
 	"""Computes a series of PSDs from NNI segments extracted from a NNI/R-Peak input series or a series of input
 	NNI segments and plots the result in a single plot.
 
@@ -1008,6 +1110,11 @@ def psd_comparison(nni=None,
 		If true, show PSDs plot (default: True)
 	kwargs_method : dict
 		Dictionary of kwargs for the PSD computation functions 'welch_psd()', 'ar_psd()' or 'lomb_psd()'.
+		'detrend': False computes the Welch PSDs without detrending the segments (default: True, with 'stationary').
+	plot : bool, optional
+		If true, creates the PSDs plot; otherwise only the segment parameters are returned (default: True)
+	stationary : function, optional
+		Detrending applied to the NNI segments (default: None: detrending method of the results panel)
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -1073,19 +1180,22 @@ def psd_comparison(nni=None,
 				raise ValueError("Unknown PSD method '%s'. Please select 'welch', 'ar' or 'lomb'." % str(method))
 
 		# Compute all PSDs and frequency domain parameters of each segment
-		psd_data = _compute_psds(segments, method=method, fbands=fbands, kwargs=kwargs_method)
+		psd_data = _compute_psds(segments, method=method, fbands=fbands, kwargs=kwargs_method, stationary=stationary)
 
 		# Create 2D comparison plot
-		fig = _2d_plot(psd_data, fbands=_check_freq_bands(fbands), method=method, show=show, duration=duration)
+		if plot:
+			fig = _2d_plot(psd_data, fbands=_check_freq_bands(fbands), method=method, show=show, duration=duration)
+			output = biosppy.utils.ReturnTuple((fig,), ('psd_comparison_plot',))
+		else:
+			output = biosppy.utils.ReturnTuple((), ())
 
 		# Output
-		output = biosppy.utils.ReturnTuple((fig,), ('psd_comparison_plot',))
 		for i in range(len(psd_data)):
 			output = pyhrv.utils.join_tuples(biosppy.utils.ReturnTuple((psd_data[i]['params'],), ('seg%i' % i,)), output)
 		return output
 
 
-def _compute_psds(segments, method, fbands, kwargs={}):
+def _compute_psds(segments, method, fbands, kwargs={}, stationary=None):
 	"""Iterates through a series of NNI segments and computes the respective PSDs.
 
 	Parameters
@@ -1106,6 +1216,9 @@ def _compute_psds(segments, method, fbands, kwargs={}):
 				'hf'	High frequency			(default: (0.15Hz - 0.4Hz))
 	kwargs : dict
 		Dictionary of kwargs for the PSD computation functions 'welch_psd()', 'ar_psd()' or 'lomb_psd()'.
+		'detrend': False computes the Welch PSDs without detrending the segments (default: True, with 'stationary').
+	stationary : function, optional
+		Detrending applied to the NNI segments (default: None: detrending method of the results panel)
 
 	Returns
 	-------
@@ -1147,9 +1260,7 @@ def _compute_psds(segments, method, fbands, kwargs={}):
 		returns results in a nested biosspy.utils.ReturnTuple object.
 		"""
 		args, names = (), ()
-		psd_method = PSD_METHODS[method]
-		for i, seg in enumerate(segs):
-			params, f, p = psd_method(nni=seg, fbands=fbands, mode='dev', **kwargs)
+		for i, (params, f, p) in enumerate(_segment_spectra(segs, method, fbands, stationary=stationary, **kwargs)):
 			args += (biosppy.utils.ReturnTuple((params, f, p,), ("params", "f", "p",)),)
 			names += ("seg%i" % (i + 1),)
 		return biosppy.utils.ReturnTuple(args, names)
@@ -1167,7 +1278,6 @@ def _compute_psds(segments, method, fbands, kwargs={}):
 		available_kwargs = ['detrend', 'window', 'nfft']
 
 		# Unwrap kwargs dictionary for Welch specific parameters
-		detrend = kwargs['detrend'] if 'detrend' in kwargs.keys() else True
 		window = kwargs['window'] if 'window' in kwargs.keys() else 'hamming'
 		nfft = kwargs['nfft'] if 'nfft' in kwargs.keys() else 2 ** 12
 
@@ -1182,7 +1292,8 @@ def _compute_psds(segments, method, fbands, kwargs={}):
 						  unsupported_kwargs, stacklevel=2)
 
 		# Compute and return PSDs
-		return _psds(segments, detrend=detrend, window=window, nfft=nfft)
+		stationary = _welch_detrending(kwargs, stationary)
+		return _psds(segments, window=window, nfft=nfft)
 
 	elif method == 'lomb':
 		# Check for kwargs for the 'lomb_psd' function and compute the PSD  & set default values for invalid kwargs
@@ -1322,7 +1433,9 @@ def psd_waterfall(nni=None,
 				  kwargs_method={},
 				  duration=300,
 				  show=True,
-				  legend=True):
+				  legend=True,
+				  plot=True,
+				  stationary=None):
 	"""Creates 3D waterfall plot of PSD plots computed from a series of NNI segments.
 
 	Can be used to create a plot for comparison of multiple of PSD plots.
@@ -1351,12 +1464,17 @@ def psd_waterfall(nni=None,
 				'hf'	High frequency			(default: (0.15Hz - 0.4Hz))
 	kwargs_method : dictionary, optional
 		Dictionary with input parameters for the 'welch_psd()', 'ar_psd()' or 'lomb_psd()' method (default: {}).
+		'detrend': False computes the Welch PSDs without detrending the segments (default: True, with 'stationary').
 	duration : int, optional
 		Duration of NNI segments from which the PSD are computed (default: 30)
 	show : bool, optional
 		If true, show PSD plot (default: True)
 	legend : bool, optional
 		If true, add a legend with frequency bands to the plot (default: True)
+	plot : bool, optional
+		If true, creates the waterfall plot; otherwise only the segment parameters are returned (default: True)
+	stationary : function, optional
+		Detrending applied to the NNI segments (default: None: detrending method of the results panel)
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -1433,7 +1551,7 @@ def psd_waterfall(nni=None,
 							  stacklevel=2)
 
 			# Compute PSD of current segment
-			result = ar_psd(nni=nn, show=show, nfft=nfft, order=order)
+			result = ar_psd(nni=nn, show=show, nfft=nfft, order=order, stationary=stationary)
 			return biosppy.utils.ReturnTuple((result['ar_plot'], result, ), ('ar_plot', 'seg1', ))
 
 		# Return Welch PSD plot
@@ -1442,7 +1560,6 @@ def psd_waterfall(nni=None,
 			available_kwargs = ['detrend', 'window', 'nfft']
 
 			# Unwrap kwargs dictionary for Welch specific parameters
-			detrend = kwargs_method['detrend'] if 'detrend' in kwargs_method.keys() else True
 			window = kwargs_method['window'] if 'window' in kwargs_method.keys() else 'hamming'
 			nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 12
 
@@ -1457,7 +1574,8 @@ def psd_waterfall(nni=None,
 							  stacklevel=2)
 
 			# Compute PSD of current segment
-			result = welch_psd(nni=nn, nfft=nfft, detrend=detrend, window=window, show=show)
+			result = welch_psd(nni=nn, nfft=nfft, window=window, show=show,
+							   stationary=_welch_detrending(kwargs_method, stationary))
 			return biosppy.utils.ReturnTuple((result['fft_plot'], result, ), ('fft_plot', 'seg1', ))
 
 		# Return Lomb PSD plot
@@ -1480,7 +1598,7 @@ def psd_waterfall(nni=None,
 							  stacklevel=2)
 
 			# Compute PSD of current segment
-			result = lomb_psd(nni=nn, nfft=nfft, ma_size=ma_size, show=show)
+			result = lomb_psd(nni=nn, nfft=nfft, ma_size=ma_size, show=show, stationary=stationary)
 			return biosppy.utils.ReturnTuple((result['lomb_plot'], result, ), ('lomb_plot', 'seg1', ))
 
 	# If segmentation worked, proceed with plot
@@ -1489,96 +1607,73 @@ def psd_waterfall(nni=None,
 		fbands = _check_freq_bands(fbands)
 
 		# Vars
-		z_axis, plot_data, powers, freqs, segment_parameters = [], [], [], [], []
-
-		# Create multiple Welch's plot from each segment
-		for i, segment in enumerate(segments):
-			# Get to PSD methods
-			if method == 'ar':
-				method_name = 'Autoregressive'
-
-				# Supported kwargs
-				available_kwargs = ['order', 'nfft']
-
-				# Unwrap kwargs dictionary for Welch specific parameters
-				nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 12
-				order = kwargs_method['order'] if 'order' in kwargs_method.keys() else 16
-
-				unsupported_kwargs = []
-				for args in kwargs_method.keys():
-					if args not in available_kwargs:
-						unsupported_kwargs.append(args)
-
-				# Throw warning if additional unsupported kwargs have been provided
-				if unsupported_kwargs:
-					warnings.warn(
-						"Unknown kwargs for 'welch_psd': %s. These kwargs have no effect." % unsupported_kwargs,
-						stacklevel=2)
-
-				# Compute PSD of current segment
-				params, f, p = ar_psd(nni=segment, mode='dev', order=order, nfft=nfft, show=False, legend=False)
-
-			elif method == 'welch':
-				method_name = 'Welch\'s Method'
-
-				# Supported kwargs
-				available_kwargs = ['detrend', 'window', 'nfft']
-
-				# Unwrap kwargs dictionary for Welch specific parameters
-				detrend = kwargs_method['detrend'] if 'detrend' in kwargs_method.keys() else True
-				window = kwargs_method['window'] if 'window' in kwargs_method.keys() else 'hamming'
-				nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 12
-
-				unsupported_kwargs = []
-				for args in kwargs_method.keys():
-					if args not in available_kwargs:
-						unsupported_kwargs.append(args)
-
-				# Throw warning if additional unsupported kwargs have been provided
-				if unsupported_kwargs:
-					warnings.warn(
-						"Unknown kwargs for 'welch_psd': %s. These kwargs have no effect." % unsupported_kwargs,
-						stacklevel=2)
-
-				# Compute PSD of current segment
-				params, f, p = welch_psd(nni=segment, mode='dev', nfft=nfft, detrend=detrend, window=window, show=False)
-
-			elif method == 'lomb':
-				method_name = 'Lomb Scargle'
-
-				# Supported kwargs
-				available_kwargs = ['ma_size', 'nfft']
-
-				# Unwrap kwargs dictionary
-				nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 8
-				ma_size = kwargs_method['ma_size'] if 'ma_size' in kwargs_method.keys() else None
-
-				unsupported_kwargs = []
-				for args in kwargs_method.keys():
-					if args not in available_kwargs:
-						unsupported_kwargs.append(args)
-
-				# Throw warning if additional unsupported kwargs have been provided
-				if unsupported_kwargs:
-					warnings.warn(
-						"Unknown kwargs for 'lomb_psd': %s. These kwargs have no effect." % unsupported_kwargs,
-						stacklevel=2)
-
-				params, f, p = lomb_psd(nni=segment, mode='dev', nfft=nfft, ma_size=ma_size, show=False)
+		z_axis, powers, freqs, segment_parameters = [], [], [], []
+
+		# Get to PSD methods
+		if method == 'ar':
+			method_name = 'Autoregressive'
+
+			# Supported kwargs
+			available_kwargs = ['order', 'nfft']
+
+			# Unwrap kwargs dictionary for Welch specific parameters
+			nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 12
+			order = kwargs_method['order'] if 'order' in kwargs_method.keys() else 16
+			kwargs_spectra = {'nfft': nfft, 'order': order}
+
+		elif method == 'welch':
+			method_name = 'Welch\'s Method'
+
+			# Supported kwargs
+			available_kwargs = ['detrend', 'window', 'nfft']
+
+			# Unwrap kwargs dictionary for Welch specific parameters
+			window = kwargs_method['window'] if 'window' in kwargs_method.keys() else 'hamming'
+			nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 12
+			kwargs_spectra = {'nfft': nfft, 'window': window}
+			stationary = _welch_detrending(kwargs_method, stationary)
+
+		elif method == 'lomb':
+			method_name = 'Lomb Scargle'
+
+			# Supported kwargs
+			available_kwargs = ['ma_size', 'nfft']
+
+			# Unwrap kwargs dictionary
+			nfft = kwargs_method['nfft'] if 'nfft' in kwargs_method.keys() else 2 ** 8
+			ma_size = kwargs_method['ma_size'] if 'ma_size' in kwargs_method.keys() else None
+			kwargs_spectra = {'nfft': nfft, 'ma_size': ma_size}
+		else:
+			raise ValueError("Unknown method '%s' selected. Please select a valid PSD estimation method (welch, "
+							 "ar or lomb)." % method)
+
+		unsupported_kwargs = []
+		for args in kwargs_method.keys():
+			if args not in available_kwargs:
+				unsupported_kwargs.append(args)
+
+		# Throw warning if additional unsupported kwargs have been provided
+		if unsupported_kwargs:
+			warnings.warn(
+				"Unknown kwargs for '%s_psd': %s. These kwargs have no effect." % (method, unsupported_kwargs),
+				stacklevel=2)
+
+		# Compute the PSDs of all the segments
+		spectra = _segment_spectra(segments, method, fbands, stationary=stationary, **kwargs_spectra)
+
+		for i, (params, f, p) in enumerate(spectra):
+			if method == 'lomb':
 				p[0] = 0
-			else:
-				raise ValueError("Unknown method '%s' selected. Please select a valid PSD estimation method (welch, "
-								 "ar or lomb)." % method)
 
 			# Store parameter results
 			segment_parameters.append(params)
 
 			# Get intervals between 0 and upper interval of the HF band
-			f = np.asarray([float(fval) for fval in f if fval <= fbands['hf'][1]])
+			f = np.asarray(f[f <= fbands['hf'][1]], dtype=float)
 			p = np.asarray(p[:len(f)])
 
 			# Normalize data
-			p = np.asarray([(p_val - p.min())/(p.max() - p.min()) for p_val in p])
+			p = (p - p.min()) / (p.max() - p.min())
 
 			# Store values
 			freqs.append(f)
@@ -1590,6 +1685,14 @@ def psd_waterfall(nni=None,
 			else:
 				z_axis.append(i+1)
 
+		# Output without the figure
+		if not plot:
+			output = biosppy.utils.ReturnTuple((), ())
+			for i in range(len(segment_parameters)):
+				output = pyhrv.utils.join_tuples(biosppy.utils.ReturnTuple((segment_parameters[i], ), ('seg%i' % i, )),
+												 output)
+			return output
+
 		# Create 3D figure object
 		fig = plt.figure(figsize=(10, 4))
 		wf_ax = Axes3D(fig)
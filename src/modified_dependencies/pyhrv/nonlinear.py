@@ -36,9 +36,11 @@ from __future__ import division, print_function, absolute_import
 
 # Third party libraries
 import nolds
+from nolds.measures import poly_fit
 import warnings
 import numpy as np
 import matplotlib as mpl
+from scipy.spatial import cKDTree
 import matplotlib.pyplot as plt
 import os
 
@@ -194,7 +196,58 @@ def poincare(nni=None,
 
 
 
-def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
+def _template_vectors(nn, dim, count):
+	"""First count template vectors (consecutive NNI) of length dim."""
+	return np.lib.stride_tricks.sliding_window_view(np.asarray(nn, dtype=np.float64), dim)[:count]
+
+
+def _kdtree_sampen(nn, dim, tolerance):
+	"""Sample entropy as nolds.sampen computes it (pairs of the first len(nn) - dim template vectors of length dim
+	and dim + 1 with a Chebyshev distance < tolerance), counting the pairs with a KD-tree instead of one by one.
+
+	"""
+	count = len(nn) - dim
+	# Largest distance below the tolerance, as the KD-tree counts the distances <= radius
+	radius = np.nextafter(tolerance, -np.inf)
+	pairs = []
+	for m in [dim, dim + 1]:
+		tree = cKDTree(_template_vectors(nn, m, count))
+		# Every pair is counted twice, and every vector with itself
+		pairs.append((tree.count_neighbors(tree, radius, p=np.inf) - tree.n) // 2)
+	if pairs[1] == 0:
+		return np.inf
+	return -np.log(1.0 * pairs[1] / pairs[0])
+
+
+def _kdtree_apen(nn, dim, tolerance):
+	"""Approximate entropy (Pincus): phi(dim) - phi(dim + 1), phi(m) being the mean log of the fraction of template
+	vectors of length m at a Chebyshev distance <= tolerance of each one (itself included), counted with a KD-tree.
+
+	"""
+	phi = []
+	for m in [dim, dim + 1]:
+		vectors = _template_vectors(nn, m, len(nn) - m + 1)
+		counts = cKDTree(vectors).query_ball_point(vectors, tolerance, p=np.inf, return_length=True)
+		phi.append(np.mean(np.log(counts / len(vectors))))
+	return phi[0] - phi[1]
+
+
+# Entropy backends: 'kdtree' (default) or 'nolds' (pairwise template matching, quadratic in time)
+ENTROPY_BACKENDS = {
+	'sampen': {'kdtree': _kdtree_sampen, 'nolds': lambda nn, dim, tolerance: nolds.sampen(nn, dim, tolerance)},
+	'apen': {'kdtree': _kdtree_apen, 'nolds': lambda nn, dim, tolerance: nolds.apen(nn, dim, tolerance)},
+}
+
+
+def _entropy(name, nn, dim, tolerance, backend):
+	"""Entropy (name: 'sampen' or 'apen') of the NNI series with the given backend."""
+	if backend not in ENTROPY_BACKENDS[name]:
+		raise ValueError("Unknown entropy backend '%s'. Please use one of %s."
+						 % (backend, list(ENTROPY_BACKENDS[name])))
+	return float(ENTROPY_BACKENDS[name][backend](nn, dim, tolerance))
+
+
+def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None, backend='kdtree'):
 	"""Computes the sample entropy (sampen) of the NNI series.
 
 	Parameters
@@ -207,6 +260,8 @@ def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 		Entropy embedding dimension (default: 2).
 	tolerance : int, float, optional
 		Tolerance distance for which the vectors to be considered equal (default: std(NNI) * 0.2).
+	backend : str, optional
+		'kdtree' counts the similar vectors with a KD-tree, 'nolds' compares all the pairs (default: 'kdtree').
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -219,6 +274,8 @@ def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 	------
 	TypeError
 		If 'tolerance' is no numeric value.
+	ValueError
+		If 'backend' is unknown.
 
 	"""
 	# Check input values
@@ -234,7 +291,7 @@ def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 							'Please verify that tolerance is a numeric (int or float).')
 
 	# Compute Sample Entropy
-	sampen = float(nolds.sampen(nn, dim, tolerance))
+	sampen = _entropy('sampen', nn, dim, tolerance, backend)
 
 	# Output
 	args = (sampen, )
@@ -242,7 +299,7 @@ def sample_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 	return biosppy.utils.ReturnTuple(args, names)
 
 
-def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
+def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None, backend='kdtree'):
 	"""Computes the sample entropy (sampen) of the NNI series.
 
 	Parameters
@@ -255,6 +312,8 @@ def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 		Entropy embedding dimension (default: 2).
 	tolerance : int, float, optional
 		Tolerance distance for which the vectors to be considered equal (default: std(NNI) * 0.2).
+	backend : str, optional
+		'kdtree' counts the similar vectors with a KD-tree, 'nolds' compares all the pairs (default: 'kdtree').
 
 	Returns (biosppy.utils.ReturnTuple Object)
 	------------------------------------------
@@ -267,6 +326,8 @@ def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 	------
 	TypeError
 		If 'tolerance' is no numeric value.
+	ValueError
+		If 'backend' is unknown.
 
 	"""
 	# Check input values
@@ -281,8 +342,8 @@ def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 			raise TypeError('Tolerance level cannot be converted to float.'
 							'Please verify that tolerance is a numeric (int or float).')
 
-	# Compute Sample Entropy
-	apen = float(nolds.apen(nn, dim, tolerance))
+	# Compute Approximate Entropy
+	apen = _entropy('apen', nn, dim, tolerance, backend)
 
 	# Output
 	args = (apen, )
@@ -290,6 +351,97 @@ def approximate_entropy(nni=None, rpeaks=None, dim=2, tolerance=None):
 	return biosppy.utils.ReturnTuple(args, names)
 
 
+def _dfa_fluctuations(profile, nvals, order=1):
+	"""Mean fluctuation of the profile around its local polynomial trends (non-overlapping boxes) for every box size
+	in nvals, the boxes of one size being fitted together with one least squares problem.
+
+	"""
+	fluctuations = []
+	for n in nvals:
+		x = np.arange(n)
+		boxes = profile[:len(profile) - len(profile) % n].reshape(-1, n)
+		trends = np.vander(x, order + 1).dot(np.polyfit(x, boxes.T, order))
+		fluctuations.append(np.mean(np.sqrt(np.sum((boxes - trends.T) ** 2, axis=1) / n)))
+	return np.array(fluctuations)
+
+
+def _dfa_alpha(profile, nvals):
+	"""Alpha of the box sizes nvals and the (log n, log F(n), line coefficients) of the DFA plot, as nolds.dfa
+	with overlap=False computes them.
+
+	"""
+	if len(nvals) < 2:
+		raise ValueError("at least two nvals are needed")
+	if np.min(nvals) < 2:
+		raise ValueError("nvals must be at least two")
+	if np.max(nvals) >= len(profile):
+		raise ValueError("nvals cannot be larger than the input size")
+	fluctuations = _dfa_fluctuations(profile, nvals)
+
+	# Zero fluctuations cannot be fitted in log scale
+	nonzero = np.where(fluctuations != 0)
+	nvals = np.array(nvals)[nonzero]
+	fluctuations = fluctuations[nonzero]
+	if len(fluctuations) == 0:
+		poly = [np.nan, np.nan]
+	else:
+		poly = poly_fit(np.log(nvals), np.log(fluctuations), 1, fit='RANSAC')
+	return poly[0], (np.log(nvals), np.log(fluctuations), poly)
+
+
+def _dfa_fits(nn, short, long):
+	"""Alpha1, alpha2 and the fits of the short and long term fluctuations (see _dfa_alpha) of the box sizes short and
+	long, or 'nan', 'nan' and None if the series is too short for the DFA.
+
+	"""
+	try:
+		# Integrated profile of the series, shared by the short and the long term fluctuations
+		profile = np.cumsum(np.asarray(nn) - np.mean(nn))
+		alpha1, dfa_short = _dfa_alpha(profile, short)
+		alpha2, dfa_long = _dfa_alpha(profile, long)
+	except ValueError:
+		warnings.warn("Not enough NNI samples for Detrended Fluctuations Analysis.")
+		return 'nan', 'nan', None
+	return alpha1, alpha2, (dfa_short, dfa_long)
+
+
+def _plot_dfa(fits, alpha1, figsize=None, legend=True):
+	"""DFA plot figure of the fits of _dfa_fits (an empty graph if they are None)."""
+	if figsize is None:
+		figsize = (6, 6)
+	fig = plt.figure(figsize=figsize)
+	ax = fig.add_subplot(111)
+	ax.set_title('Detrended Fluctuation Analysis (DFA)')
+	ax.set_xlabel('log n [beats]')
+	ax.set_ylabel('log F(n)')
+
+	if fits is None:
+		# If DFA could not be conducted due to insufficient number of NNIs, return an empty graph
+		ax.axis([0, 1, 0, 1])
+		ax.text(0.5, 0.5, '[Insufficient number of NNI samples for DFA]', horizontalalignment='center',
+				verticalalignment='center')
+		return fig
+
+	# Plot short term DFA
+	dfa_short, dfa_long = fits
+	vals, flucts, poly = dfa_short[0], dfa_short[1], np.polyval(dfa_short[2], dfa_short[0])
+	label = '$ '+os.sep+'alpha_{1}: %0.2f$' % alpha1
+	ax.plot(vals, flucts, 'bo', markersize=1)
+	ax.plot(vals, poly, 'b', label=label, alpha=0.7)
+
+	# Plot long term DFA
+	vals, flucts, poly = dfa_long[0], dfa_long[1], np.polyval(dfa_long[2], dfa_long[0])
+	#label = '$ '+os.sep+alpha_{2}: %0.2f$' % alpha2
+	ax.plot(vals, flucts, 'go', markersize=1)
+	ax.plot(vals, poly, 'g', label=label, alpha=0.7)
+
+	# Add legend
+	if legend:
+		ax.legend()
+	ax.grid()
+	return fig
+
+
 def dfa(nn=None, rpeaks=None, short=None, long=None, show=False, figsize=None, legend=True, mode='normal'):
 	"""Conducts Detrended Fluctuation Analysis for short and long-term fluctuation of an NNI series.
 
@@ -338,55 +490,13 @@ def dfa(nn=None, rpeaks=None, short=None, long=None, show=False, figsize=None, l
 	short = range(short[0], short[1] + 1)
 	long = range(long[0], long[1] + 1)
 
-	# Prepare plot
-	if mode == 'normal':
-		if figsize is None:
-			figsize = (6, 6)
-		fig = plt.figure(figsize=figsize)
-		ax = fig.add_subplot(111)
-		ax.set_title('Detrended Fluctuation Analysis (DFA)')
-		ax.set_xlabel('log n [beats]')
-		ax.set_ylabel('log F(n)')
-
 	# Compute alpha values
-	try:
-		alpha1, dfa_short = nolds.dfa(nn, short, debug_data=True, overlap=False)
-		alpha2, dfa_long = nolds.dfa(nn, long, debug_data=True, overlap=False)
-	except ValueError:
-		# If DFA could not be conducted due to insufficient number of NNIs, return an empty graph and 'nan' for alpha1/2
-		warnings.warn("Not enough NNI samples for Detrended Fluctuations Analysis.")
-
-		# Update plot
-		if mode == 'normal':
-			ax.axis([0, 1, 0, 1])
-			ax.text(0.5, 0.5, '[Insufficient number of NNI samples for DFA]', horizontalalignment='center',
-					verticalalignment='center')
-		alpha1, alpha2 = 'nan', 'nan'
-	else:
-		# Plot DFA results if number of NNI were sufficent to conduct DFA
-		# Plot short term DFA
-		vals, flucts, poly = dfa_short[0], dfa_short[1], np.polyval(dfa_short[2], dfa_short[0])
-		label = '$ '+os.sep+'alpha_{1}: %0.2f$' % alpha1
-
-		# Update plot
-		if mode == 'normal':
-			ax.plot(vals, flucts, 'bo', markersize=1)
-			ax.plot(vals, poly, 'b', label=label, alpha=0.7)
-
-			# Plot long term DFA
-			vals, flucts, poly = dfa_long[0], dfa_long[1], np.polyval(dfa_long[2], dfa_long[0])
-			#label = '$ '+os.sep+alpha_{2}: %0.2f$' % alpha2
-			ax.plot(vals, flucts, 'go', markersize=1)
-			ax.plot(vals, poly, 'g', label=label, alpha=0.7)
-
-			# Add legend
-			if legend:
-				ax.legend()
-			ax.grid()
+	alpha1, alpha2, fits = _dfa_fits(nn, short, long)
 
 	# Normal Mode:
 	# Returns results & plot figure
 	if mode == 'normal':
+		fig = _plot_dfa(fits, alpha1, figsize, legend)
 		# Plot axis
 		if show:
 			plt.show()
@@ -452,6 +562,8 @@ def nonlinear(nni=None,
 					Entropy embedding dimension (default: 2).
 			..	tolerance : int, float, optional
 					Tolerance distance for which the vectors to be considered equal (default: std(NNI) * 0.2).
+			..	backend : str, optional
+					Entropy backend, 'kdtree' or 'nolds' (default: 'kdtree').
 
 	Returns
 	-------
@@ -534,11 +646,12 @@ def nonlinear(nni=None,
 							"parameters (keys) and values for the 'sample_entropy()' function." % type(kwargs_sampen))
 
 		# Supported kwargs
-		available_kwargs = ['dim', 'tolerance']
+		available_kwargs = ['dim', 'tolerance', 'backend']
 
 		# Unwrwap kwargs dictionaries
 		dim = kwargs_sampen['dim'] if 'dim' in kwargs_sampen.keys() else 2
 		tolerance = kwargs_sampen['tolerance'] if 'tolerance' in kwargs_sampen.keys() else None
+		backend = kwargs_sampen['backend'] if 'backend' in kwargs_sampen.keys() else 'kdtree'
 
 		unsupported_kwargs = []
 		for args in kwargs_sampen.keys():
@@ -551,7 +664,7 @@ def nonlinear(nni=None,
 						  % unsupported_kwargs, stacklevel=2)
 
 		# Compute Poincaré plot with custom configuration
-		s_results = sample_entropy(nn, dim=dim, tolerance=tolerance)
+		s_results = sample_entropy(nn, dim=dim, tolerance=tolerance, backend=backend)
 	else:
 		# Compute Poincaré plot with default values
 		s_results = sample_entropy(nn)
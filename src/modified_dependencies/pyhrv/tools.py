@@ -678,37 +678,9 @@ def heart_rate_heatplot(nni=None,
 	return biosppy.utils.ReturnTuple((fig, ), ('hr_heatplot', ))
 
 
-def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_window=60, minimum_effective_data=10, interpolation=None, show=True, mode='normal'):
-	"""Computes time varying plot of a pyHRV parameter at every NNI of the input NNI (or rpeak) series using a moving
-	time window or a moving NNI window.
-
-	Parameters
-	----------
-	nni : array
-		NN-Intervals in [ms] or [s]
-	rpeaks : array
-		R-peak locations in [ms] or [s]
-	parameter : string
-		pyHRV parameter key for which the time varying computation is to be plotted (check the hrv_keys.json file for a
-		full list of available keys)
-	window : string
-		Time varying window configuration using the following syntax:
-			'tX'	for using a moving time window, with X being the window interval before and after the current NNI
-					Example:	t20 generates a time window of 20s before and 20s after each NNI for the computation
-								of th pyHRV parameter
-			OR
-			'nX'	for using a moving NNI window, with X being the number of NNI included before and after the current
-					NNI
-					Example:	n20 generates a window which includes 20 NNI before and 20 NNI after the current NNI
-	interpolation : int (optional)
-		Frequency at which the computed parameter signal is be resampled and interpolated (for example to create a
-		parameter signal with the same sampling frequency of the original ECG signal)
-	show : bool, optional
-		If true, show time varying plot (default: True)
-	mode :
-
-	Returns
-	-------
+def _time_varying_values(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_window=60, interpolation=None):
+	"""NN intervals, window times and parameter values of time_varying, without its plot (no matplotlib or Qt object is
+	created, so they can be computed out of the main thread).
 
 	"""
 	# Check input series
@@ -748,68 +720,7 @@ def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_
 		window_mode = window[0]
 		window_size = int(window[1:])
 
-	# Internal helper function
-	def _compute_parameter(array, func):
-		try:
-			# Try to pass the show and mode argument to to suppress PSD plots
-			val = eval(func + '(nni=array, mode=\'dev\')[\'%s\']' % parameter)
-		except TypeError as e:
-			try:
-				# If functions has now mode feature but 'mode' argument, but a plotting feature
-				val = eval(func + '(nni=array, plot=False)[\'%s\']' % parameter)
-			except TypeError as a:
-				try:
-					val = eval(func + '(nni=array, show=False)[\'%s\']' % parameter)
-				except TypeError as ae:
-					if 'plot' in str(ae):
-						# If functions has now plotting feature try regular function
-						val = eval(func + '(nni=array)[\'%s\']' % parameter)
-					else:
-						try:
-							val = eval(func + '(nni=array)[\'%s\']' % parameter)
-						except TypeError as ae:
-							val = eval(func + '(nn=array)[\'%s\']' % parameter)
-		return val
-	
-	def is_too_noisy(start, end, minimum_data): # start and end are in time
-
-		from logic.operation_mode.noise_partitioning import NoisePartitions
-
-		minimum_sample_size = minimum_data # in time
-		maximum_noise = (end-start)-minimum_sample_size
-
-		# when for other reason sample is not long enough (for example if it is at the end of the signal)
-		if ((end-start) < minimum_sample_size):
-			return True
-		
-		# algorithm acts on each non-noisy interval. From noise indexes, get them (in seconds)
-		noise_start_points = NoisePartitions.all_startpoints()
-		noise_end_points = NoisePartitions.all_endpoints()
-
-		noise_time = 0
-
-		for noise_start, noise_end in zip(noise_start_points, noise_end_points):
-			if (noise_start > start and noise_start < end): # some noise starts in the sample
-				if (noise_end < end): # noise starts and finishes in the sample
-					noise_length = (noise_end-noise_start)
-					noise_time += noise_length
-				else: # noise starts in the sample and goes until the end of it
-					noise_length = (end-noise_start)
-					noise_time += noise_length
-			elif (noise_end > start and noise_end < end): # some noise ends in the sample (this means it started before the sample)
-				noise_length = (noise_end-start)
-				noise_time += noise_length
-			# all the sampe is noise:
-			if (noise_start < start and noise_end > end):
-				noise_length = (noise_end-noise_start)
-				noise_time += noise_length
-		if (noise_time > maximum_noise):
-			return True
-		else:
-			return False
-
-	# Vars
-	parameter_values = np.asarray([])
+	from logic import time_varying as sliding_windows
 
 	# Get hrv_keys & the respective function
 	hrv_keys = pyhrv.utils.load_hrv_keys_json()
@@ -819,54 +730,14 @@ def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_
 
 	# Beat window computation
 	if window_mode == 'n':
-		for i, _ in enumerate(nni):
-			if i == 0:
-				continue
-			# Incomplete initial window
-			elif i <= (window_size - 1):
-				vals = nn[:(i + window_size + 1)]
-				parameter_values = np.append(parameter_values, _compute_parameter(vals, parameter_func))
-			# Complete Window
-			elif i < (nni.size - window_size):
-				vals = nn[i - window_size: i + window_size + 1]
-				parameter_values = np.append(parameter_values, _compute_parameter(vals, parameter_func))
-			# Incomplete ending window
-			else:
-				vals = nn[i - window_size:i]
-				parameter_values = np.append(parameter_values, _compute_parameter(vals, parameter_func))
+		lo, hi = sliding_windows.beat_windows(nni.size, window_size)
+		parameter_values = sliding_windows.parameter_values(parameter, parameter_func, nn, lo, hi)
 
 	# Time window computation
 	elif window_mode == 't':
 		t = np.cumsum(nn)
-		index = 0
-		result = np.array([])
-		current_target = 0
-		while index < len(t):
-			# Find the leftmost value greater than or equal to the current target
-			import bisect
-			index = bisect.bisect_left(t, current_target, lo=index)
-			if index < len(t):
-				result = np.append(result, t[index])
-				current_target += sliding_window
-			else:
-				break        
-		for i, _t in enumerate(result):
-		
-			#if i == 0:
-		    #   continue
-			# Incomplete initial window
-			if _t <= window_size:
-				# t_vals = np.where((t <= _t) & (t <== (_t + window_size)))
-				indices = np.where(t <= (_t + window_size))[0]
-				parameter_values = np.append(parameter_values, _compute_parameter(nn_detrended[indices], parameter_func))
-			# Complete Window
-			elif _t < t[-1] - window_size:
-				indices = np.where(((_t - window_size) <= t) & (t <= (_t + window_size)))[0]
-				parameter_values = np.append(parameter_values, _compute_parameter(nn_detrended[indices], parameter_func))
-			# Incomplete end window
-			else:
-				indices = np.where(((_t - window_size) <= t) & (t <= t[-1]))[0]
-				parameter_values = np.append(parameter_values, _compute_parameter(nn_detrended[indices], parameter_func))
+		result, lo, hi = sliding_windows.time_windows(t, window_size, sliding_window)
+		parameter_values = sliding_windows.parameter_values(parameter, parameter_func, nn_detrended, lo, hi)
 
 
 	# Interpolation (optional) and time vector
@@ -879,6 +750,18 @@ def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_
 	else:
 		t = np.cumsum(nn) / 1000
 
+	return nn, result, parameter_values
+
+
+def _plot_time_varying(nn, result, parameter_values, parameter, window, minimum_effective_data):
+	"""Time varying plot figure of the values of _time_varying_values."""
+	window_mode = window[0]
+	window_size = int(window[1:])
+	hrv_keys = pyhrv.utils.load_hrv_keys_json()
+	parameter_label = hrv_keys[parameter][1]
+	parameter_unit = hrv_keys[parameter][2]
+	from logic import time_varying as sliding_windows
+
 	# Define start and end intervals
 	if window_mode == 'n':
 		indices = np.arange(0, len(nn))
@@ -941,20 +824,60 @@ def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_
 	# Recommended minimum window size
 	# TODO in future versions: add available recommended minimum durations to the HRV keys json file
 	parameter_minimum = minimum_effective_data
-	for i, _t in enumerate(result):
-		if i == 0:
-			continue
-		if is_too_noisy(result[i-1], _t, parameter_minimum): # use start of window, end of window and minimum size without noise
-			#ax.vlines(parameter_minimum, y_min, y_max, color='red')
-			min_x_value = max(0, result[i-1] - (_t - result[i-1])/2)
-			max_x_value = min(result[-1], result[i-1] + (_t - result[i-1])/2)
-			ax.fill_between([min_x_value, max_x_value], [y_max, y_max], color='red', alpha=0.3)     
+	from logic.operation_mode.noise_partitioning import NoisePartitions
+	# use start of window, end of window and minimum size without noise
+	too_noisy = sliding_windows.noisy_windows(result[:-1], result[1:], parameter_minimum, NoisePartitions.all_startpoints(), NoisePartitions.all_endpoints())
+	for i in np.flatnonzero(too_noisy) + 1:
+		_t = result[i]
+		#ax.vlines(parameter_minimum, y_min, y_max, color='red')
+		min_x_value = max(0, result[i-1] - (_t - result[i-1])/2)
+		max_x_value = min(result[-1], result[i-1] + (_t - result[i-1])/2)
+		ax.fill_between([min_x_value, max_x_value], [y_max, y_max], color='red', alpha=0.3)
 		
 	# Add overall value
 	#val = _compute_parameter(nn, parameter_func)
 	#ax.hlines(val, 0, result[-1], linestyles='--', linewidth=0.7)
 	#ax.text(1, val + 1, 'Overall')
 
+	return fig
+
+
+def time_varying(nni=None, rpeaks=None, parameter='sdnn', window='n60', sliding_window=60, minimum_effective_data=10, interpolation=None, show=True, mode='normal'):
+	"""Computes time varying plot of a pyHRV parameter at every NNI of the input NNI (or rpeak) series using a moving
+	time window or a moving NNI window.
+
+	Parameters
+	----------
+	nni : array
+		NN-Intervals in [ms] or [s]
+	rpeaks : array
+		R-peak locations in [ms] or [s]
+	parameter : string
+		pyHRV parameter key for which the time varying computation is to be plotted (check the hrv_keys.json file for a
+		full list of available keys)
+	window : string
+		Time varying window configuration using the following syntax:
+			'tX'	for using a moving time window, with X being the window interval before and after the current NNI
+					Example:	t20 generates a time window of 20s before and 20s after each NNI for the computation
+								of th pyHRV parameter
+			OR
+			'nX'	for using a moving NNI window, with X being the number of NNI included before and after the current
+					NNI
+					Example:	n20 generates a window which includes 20 NNI before and 20 NNI after the current NNI
+	interpolation : int (optional)
+		Frequency at which the computed parameter signal is be resampled and interpolated (for example to create a
+		parameter signal with the same sampling frequency of the original ECG signal)
+	show : bool, optional
+		If true, show time varying plot (default: True)
+	mode :
+
+	Returns
+	-------
+
+	"""
+	nn, result, parameter_values = _time_varying_values(nni, rpeaks, parameter, window, sliding_window, interpolation)
+	fig = _plot_time_varying(nn, result, parameter_values, parameter, window, minimum_effective_data)
+
 	# Check mode
 	if mode not in ['normal', 'dev', 'devplot']:
 		warnings.warn("Unknown mode '%s'. Will proceed with 'normal' mode." % mode, stacklevel=2)
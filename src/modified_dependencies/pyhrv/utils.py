@@ -337,25 +337,32 @@ def segmentation(nni=None, full=True, duration=300, warn=True):
 		segments = []
 		limits = np.arange(0, max_time + duration, duration)
 
+		# Sum of the NNI before each index: the NNI of a segment are found by bisection instead of one by one
+		csum = np.concatenate(([0], tn))
+
 		# Current index
 		cindex = 0
 
 		# Segment signals
-		for i, _ in enumerate(range(0, limits.size - 1)):
-			csegment = []
-			while np.sum(csegment) < duration:
-				csegment.append(nni[cindex])
-				if cindex < nni.size - 1:
-					cindex += 1
-				else:
-					break
+		for _ in range(limits.size - 1):
+			start = max(cindex, 0)
+
+			# NNI are added until their sum reaches the duration or the last NNI is added
+			last = min(int(np.searchsorted(csum, csum[start] + duration, side='left')) - 1, nni.size - 1)
+			# the sum of the segment decides, the differences of csum can be rounded differently (NNI in float ms)
+			while last > start and np.sum(nni[start:last]) >= duration:
+				last -= 1
+			while last < nni.size - 1 and np.sum(nni[start:last + 1]) < duration:
+				last += 1
+			cindex = last + 1 if last < nni.size - 1 else last
+			end = last + 1
 
 			# Check if overlap exists (just to be sure)
-			if np.sum(csegment) > duration:
-				csegment = csegment[:-1]
+			if np.sum(nni[start:end]) > duration:
+				end -= 1
 				cindex -= 1
 
-			segments.append(list(csegment))
+			segments.append(list(nni[start:end]))
 
 		# Remove the last incomplete segment if required
 		if not full:
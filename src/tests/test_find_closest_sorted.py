@@ -0,0 +1,71 @@
+"""
+find_closest_sorted against the linear search it replaced (np.argmin(np.abs(array - value))), on time vectors with
+the segment edges and the gaps of an import of several files.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from utils.utils_general import find_closest_sorted
+
+FS = 250
+
+
+def argmin_closest(array, values):
+    return np.array([np.argmin(np.abs(array - value)) for value in np.atleast_1d(values)])
+
+
+def segments_time(segments, fs=FS):
+    """times of the samples of the segments [(start, end)] in seconds, with the gaps between them"""
+    return np.concatenate([np.arange(int(start * fs), int(end * fs)) / fs for start, end in segments])
+
+
+@pytest.fixture
+def imported_time():
+    # three files with gaps of 10 s and 0.5 s between them
+    return segments_time([(0, 20), (30, 45), (45.5, 60)])
+
+
+def test_sample_times(imported_time):
+    values = imported_time[::97]
+    np.testing.assert_array_equal(find_closest_sorted(imported_time, values), argmin_closest(imported_time, values))
+
+
+def test_segment_edges(imported_time):
+    edges = np.flatnonzero(np.diff(imported_time) > 1.5 / FS)
+    values = np.concatenate([imported_time[edges], imported_time[edges + 1],
+                             imported_time[edges] + 0.4 / FS, imported_time[edges + 1] - 0.4 / FS])
+    np.testing.assert_array_equal(find_closest_sorted(imported_time, values), argmin_closest(imported_time, values))
+
+
+def test_import_gaps(imported_time):
+    # inside the gaps, on both sides of their middle and on it (a tie: the first index wins, as argmin)
+    values = np.array([25, 20 + 4.99, 20 + 5.01, (imported_time[4999] + imported_time[5000]) / 2, 45.2, 45.3])
+    np.testing.assert_array_equal(find_closest_sorted(imported_time, values), argmin_closest(imported_time, values))
+
+
+def test_out_of_the_recording(imported_time):
+    assert find_closest_sorted(imported_time, -3.) == 0
+    assert find_closest_sorted(imported_time, 1000.) == len(imported_time) - 1
+
+
+def test_scalar_and_array():
+    array = np.array([0., 1., 2.])
+    assert isinstance(find_closest_sorted(array, 1.2), int)
+    assert find_closest_sorted(array, 1.2) == 1
+    np.testing.assert_array_equal(find_closest_sorted(array, [0.4, 1.6]), [0, 2])
+
+
+def test_repeated_values():
+    array = np.array([0., 1., 1., 1., 2.])
+    np.testing.assert_array_equal(find_closest_sorted(array, [1., 0.9, 1.2]), [1, 1, 1])
+
+
+def test_short_arrays():
+    assert find_closest_sorted(np.array([5.]), 100.) == 0
+    np.testing.assert_array_equal(find_closest_sorted(np.array([5.]), [-1., 9.]), [0, 0])
+
+
+def test_nan():
+    assert find_closest_sorted(np.array([0., 1.]), np.nan) == 0
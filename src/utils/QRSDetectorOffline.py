@@ -47,7 +47,7 @@ class QRSDetectorOffline(object):
     SOFTWARE.
     """
 
-    def __init__(self, ecg_raw, ecg_data, fs, verbose=True, log_data=False, plot_data=False, show_plot=False):
+    def __init__(self, ecg_raw, ecg_data, fs, verbose=True, log_data=False, plot_data=False, show_plot=False, apply_noise=True):
         """
         QRSDetectorOffline class initialisation method.
         :param string ecg_data: data
@@ -55,6 +55,8 @@ class QRSDetectorOffline(object):
         :param bool log_data: flag for logging the results
         :param bool plot_data: flag for plotting the results to a file
         :param bool show_plot: flag for showing generated results plot - will not show anything if plot is not generated
+        :param bool apply_noise: flag for splitting the segments in PALMS at the detected noise, otherwise the noise
+                                 is only kept in self.noise_intervals (detection in worker processes)
         """
         # Configuration parameters.
         #if ecg_data is not None:
@@ -95,6 +97,7 @@ class QRSDetectorOffline(object):
         # Detection results.
         self.qrs_peaks_indices = np.array([], dtype=int)
         self.noise_peaks_indices = np.array([], dtype=int)
+        self.noise_intervals = []
 
         # Final ECG data and QRS detection results array - samples with detected QRS are marked with 1 value.
         self.ecg_data_detected = None
@@ -139,19 +142,10 @@ class QRSDetectorOffline(object):
                 # Add the last interval
                 merged_start = np.append(merged_start, start)
                 merged_end = np.append(merged_end, end)
-                from gui import PALMS
+                self.noise_intervals = [(int(noise_start), int(noise_end)) for noise_start, noise_end in zip(merged_start, merged_end)]
 
-                # add noise to partitions and palms
-                for new_start, new_end in zip(merged_end, merged_start): 
-                    PALMS.get().START_INDEXES = np.append(PALMS.get().START_INDEXES, int(new_start))
-                    PALMS.get().END_INDEXES = np.append(PALMS.get().END_INDEXES, int(new_end))
-                    PALMS.get().START_ECG_INDEXES = np.append(PALMS.get().START_ECG_INDEXES, int(new_start))
-                    PALMS.get().END_ECG_INDEXES = np.append(PALMS.get().END_ECG_INDEXES, int(new_end))
-
-                PALMS.get().END_ECG_INDEXES = np.sort(PALMS.get().END_ECG_INDEXES)
-                PALMS.get().END_INDEXES = np.sort(PALMS.get().END_INDEXES)
-                PALMS.get().START_ECG_INDEXES = np.sort(PALMS.get().START_ECG_INDEXES)
-                PALMS.get().START_INDEXES = np.sort(PALMS.get().START_INDEXES)
+                if apply_noise:
+                    QRSDetectorOffline.add_noise_intervals(self.noise_intervals)
 
         #self.detected_peaks_indices, self.detected_peaks_values, self.qrs_peaks_indices, self.qrs_peak_value, self.noise_peaks_indices, self.noise_peak_value, self.threshold_value = QRSDetectorOffline.detect_qrs_plus(self.integrated_ecg_measurements, self.signal_frequency, self.detected_peaks_indices, self.detected_peaks_values, self.refractory_period, self.qrs_peak_filtering_factor, self.noise_peak_filtering_factor, self.qrs_noise_diff_weight, self.qrs_peaks_indices, self.threshold_value, self.qrs_peak_value, self.noise_peaks_indices, self.noise_peak_value)
         self.detected_peaks_indices, self.detected_peaks_values, self.qrs_peaks_indices, self.qrs_peak_value, self.noise_peaks_indices, self.noise_peak_value, self.threshold_value = QRSDetectorOffline.detect_qrs(self, self.integrated_ecg_measurements, self.detected_peaks_indices, self.detected_peaks_values, self.refractory_period, self.qrs_peak_filtering_factor, self.noise_peak_filtering_factor, self.qrs_noise_diff_weight, self.qrs_peaks_indices, self.threshold_value, self.qrs_peak_value, self.noise_peaks_indices, self.noise_peak_value, self.signal_frequency)
@@ -169,6 +163,26 @@ class QRSDetectorOffline(object):
                                                                              strftime("%Y_%m_%d_%H_%M_%S", gmtime()))
             self.plot_detection_data(show_plot=show_plot)
 
+    @staticmethod
+    def add_noise_intervals(noise_intervals):
+        """
+        Splits the segments in PALMS at the given noise intervals: the end of a noise interval starts a segment
+        and its start ends one.
+        """
+        from gui import PALMS
+
+        # add noise to partitions and palms
+        for new_end, new_start in noise_intervals:
+            PALMS.get().START_INDEXES = np.append(PALMS.get().START_INDEXES, int(new_start))
+            PALMS.get().END_INDEXES = np.append(PALMS.get().END_INDEXES, int(new_end))
+            PALMS.get().START_ECG_INDEXES = np.append(PALMS.get().START_ECG_INDEXES, int(new_start))
+            PALMS.get().END_ECG_INDEXES = np.append(PALMS.get().END_ECG_INDEXES, int(new_end))
+
+        PALMS.get().END_ECG_INDEXES = np.sort(PALMS.get().END_ECG_INDEXES)
+        PALMS.get().END_INDEXES = np.sort(PALMS.get().END_INDEXES)
+        PALMS.get().START_ECG_INDEXES = np.sort(PALMS.get().START_ECG_INDEXES)
+        PALMS.get().START_INDEXES = np.sort(PALMS.get().START_INDEXES)
+
     """Loading ECG measurements data methods."""
 
     def load_ecg_data(self):
@@ -321,6 +335,70 @@ class QRSDetectorOffline(object):
         return accurate_r_peak_idx+1, upsampled_r_value
     
 
+    def interpolate_peak_batch(self, peak_indices, chunk_size=8192):
+        """
+        interpolate_peak for many peaks at once: same linear upsampling and argmax, computed as array operations
+        on the windows around the peaks. Peaks whose window is cut by the signal borders use interpolate_peak.
+        Returns the refined peak indices and the upsampled peak values.
+        """
+        peak_indices = np.asarray(peak_indices, dtype=np.int64)
+        peaks_refined = np.zeros(len(peak_indices), dtype=np.int64)
+        peaks_values = np.zeros(len(peak_indices))
+
+        signal = np.asarray(self.filtered_ecg_measurements, dtype=float)
+        upsample_factor = int(2000/self.signal_frequency)
+        window_size = int(0.035*self.signal_frequency)
+        segment_length = 2 * window_size
+
+        full_window = (peak_indices - window_size >= 0) & (peak_indices + window_size <= len(signal))
+        for i in np.flatnonzero(~full_window):
+            peaks_refined[i], peaks_values[i] = self.interpolate_peak(peak_indices[i])
+
+        full_indices = np.flatnonzero(full_window)
+        if len(full_indices) == 0 or segment_length < 2:
+            for i in full_indices:
+                peaks_refined[i], peaks_values[i] = self.interpolate_peak(peak_indices[i])
+            return peaks_refined, peaks_values
+
+        # same sample positions as np.linspace in interpolate_peak, and the same formula as np.interp
+        new_indices = np.linspace(0, segment_length - 1, segment_length * upsample_factor)
+        left = np.minimum(np.floor(new_indices).astype(np.int64), segment_length - 2)
+        fraction = new_indices - left
+        on_last = new_indices == segment_length - 1
+        offsets = np.arange(segment_length)
+
+        for chunk_start in range(0, len(full_indices), chunk_size):
+            chunk = full_indices[chunk_start:chunk_start + chunk_size]
+            start_idx = peak_indices[chunk] - window_size
+            segments = signal[start_idx[:, None] + offsets]
+            slope = segments[:, left + 1] - segments[:, left]
+            upsampled_segments = slope * fraction + segments[:, left]
+            upsampled_segments[:, on_last] = segments[:, -1:]
+            upsampled_r_peak = np.argmax(upsampled_segments, axis=1)
+            peaks_values[chunk] = upsampled_segments[np.arange(len(chunk)), upsampled_r_peak]
+            peaks_refined[chunk] = start_idx + upsampled_r_peak // upsample_factor + 1
+
+        return peaks_refined, peaks_values
+
+    @staticmethod
+    def mean_slopes(signal, indices, window, chunk_size=8192):
+        """
+        np.mean(np.diff(signal[index-window:index])) for each index, computed row-wise on a window matrix
+        (same summation as the single window). Indices too close to the borders are computed one by one.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        slopes = np.zeros(len(indices))
+        inside = (indices - window >= 0) & (indices <= len(signal)) if window >= 2 else np.zeros(len(indices), dtype=bool)
+        for i in np.flatnonzero(~inside):
+            slopes[i] = np.mean(np.diff(signal[indices[i]-window:indices[i]]))
+        inside_indices = np.flatnonzero(inside)
+        offsets = np.arange(-window, 0)
+        for chunk_start in range(0, len(inside_indices), chunk_size):
+            chunk = inside_indices[chunk_start:chunk_start + chunk_size]
+            slopes[chunk] = np.mean(np.diff(signal[indices[chunk, None] + offsets], axis=1), axis=1)
+        return slopes
+    
+
     #@jit(nopython=True, cache=True)
     def downsample_ecg(ecg, new_length): # new_length is 100, len(ecg) is 1000
 
@@ -505,9 +583,30 @@ class QRSDetectorOffline(object):
         #noise_peak_value = 0.5 * np.mean(np.abs(filtered_signal[:2*fs]))
         #threshold_value2 = noise_peak_value
         
-        for detected_peak_index, detected_peaks_value in zip(detected_peaks_indices, detected_peaks_values):
+        # the classification depends on the previous decisions, so it stays a loop over the candidates; the per-peak
+        # upsampling is done for all candidates at once and the detections are kept in lists (no array copy per peak)
+        peak_indices, peak_values = self.interpolate_peak_batch(detected_peaks_indices)
+        qrs_peaks_indices = list(qrs_peaks_indices)
+        noise_peaks_indices = list(noise_peaks_indices)
+        threshold_value2 = 0.4*threshold_value
+        slope_window = int(0.07*fs)
+        search_start = int(fs*0.36)
+
+        # slopes before every candidate peak, computed at once; only the search back detections need it per peak
+        candidate_slopes = dict(zip(peak_indices.tolist(), self.mean_slopes(filtered_signal, peak_indices, slope_window).tolist()))
+
+        def mean_slope(index):
+            try:
+                return candidate_slopes[index]
+            except KeyError:
+                return np.mean((np.diff(filtered_signal[index-slope_window:index])))
 
-            peak_index, peak_value = self.interpolate_peak(detected_peak_index)
+        def mean_rr_last(indices):
+            # np.mean(np.diff(indices[-7:])) without the array round trip
+            last = indices[-7:]
+            return (last[-1] - last[0]) / (len(last) - 1) if len(last) > 1 else np.nan
+
+        for peak_index, peak_value in zip(peak_indices.tolist(), peak_values.tolist()):
 
             try:
                 last_qrs_index = qrs_peaks_indices[-1]
@@ -515,37 +614,37 @@ class QRSDetectorOffline(object):
                 last_qrs_index = 0
             
             # After a valid QRS complex detection, there is a 200 ms refractory period before next one can be detected.
-            if peak_index - last_qrs_index > fs*0.2 or not qrs_peaks_indices.size:
+            if peak_index - last_qrs_index > fs*0.2 or not len(qrs_peaks_indices):
                 # Peak must be classified either as a noise peak or a QRS peak.
                 # To be classified as a QRS peak it must exceed dynamically set threshold value.
                 if peak_value > threshold_value:
                     try:
-                        previous_slope = np.mean((np.diff(filtered_signal[qrs_peaks_indices[-1]-int(0.07*fs):qrs_peaks_indices[-1]])))
-                        current_slope = np.mean((np.diff(filtered_signal[peak_index-int(0.07*fs):peak_index])))
-                        mean_rr = np.mean(np.diff(qrs_peaks_indices[-7:]))
+                        previous_slope = mean_slope(qrs_peaks_indices[-1])
+                        current_slope = mean_slope(peak_index)
+                        mean_rr = mean_rr_last(qrs_peaks_indices)
                         if (peak_index - last_qrs_index < 0.36*fs or peak_index - last_qrs_index < 0.5*mean_rr) and current_slope < 0.6*previous_slope:
-                            noise_peaks_indices = np.append(noise_peaks_indices, peak_index)
+                            noise_peaks_indices.append(peak_index)
                             noise_peak_value = 0.125 * peak_value + 0.875 * noise_peak_value
                         else:
-                            qrs_peaks_indices = np.append(qrs_peaks_indices, peak_index)
+                            qrs_peaks_indices.append(peak_index)
                             qrs_peak_value = 0.125 * peak_value + 0.875 * qrs_peak_value
                     except:
-                        qrs_peaks_indices = np.append(qrs_peaks_indices, peak_index)
+                        qrs_peaks_indices.append(peak_index)
                         qrs_peak_value = 0.125 * peak_value + 0.875 * qrs_peak_value
 
                 elif (len(qrs_peaks_indices)>2):
                     # check if r or t peak
-                    previous_slope = np.mean((np.diff(filtered_signal[qrs_peaks_indices[-1]-int(0.07*fs):qrs_peaks_indices[-1]])))
-                    current_slope = np.mean((np.diff(filtered_signal[peak_index-int(0.07*fs):peak_index])))
-                    mean_rr = np.mean(np.diff(qrs_peaks_indices[-7:]))
+                    previous_slope = mean_slope(qrs_peaks_indices[-1])
+                    current_slope = mean_slope(peak_index)
+                    mean_rr = mean_rr_last(qrs_peaks_indices)
                     if peak_index - last_qrs_index < 0.36*fs or peak_index - last_qrs_index < 0.5*mean_rr:
                         if current_slope < 0.6*previous_slope: # it is t wave
-                            noise_peaks_indices = np.append(noise_peaks_indices, peak_index)
+                            noise_peaks_indices.append(peak_index)
 
                             # Adjust noise peak value used later for setting QRS-noise threshold.
                             noise_peak_value = 0.125 * peak_value + 0.875 * noise_peak_value
                         else:
-                            qrs_peaks_indices = np.append(qrs_peaks_indices, peak_index)
+                            qrs_peaks_indices.append(peak_index)
 
                             # Adjust QRS peak value used later for setting QRS-noise threshold.
                             qrs_peak_value = 0.125 * peak_value + 0.875 * qrs_peak_value
@@ -554,58 +653,58 @@ class QRSDetectorOffline(object):
                     elif (peak_index - last_qrs_index > 1*fs or peak_index - last_qrs_index > 1.66*mean_rr):
                         meansb = np.mean([filtered_signal[qrs_peaks_indices[-3]], filtered_signal[qrs_peaks_indices[-2]], filtered_signal[qrs_peaks_indices[-1]]])
                         threshold3 = 0.5*0.4*threshold_value + 0.5*meansb
-                        window_values = filtered_signal[qrs_peaks_indices[-1]+int(fs*0.36):peak_index]
+                        window_values = filtered_signal[qrs_peaks_indices[-1]+search_start:peak_index]
                         max_value_index = np.argmax(window_values)
                         if window_values[max_value_index] > threshold3:
-                            index_value = max_value_index+qrs_peaks_indices[-1]+int(fs*0.36)
-                            qrs_peaks_indices = np.append(qrs_peaks_indices, index_value)
+                            index_value = max_value_index+qrs_peaks_indices[-1]+search_start
+                            qrs_peaks_indices.append(index_value)
                             # Adjust QRS peak value with rule 2
                             qrs_peak_value = 0.75 * peak_value + 0.25 * qrs_peak_value
                         else:
                             if (peak_index - last_qrs_index > 1.4*fs):
-                                window_values = filtered_signal[qrs_peaks_indices[-1]+int(fs*0.36):peak_index]
+                                window_values = filtered_signal[qrs_peaks_indices[-1]+search_start:peak_index]
                                 max_value_index = np.argmax(window_values)
                                 if (window_values[max_value_index] > 0.2*threshold_value2):
-                                    index_value = max_value_index+qrs_peaks_indices[-1]+int(fs*0.36)
-                                    qrs_peaks_indices = np.append(qrs_peaks_indices, index_value)
+                                    index_value = max_value_index+qrs_peaks_indices[-1]+search_start
+                                    qrs_peaks_indices.append(index_value)
                                     # Adjust QRS peak value with rule 2
                                     qrs_peak_value = 0.75 * peak_value + 0.25 * qrs_peak_value
                                 else:
-                                    noise_peaks_indices = np.append(noise_peaks_indices, max_value_index+qrs_peaks_indices[-1]+int(fs*0.36))
+                                    noise_peaks_indices.append(max_value_index+qrs_peaks_indices[-1]+search_start)
                                     noise_peak_value = 0.75 * peak_value + 0.25 * noise_peak_value
 
                     # check if miss beat after very high peak
                     elif (peak_index - last_qrs_index > 1.4*fs):
-                        window_values = filtered_signal[qrs_peaks_indices[-1]+int(fs*0.36):peak_index]
+                        window_values = filtered_signal[qrs_peaks_indices[-1]+search_start:peak_index]
                         max_value_index = np.argmax(window_values)
                         if (window_values[max_value_index] > 0.2*threshold_value2):
-                            index_value = max_value_index+qrs_peaks_indices[-1]+int(fs*0.36)
-                            qrs_peaks_indices = np.append(qrs_peaks_indices, index_value)
+                            index_value = max_value_index+qrs_peaks_indices[-1]+search_start
+                            qrs_peaks_indices.append(index_value)
                             # Adjust QRS peak value with rule 2
                             qrs_peak_value = 0.75 * peak_value + 0.25 * qrs_peak_value
                         else:
-                            noise_peaks_indices = np.append(noise_peaks_indices, max_value_index+qrs_peaks_indices[-1]+int(fs*0.36))
+                            noise_peaks_indices.append(max_value_index+qrs_peaks_indices[-1]+search_start)
                             noise_peak_value = 0.75 * peak_value + 0.25 * noise_peak_value
                     else:
-                        noise_peaks_indices = np.append(noise_peaks_indices, peak_index)
+                        noise_peaks_indices.append(peak_index)
 
                         # Adjust noise peak value used later for setting QRS-noise threshold.
                         noise_peak_value = 0.75 * peak_value + 0.25 * noise_peak_value
 
                 else:
                     if (peak_index - last_qrs_index > 1.4*fs):
-                        window_values = filtered_signal[last_qrs_index+int(fs*0.36):peak_index]
+                        window_values = filtered_signal[last_qrs_index+search_start:peak_index]
                         max_value_index = np.argmax(window_values)
                         if (window_values[max_value_index] > 0.2*threshold_value2):
-                            index_value = max_value_index+last_qrs_index+int(fs*0.36)
-                            qrs_peaks_indices = np.append(qrs_peaks_indices, index_value)
+                            index_value = max_value_index+last_qrs_index+search_start
+                            qrs_peaks_indices.append(index_value)
                             # Adjust QRS peak value with rule 2
                             qrs_peak_value = 0.75 * peak_value + 0.25 * qrs_peak_value
                         else:
-                            noise_peaks_indices = np.append(noise_peaks_indices, max_value_index+last_qrs_index+int(fs*0.36))
+                            noise_peaks_indices.append(max_value_index+last_qrs_index+search_start)
                             noise_peak_value = 0.75 * peak_value + 0.25 * noise_peak_value
                     else:
-                        noise_peaks_indices = np.append(noise_peaks_indices, peak_index)
+                        noise_peaks_indices.append(peak_index)
 
                         # Adjust noise peak value used later for setting QRS-noise threshold.
                         noise_peak_value = 0.75 * peak_value + 0.25 * noise_peak_value
@@ -614,6 +713,9 @@ class QRSDetectorOffline(object):
             threshold_value = noise_peak_value + 0.25 * (qrs_peak_value - noise_peak_value)
             threshold_value2 = 0.4*threshold_value
 
+        qrs_peaks_indices = np.array(qrs_peaks_indices, dtype=int)
+        noise_peaks_indices = np.array(noise_peaks_indices, dtype=int)
+
         return detected_peaks_indices, detected_peaks_values, qrs_peaks_indices, qrs_peak_value, noise_peaks_indices, noise_peak_value, threshold_value
     
 
@@ -0,0 +1,40 @@
+import numpy as np
+from scipy.linalg import solveh_banded
+
+
+def smoothness_priors_bands(N: int, regularization: float) -> np.ndarray:
+    """
+    Upper banded form (see scipy.linalg.solveh_banded) of the pentadiagonal matrix I + lambda^2 * D2' * D2,
+    where D2 is the (N-2) x N second order difference matrix. Only 3 x N values are stored.
+    """
+    lam2 = float(regularization) ** 2
+    bands = np.zeros((3, N))
+    if N > 2:
+        # D2' * D2 main diagonal is [1, 5, 6, ..., 6, 5, 1], first off-diagonal [-2, -4, ..., -4, -2], second [1, ..., 1]
+        bands[2, :-2] += 1
+        bands[2, 1:-1] += 4
+        bands[2, 2:] += 1
+        bands[1, 1:-1] += -2
+        bands[1, 2:] += -2
+        bands[0, 2:] += 1
+        bands *= lam2
+    bands[2, :] += 1
+    return bands
+
+
+def smoothness_priors_trend(signal: np.ndarray, regularization: float) -> np.ndarray:
+    """
+    Trend of the smoothness priors method (Tarvainen et al., 2002): (I + lambda^2 * D2' * D2)^-1 * signal.
+    Solved with a banded Cholesky decomposition, so time and memory are linear in len(signal).
+    """
+    signal = np.asarray(signal, dtype=float)
+    N = len(signal)
+    if N == 0:
+        return signal.copy()
+    return solveh_banded(smoothness_priors_bands(N, regularization), signal, check_finite=False)
+
+
+def smoothness_priors_detrend(signal: np.ndarray, regularization: float) -> np.ndarray:
+    """ Stationary part of the signal, i.e. the signal minus its smoothness priors trend """
+    signal = np.asarray(signal, dtype=float)
+    return signal - smoothness_priors_trend(signal, regularization)
@@ -0,0 +1,114 @@
+"""
+Segment-parallel peak detection.
+
+The continuous segments of a recording are detected independently, so they can run in a process pool. Very long
+segments can also be cut into overlapping windows: each window keeps what it detected in its core (the window
+without half of the overlap at each side) and peaks closer than min_distance across a core boundary are merged,
+keeping the earlier one. The windows only depend on the segment bounds and results are gathered in task order,
+so the output does not depend on the number of workers and is the same as a serial run.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def get_max_workers(max_workers: int = None, n_tasks: int = 1) -> int:
+    """number of worker processes to use: all CPUs when max_workers is not set, never more than the tasks"""
+    if not max_workers or max_workers < 1:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(int(max_workers), n_tasks))
+
+
+def plan_windows(start: int, end: int, window: int = None, overlap: int = 0):
+    """
+    (window_start, window_end, core_start, core_end) covering the segment [start, end). The cores are contiguous,
+    do not overlap and cover the whole segment. Without window (or for short segments) the segment is one window.
+    """
+    if not window or end - start <= window:
+        return [(start, end, start, end)]
+    overlap = int(min(max(overlap, 0), window // 2))
+    windows = []
+    window_start = start
+    while True:
+        window_end = min(window_start + window, end)
+        core_start = start if window_start == start else window_start + overlap // 2
+        core_end = end if window_end == end else window_end - (overlap - overlap // 2)
+        windows.append((window_start, window_end, core_start, core_end))
+        if window_end == end:
+            return windows
+        window_start += window - overlap
+
+
+def run_tasks(detect, tasks, max_workers: int = None):
+    """detect(*task) for every task, in a process pool when there are several tasks and workers. Results in task order"""
+    workers = get_max_workers(max_workers, len(tasks))
+    if workers == 1:
+        return [detect(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(detect, *zip(*tasks)))
+
+
+def merge_windows(window_results, windows, segment_start: int, min_distance: int = 0):
+    """
+    Joins the outputs of the windows of one segment, relative to the segment start. Each output is a tuple of arrays
+    of sample indices (relative to its window): 1-D arrays are peaks, 2-D (n, 2) arrays are [start, end] intervals,
+    kept by their start. Only what falls in the core of its window is kept.
+    """
+    if len(windows) == 1:
+        return tuple(np.asarray(output) for output in window_results[0])
+
+    merged = []
+    for output_index in range(len(window_results[0])):
+        kept = []
+        previous_last = None
+        for output, (window_start, window_end, core_start, core_end) in zip(window_results, windows):
+            values = np.asarray(output[output_index]) + (window_start - segment_start)
+            position = values if values.ndim == 1 else values.reshape(-1, 2)[:, 0]
+            in_core = (position >= core_start - segment_start) & (position < core_end - segment_start)
+            values = values[in_core]
+            if values.ndim == 1 and len(values):
+                # the same peak found at both sides of a core boundary
+                if previous_last is not None and min_distance > 0:
+                    values = values[~((values - previous_last < min_distance) & (values < core_start - segment_start + min_distance))]
+                if len(values):
+                    previous_last = values.max()
+            kept.append(values)
+        merged.append(np.concatenate(kept) if len(kept) else np.array([], dtype=int))
+    return tuple(merged)
+
+
+def detect_segments(detect, signal, start_indexes, end_indexes, fs, max_workers: int = None, window: int = None,
+                    overlap: int = 0, min_distance: int = 0, min_parallel_samples: int = 0):
+    """
+    Runs detect(signal[a:b], fs) on every continuous segment [start, end) (or window of it) and returns, for each
+    segment, the tuple of arrays returned by detect relative to the segment start (see merge_windows). signal is an
+    array or a logic.segmented_signal.SegmentedSignal, whose slices inside a block are views of it.
+    detect must be a module level function so it can be sent to the worker processes. Recordings shorter than
+    min_parallel_samples are detected in this process, where starting the workers would cost more than it saves.
+    """
+    segments = [(int(start), int(end)) for start, end in zip(start_indexes, end_indexes)]
+    plans = [plan_windows(start, end, window, overlap) for start, end in segments]
+    tasks = [(signal[window_start:window_end], fs) for plan in plans for window_start, window_end, _, _ in plan]
+
+    if sum(end - start for start, end in segments) < min_parallel_samples:
+        max_workers = 1
+    results = [output if isinstance(output, tuple) else (output,) for output in run_tasks(detect, tasks, max_workers)]
+
+    per_segment = []
+    first = 0
+    for (start, end), plan in zip(segments, plans):
+        per_segment.append(merge_windows(results[first:first + len(plan)], plan, start, min_distance))
+        first += len(plan)
+    return per_segment
+
+
+def detection_settings(fs: float) -> dict:
+    """keyword arguments of detect_segments from the application configuration (see config/config.py)"""
+    from gui import PALMS
+    config = PALMS.config
+    window_sec = config.get('detection_window_sec', 0)
+    return dict(max_workers=config.get('detection_workers', 0),
+                window=int(window_sec * fs) if window_sec else None,
+                overlap=int(config.get('detection_window_overlap_sec', 20) * fs),
+                min_parallel_samples=int(config.get('detection_min_parallel_sec', 600) * fs))
@@ -182,3 +182,25 @@ def find_closest(input_array: np.ndarray, target_array: np.ndarray, tol: float =
     accept_indices = np.compress(np.greater(acc_rej_indices, -1), acc_rej_indices)
     reject_indices = np.compress(np.equal(acc_rej_indices, -1), np.arange(len(acc_rej_indices)))
     return closest_indices, accept_indices, reject_indices
+
+
+def find_closest_sorted(sorted_array: np.ndarray, values: Union[float, np.ndarray]) -> Union[int, np.ndarray]:
+    """
+    Index of the element of sorted_array closest to each value, with binary search (O(log N) per value).
+    Same result as np.argmin(np.abs(sorted_array - value)): on ties, and for repeated elements, the first index wins.
+    Gaps (non uniform steps) in sorted_array are handled, only non decreasing order is required. An array-like with
+    its own searchsorted (gui.tracking.SampleTimes) is used as it is.
+    """
+    if not hasattr(sorted_array, 'searchsorted'):
+        sorted_array = np.asarray(sorted_array)
+    values = np.asarray(values, dtype=float)
+    if len(sorted_array) < 2:
+        closest = np.zeros(values.shape, dtype=np.int64)
+    else:
+        right = np.clip(np.searchsorted(sorted_array, values, side='left'), 1, len(sorted_array) - 1)
+        left = right - 1
+        closest = np.where(values - sorted_array[left] <= sorted_array[right] - values, left, right)
+        # first occurrence of the closest value, as argmin
+        closest = np.asarray(np.searchsorted(sorted_array, sorted_array[closest], side='left'))
+        closest[np.isnan(values)] = 0
+    return int(closest) if closest.ndim == 0 else closest